@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+import argparse, glob, os, sys
+from pyralala.noten import NotenCache, convert_tunes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Convert ABC tunes into cropped sheet music pdfs '
+                                                 '(abcm2ps, ps2pdf, pdfcrop).')
+    parser.add_argument("files", nargs="*", metavar="file", default=["ABC_Noten"],
+                        help="The .mcm tunes, or directories containing them (default: ABC_Noten).")
+    parser.add_argument("-o", "--out", default="Noten", help="Output directory (default: Noten).")
+    parser.add_argument("-j", "--jobs", type=int, help="Number of worker processes (default: number of CPUs).")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Also print the warnings of abcm2ps.")
+    parser.add_argument("--format", default="Misc/abcm2ps.fmt", help="abcm2ps format file (default: Misc/abcm2ps.fmt).")
+    parser.add_argument("--cache", metavar="DIR", help="Cache the results of each stage in this directory.")
+    args = parser.parse_args()
+
+    tunes = []
+    for path in args.files:
+        tunes += sorted(glob.glob(os.path.join(path, "*.mcm"))) if os.path.isdir(path) else [path]
+
+    cache = NotenCache(args.cache, args.format) if args.cache else NotenCache(format_path=args.format)
+    warnings, errors, runs = convert_tunes(tunes, args.out, cache, args.jobs)
+
+    for path in tunes:
+        if path in errors:
+            print("failed  {} ({})".format(path, errors[path].stage))
+            for line in errors[path].diagnostics:
+                print("        {}".format(line))
+        elif args.verbose and path in warnings:
+            print("warning {}".format(path))
+            for line in warnings[path]:
+                print("        {}".format(line))
+    print("{} of {} tunes converted, {} failed ({}).".format(
+        len(tunes) - len(errors), len(tunes), len(errors), ", ".join("{} {} runs".format(n, s) for s, n in runs.items())))
+    sys.exit(1 if errors else 0)
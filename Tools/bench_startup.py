@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# Measures the import time of pyralala using "python -X importtime" and checks it against a budget.
+import argparse
+import csv
+import datetime
+import os
+import statistics
+import subprocess
+import sys
+
+# Import time budgets in milliseconds, excluding the interpreter startup itself.
+BUDGETS = {
+    "pyralala": 15,
+    "pyralala.export": 20,
+}
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def import_time(module, python=sys.executable):
+    """ Returns the cumulative import time of module in milliseconds. """
+    result = subprocess.run([python, "-X", "importtime", "-c", "import " + module],
+                            cwd=TOOLS_DIR, stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    # format: "import time: <self us> | <cumulative us> | <indented module name>"
+    for line in result.stderr.splitlines():
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1]) / 1000
+    raise ValueError("Module {} not found in importtime output.".format(module))
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "describe", "--always", "--dirty"], cwd=TOOLS_DIR,
+                                       stderr=subprocess.DEVNULL, universal_newlines=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the import time of the pyralala package.")
+    parser.add_argument("-n", "--runs", type=int, default=10, help="Number of measurements per module (default: 10).")
+    parser.add_argument("--log", metavar="CSV", help="Append the results to this csv file, to track them over time.")
+    args = parser.parse_args()
+
+    # warm up, so compiling the byte code is not measured
+    import_time("pyralala.export")
+
+    over_budget = False
+    rows = []
+    for module, budget in BUDGETS.items():
+        times = [import_time(module) for _ in range(args.runs)]
+        median = statistics.median(times)
+        status = "ok" if median <= budget else "OVER BUDGET"
+        over_budget |= median > budget
+        print("{:20} median {:6.2f} ms, min {:6.2f} ms, budget {:3} ms: {}".format(
+            module, median, min(times), budget, status))
+        rows.append([datetime.datetime.now().isoformat(timespec="seconds"), git_revision(),
+                     module, "{:.2f}".format(median), budget])
+
+    if args.log:
+        new_file = not os.path.exists(args.log)
+        with open(args.log, "a", newline="") as log_file:
+            log = csv.writer(log_file)
+            if new_file:
+                log.writerow(["date", "revision", "module", "median_ms", "budget_ms"])
+            log.writerows(rows)
+
+    sys.exit(1 if over_budget else 0)
@@ -1,10 +1,20 @@
 #!/usr/bin/env bash
 
+# --split: each song starts on a new page, to split the pdf into the pdfs of the songs (Tools/pfadisplit.py)
+if [ "$1" = "--split" ]; then
+    name="SplitEdition"
+    title="Pfadiralala IV: Einzelne Lieder"
+    separator="\\begin{intersong}\\clearpage\\end{intersong}"
+else
+    name="CompleteEdition"
+    title="Pfadiralala IV: Complete Edition"
+    separator=""
+fi
 
 cat <<EOF
 \documentclass{book}
 
-\providecommand{\bookname}{Pfadiralala IV: Complete Edition}
+\providecommand{\bookname}{$title}
 
 \input{Misc/basic}
 
@@ -13,18 +23,22 @@ cat <<EOF
 \afterpreludeskip=2pt
 \beforepostludeskip=2pt
 
-\newindex{Seitenzahlen}{Ausgaben/CompleteEdition}
+\newindex{Seitenzahlen}{Ausgaben/$name}
 \indexsongsas{Seitenzahlen}{\thepage}
 
 \begin{document}
 \begin{songs}{Seitenzahlen}
 
-\showindex[2]{Inhaltsverzeichnis}{Seitenzahlen}
-
 EOF
 
-for file in Lieder/*.tex; 
-    do echo "\\input{$file}"
+if [ -z "$separator" ]; then
+    echo "\\showindex[2]{Inhaltsverzeichnis}{Seitenzahlen}"
+    echo
+fi
+
+for file in Lieder/*.tex;
+    do [ -n "$separator" ] && echo "$separator"
+    echo "\\input{$file}"
 done
 
 cat <<EOF
@@ -1,9 +1,10 @@
 #! /usr/bin/env python3
 # Listet Lieder nach beliebiger Sortierung auf. Durch die möglichkeit eines Prefixes und Suffixes ist es möglich, direkt \input{} statements für die Dateien zu erzeugen.
 import argparse
-from typing import Tuple, List, Dict, Union
+from typing import List, Dict, Union
 import os
 import sys
+from pyralala import Library
 
 #header and footer for the output file
 generated_head = """\documentclass{book}
@@ -36,110 +37,35 @@ argParser.add_argument('-b', '--by', action="append", help="Schlüssel, nach dem
 argParser.add_argument('-p', '--root', action="store", default=None, nargs="?", const=".", help="Wurzelverzeichnis für die Ausgabe von Pfaden. Standardmäßig findet keine Veränderung statt. Wird die Option ohne Angabe eines Pfades verwendet, wird das aktuelle Verzeichnis (.) gewählt")
 argParser.add_argument('--prefix', action="store", default="\t\t\input{", help="fügt ein Prefix vor jedem ausgegebenen Dateipfad ein. (Standard ist \"\t\t\input{\")")
 argParser.add_argument('--suffix', action="store", default="}", help="fügt ein Suffix nach jedem ausgegebenen Dateipfad ein. (Standard ist \"}\")")
+argParser.add_argument('--cache', action="store", default=None, help="Verzeichnis, in dem die eingelesenen Lieder zwischengespeichert werden. (Standard ist kein Cache)")
 argParser.add_argument('files', action="extend", nargs="+", help = "Die sortiert aufzulistenden Dateien. Wenn Fehler, zum Beispiel aufgrund eines falschen Formats auftreten, sind die fehlerhaften Dateien nicht in der Ausgabe enthalten.")
 
 
 class SortierbaresLied():
-	def __init__(self, pfad):
+	def __init__(self, pfad, song):
 		self.pfad = pfad
-		self.inhalt = None
-		self.meta = None
-
-	def lesen(self):
-		with open(self.pfad, "r") as file:
-			self.inhalt = file.read()
-
-	def getMeta(self):
-		self.meta = MetaFinder.lese_meta(self, MetaFinder.finde_meta_indicees(self))
+		self.meta = MetaFinder.lese_meta(pfad, song)
 
 	def __str__(self):
-		if not self.meta:
-			self.getMeta()
 		return self.pfad + "\n\t".join(key + ' = ' + self.meta[key] for key in self.meta.keys())
 
 
 class MetaFinder():
 	@staticmethod
-	def finde_meta_indicees(lied: SortierbaresLied) -> Tuple[str]:
-		# Findet die string indecees von Angang und Ende des Titels bzw. des Metastrings
-		if lied.inhalt is None:
-			lied.lesen()
-		# Die zu findenden steuerzeichen
-		search = [r"\beginsong", "{", "}", "[", "]"]
-		searchindex = 0  # index des aktuell zu suchenden steuerzeichens
-		start = 0       # index, bei dem die Suche beginnt
-		starttitle = -1  # Index des Zeichens, bei dem der Titel anfängt
-		endtitle = -1   # Index des Zeichens, bei dem der Titel aufhört
-		startmeta = -1 	# Index des Zeichens, bei dem der Metablock anfängt
-		endmeta = -1    # Index des Zeichens, bei dem der MEtablock aufhört
-		while searchindex < len(search):
-			finding = lied.inhalt.find(search[searchindex])
-			if finding == -1:  # nichts gefunden
-				raise Exception("format error: " + search[searchindex] + " not found")
-			else:  # wert von search gefunden
-				if searchindex == 0:  # \beginsong
-					pass
-				elif searchindex == 1:  # { (Anfang des titels)
-					# Durch diese Addition ergibt lied.inhalt[starttitle:endtitle] den Titel ohne Steuerzeichen
-					starttitle = finding + 1
-				elif searchindex == 2:  # } (Ende des Titels)
-					endtitle = finding
-				elif searchindex == 3:  # [ (begin der Metadaten)
-					# Durch diese Addition ergibt lied.inhalt[startmeta:endmeta] den Metastring ohne Steuerzeichen
-					startmeta = finding + 1
-				elif searchindex == 4:  # ] (ende der Metadaten)
-					endmeta = finding
-				else:  # Der searchindex hat einen seltsamen Wert angenommen
-					raise Exception("This should never happen")
-
-			searchindex += 1
-			start = finding
-
-		return (starttitle, endtitle), (startmeta, endmeta)
-
-	@staticmethod
-	def lese_meta(lied: SortierbaresLied, indicees: Tuple[Tuple[int, int], Tuple[int, int]]) -> Dict[str, str]:
-		# erstellt ein dictionary der metadaten des Lieds
-
-		meta = MetaFinder.dateiname_zu_meta(lied)
-
-		# Inhalt lesen, falls noch nicht geschehen
-		if lied.inhalt is None:
-			lied.lesen()
-
-		# Indezees auspacken
-		(starttitle, endtitle), (startmeta, endmeta) = indicees
-		# Titel extrahieren. Das ist einfach
-		meta["titel"] = lied.inhalt[starttitle: endtitle]
-
-		# Metasting extrahieren:
-		# einzelne Metaangaben sind durch Kommata getrennt. Sie haben das Format <key>=["{"]<value>["}"],
-		# funktioniert nicht, wenn der string escapte endmeta-zeichen enthält (z.B. \}, wenn endmeta } ist).
-		metastrings = lied.inhalt[startmeta: endmeta].split(',')
-
-		for m in metastrings:
-			# findet das Trennzeichen zwischen schlüssel und wert.
-			sepIndex = m.find('=')
-
-			if sepIndex == -1:
-				continue  # Trennzeichen nicht gefunden; kein metastring hier
-
-			schluessel = m[: sepIndex]
-			schluessel = schluessel.strip(" \n\r\t")
-			if len(schluessel) == 0:
-				continue
-
-			wert = m[sepIndex+1:]
-			wert = wert.strip(" \n\r\t{}")
-
+	def lese_meta(pfad: str, song) -> Dict[str, str]:
+		# erstellt ein dictionary der metadaten des Lieds aus dem von pyralala.Library gelesenen Lied
+		meta = MetaFinder.dateiname_zu_meta(pfad)
+		meta["titel"] = song.title
+		# kommt ein Schlüssel mehrfach vor, gilt der letzte Wert
+		for schluessel, wert in song.info:
 			meta[schluessel] = wert
 		return meta
 
 	@staticmethod
-	def dateiname_zu_meta(lied: SortierbaresLied) -> Dict[str, str]:
+	def dateiname_zu_meta(pfad: str) -> Dict[str, str]:
 		meta = dict()
-		meta["pfad"] = str(os.path.abspath(lied.pfad))
-		meta["name"] = str(os.path.basename(lied.pfad))
+		meta["pfad"] = str(os.path.abspath(pfad))
+		meta["name"] = str(os.path.basename(pfad))
 
 		return meta
 
@@ -170,12 +96,14 @@ if __name__ == '__main__':
 	files = args.files
 	#print("ARGS:", args)
 
+	# Lieder einmal einlesen (bzw. aus dem Cache laden), Fehler im Liedtext stören die Metadaten nicht
+	library = Library.load(files, cache_dir=args.cache)
+
 	# sortierbare objekte anlegen
 	lieder = []
 	for file in files:
 		try:
-			lied = SortierbaresLied(file)
-			lied.getMeta()
+			lied = SortierbaresLied(file, library.songs[file])
 			# WUW tag umschreiben:
 			if "wuw" in lied.meta.keys():
 				if "mel" not in lied.meta.keys():
@@ -1,28 +1,141 @@
 #!/usr/bin/env python3
-import argparse, sys
-from pyralala import SongReader
+import argparse, os, sys
+import pyralala
+from pyralala import SongReader, tokenize, texsoup_tokenize
 from pyralala.export import Compiler, MarkdownCompiler, HTMLCompiler
+from pyralala.library import find_songs
+from pyralala.assets import compress_file, write_stylesheet
+from pyralala.graphics import SVGCache, find_graphics
 
-parser = argparse.ArgumentParser(description='Convert LaTeX songs files.')
-parser.add_argument("file", help="The LaTeX song file to be converted.")
-parser.add_argument("-o", "--out", help="Output file path.")
-args = parser.parse_args()
 
-try:
-    reader = SongReader(args.file)
+def read_song(path, tokenizer, cache_dir=None):
+    if cache_dir:
+        return pyralala.SongCache(cache_dir).read(path, tokenizer=tokenizer)
+    reader = SongReader(path, tokenizer=tokenizer)
     reader.read()
-except (TypeError, EOFError) as e:
-    print(e)
-    sys.exit(0)
-
-try:
-    out = open(args.out, "w")
-except TypeError as e:
-    out = sys.stdout
-except (FileNotFoundError, PermissionError) as e:
-    print(e)
-    sys.exit(1)
-
-compiler = HTMLCompiler()
-compiler.compile(reader.song)
-compiler.write(out)
\ No newline at end of file
+    return reader.song
+
+
+def write_song(song, out_path, compiler_args={}, compress=False):
+    try:
+        with open(out_path, "w") as out:
+            HTMLCompiler(**compiler_args).compile_to(song, out)
+    except Exception:
+        # don't leave partially written pages behind
+        if os.path.exists(out_path):
+            os.remove(out_path)
+        raise
+    if compress:
+        compress_file(out_path)
+
+
+def error_message(e):
+    return "{}: {}".format(type(e).__name__, e)
+
+
+def convert(path, out_path, tokenizer, cache_dir=None, compiler_args={}, compress=False):
+    """ Converts a single song, returns an error message or None. """
+    try:
+        write_song(read_song(path, tokenizer, cache_dir), out_path, compiler_args, compress)
+    except Exception as e:
+        return error_message(e)
+
+
+def convert_all(files, out_dir, tokenizer, cache_dir=None, cache_size=None, jobs=None,
+                compiler_args={}, compress=False, shared_css=False):
+    import tempfile
+    from concurrent.futures import ProcessPoolExecutor
+    from functools import partial
+
+    os.makedirs(out_dir, exist_ok=True)
+    out_paths = [os.path.join(out_dir, os.path.splitext(os.path.basename(f))[0] + ".html") for f in files]
+    if shared_css:
+        compiler_args = dict(compiler_args, stylesheet=write_stylesheet(out_dir, compress))
+
+    # without --svg-cache, the workers share the graphics in a directory removed after the batch
+    with tempfile.TemporaryDirectory(prefix="pyralala-svg.") as temp_dir:
+        graphics = compiler_args.get("graphics") or SVGCache(temp_dir)
+        compiler_args = dict(compiler_args, graphics=graphics)
+
+        # convert the graphics of all songs up front, each distinct file once
+        pdf_paths = []
+        for path in files:
+            with open(path, "r") as song_file:
+                try:
+                    pdf_paths += find_graphics(song_file.read())
+                except (EOFError, SyntaxError):
+                    pass
+        for pdf_path, error in sorted(graphics.prefetch(pdf_paths, jobs).items()):
+            print("failed  {} ({})".format(pdf_path, error_message(error)), file=sys.stderr)
+
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            errors = list(executor.map(partial(convert, tokenizer=tokenizer, cache_dir=cache_dir,
+                                               compiler_args=compiler_args, compress=compress),
+                                       files, out_paths, chunksize=8))
+
+    failed = 0
+    for path, error in zip(files, errors):
+        if error is None:
+            print("ok      {}".format(path))
+        else:
+            failed += 1
+            print("failed  {} ({})".format(path, error))
+    print("Converted {} of {} songs, {} failed.".format(len(files) - failed, len(files), failed))
+
+    if cache_dir:
+        pyralala.SongCache(cache_dir, max_size=cache_size).evict()
+    return failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Convert LaTeX songs files.')
+    parser.add_argument("files", nargs="+", metavar="file",
+                        help="The LaTeX song files to be converted, or directories containing them.")
+    parser.add_argument("-o", "--out", help="Output file path, or output directory when converting multiple songs.")
+    parser.add_argument("-j", "--jobs", type=int, help="Number of worker processes (default: number of CPUs).")
+    parser.add_argument("-t", "--transpose", type=int, default=0,
+                        help="Transpose all chords by this number of semitones, in addition to \\transpose.")
+    parser.add_argument("--shared-css", action="store_true",
+                        help="Write one shared stylesheet next to the output and link it, instead of embedding it.")
+    parser.add_argument("--minify", action="store_true", help="Minify the html output.")
+    parser.add_argument("--compress", action="store_true",
+                        help="Additionally write .gz (and .br, if brotli is installed) files for static web servers.")
+    parser.add_argument("--svg-cache", metavar="DIR", help="Cache converted graphics in this directory.")
+    parser.add_argument("--texsoup", action="store_true", help="Parse using TexSoup instead of the builtin lexer.")
+    parser.add_argument("--cache", metavar="DIR", help="Cache parsed songs in this directory.")
+    parser.add_argument("--cache-size", type=int, default=64, help="Maximum cache size in MiB (default: 64).")
+    parser.add_argument("--strict", action="store_true",
+                        help="Exit with a non-zero status, if any song of a batch fails.")
+    args = parser.parse_args()
+
+    tokenizer = texsoup_tokenize if args.texsoup else tokenize
+    compiler_args = {"transpose": args.transpose, "minify": args.minify}
+    if args.svg_cache:
+        compiler_args["graphics"] = SVGCache(args.svg_cache)
+
+    # batch mode: convert all songs into the output directory
+    if len(args.files) > 1 or os.path.isdir(args.files[0]):
+        failed = convert_all(list(find_songs(args.files)), args.out or "html", tokenizer,
+                             args.cache, args.cache_size * 1024 * 1024, args.jobs,
+                             compiler_args, args.compress, args.shared_css)
+        sys.exit(1 if failed and args.strict else 0)
+
+    # single song: errors are reported like in batch mode
+    path = args.files[0]
+    try:
+        if args.cache:
+            cache = pyralala.SongCache(args.cache, max_size=args.cache_size * 1024 * 1024)
+            song = cache.read(path, tokenizer=tokenizer)
+            cache.evict()
+        else:
+            song = read_song(path, tokenizer)
+
+        if args.shared_css:
+            compiler_args["stylesheet"] = write_stylesheet(os.path.dirname(args.out or "") or ".", args.compress)
+        if args.out is None:
+            HTMLCompiler(**compiler_args).compile_to(song, sys.stdout)
+        else:
+            write_song(song, args.out, compiler_args, args.compress)
+    except Exception as e:
+        print("failed  {} ({})".format(path, error_message(e)), file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+import argparse, sys
+import pyralala
+from pyralala.export import write_bundle
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Export all songs into a single bundle file for random access.')
+    parser.add_argument("files", nargs="*", metavar="file", default=["Lieder"],
+                        help="The LaTeX song files, or directories containing them (default: Lieder).")
+    parser.add_argument("-o", "--out", default="songs.bundle", help="Output file path (default: songs.bundle).")
+    parser.add_argument("-z", "--compress", action="store_true", help="Compress each song record.")
+    parser.add_argument("-j", "--jobs", type=int, help="Number of worker processes (default: number of CPUs).")
+    parser.add_argument("--cache", metavar="DIR", help="Cache parsed songs in this directory.")
+    args = parser.parse_args()
+
+    library = pyralala.Library.load(args.files, cache_dir=args.cache, jobs=args.jobs)
+    for path, error in sorted(library.errors.items()):
+        print("{}: {}".format(path, error))
+    songs = [library[path] for path in library if path not in library.errors]
+    count = write_bundle(songs, args.out, args.compress)
+    print("{} songs written to {}.".format(count, args.out))
+    sys.exit(1 if library.errors else 0)
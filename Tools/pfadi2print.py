@@ -1,34 +1,34 @@
 #!/usr/bin/env python3
 
-import argparse
-from PyPDF2 import PdfFileReader, PdfFileWriter
+import argparse, sys, time
+from pyralala.impose import impose, LAYOUTS, PAPER
 
-parser = argparse.ArgumentParser(description='Reorder an A5 document for double-sided printing on to-be-cut A4 pages.\n\n Print using 2 pages per sheet with short-edge binding.')
+parser = argparse.ArgumentParser(description='Reorder an A5 document for double-sided printing on to-be-cut A4 pages, '
+                                             'as booklet or n-up.\n\n With --nup 1 print using 2 pages per sheet '
+                                             'with short-edge binding.')
 parser.add_argument("pdf", help="The pdf of the document to be printed")
 parser.add_argument("-o", "--out", help="Output file path.")
+parser.add_argument("-l", "--layout", choices=sorted(LAYOUTS), default="cut-stack",
+                    help="cut-stack: the sheets are cut and the stacks put on each other, booklet: saddle-stitched "
+                         "signatures, folded in the middle, n-up: the pages in order (default: cut-stack).")
+parser.add_argument("-n", "--nup", type=int, choices=[1, 2, 4], default=1,
+                    help="Pages per side of a sheet, placed on a single page. With 1 the pages are only reordered "
+                         "and printed 2 pages per sheet by the printer (default: 1).")
+parser.add_argument("-s", "--signature", type=int, default=0,
+                    help="Pages of each booklet signature, a multiple of 4 (default: all pages).")
+parser.add_argument("-p", "--paper", choices=sorted(PAPER),
+                    help="Scale the pages of a side to fit this paper (default: the size of the pages).")
 args = parser.parse_args()
 
 if not args.out:
-    args.out = args.pdf[:-4]+"-a4print.pdf"
-
-with open(args.pdf, "rb") as pdf_file, open(args.out, "wb") as out_file:
-    out_pdf = PdfFileWriter()
-    in_pdf = PdfFileReader(pdf_file)
-
-    def add_page(i):
-        try:
-            out_pdf.addPage(in_pdf.getPage(i))
-        except IndexError:
-            out_pdf.addBlankPage()
-
-    n = in_pdf.getNumPages()
-    m = int(n / 4) + 1
-    print("Opened {}, read {} pages, resulting in {} A4 pages.".format(args.pdf, n, m))
-
-    for i in range(m):
-        add_page(      i*2)
-        add_page(m*2 + i*2)
-        add_page(m*2 + i*2 + 1)
-        add_page(      i*2 + 1)
-
-    out_pdf.write(out_file)
\ No newline at end of file
+    suffix = "-a4print" if args.layout == "cut-stack" and args.nup == 1 else "-{}{}".format(args.layout, args.nup)
+    args.out = args.pdf[:-4] + suffix + ".pdf"
+
+start = time.perf_counter()
+try:
+    n, m = impose(args.pdf, args.out, args.layout, args.nup, args.signature, args.paper)
+except Exception as e:
+    print("failed  {}: {}".format(args.pdf, e))
+    sys.exit(1)
+print("Opened {}, read {} pages, resulting in {} sheets ({}) in {:.2f} s.".format(
+    args.pdf, n, m, args.out, time.perf_counter() - start))
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+import argparse, sys
+from pyralala.site import Edition, SiteBuilder
+from pyralala.graphics import SVGCache
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build the website of a songbook edition.')
+    parser.add_argument("edition", help="The LaTeX file of the edition, e.g. Ausgaben/PfadiralalaIV.tex.")
+    parser.add_argument("-o", "--out", required=True, help="Output directory.")
+    parser.add_argument("-j", "--jobs", type=int, help="Number of worker processes (default: number of CPUs).")
+    parser.add_argument("-t", "--transpose", type=int, default=0,
+                        help="Transpose all chords by this number of semitones, in addition to \\transpose.")
+    parser.add_argument("-f", "--force", action="store_true", help="Render all pages, even unchanged ones.")
+    parser.add_argument("--svg-cache", metavar="DIR", help="Cache converted graphics in this directory.")
+    parser.add_argument("--cache", metavar="DIR", help="Cache parsed songs in this directory.")
+    args = parser.parse_args()
+
+    graphics = SVGCache(args.svg_cache) if args.svg_cache else None
+    builder = SiteBuilder(Edition(args.edition), args.out, cache_dir=args.cache, graphics=graphics,
+                          transpose=args.transpose, jobs=args.jobs)
+    builder.build(force=args.force)
+
+    for path, error in sorted(builder.errors.items()):
+        print("{}: {}".format(path, error))
+    print("{} pages rendered, {} unchanged, {} errors.".format(len(builder.built), len(builder.skipped),
+                                                               len(builder.errors)))
+    sys.exit(1 if builder.errors else 0)
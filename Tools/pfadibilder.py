@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+import argparse, glob, os, sys, time
+from pyralala.bilder import ImageCache, derive_images, IMAGE_EXTENSIONS, VARIANT_OPTIONS
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Derive the pictures of the pdf variants: grayscale for print, '
+                                                 'downscaled and recompressed for ebooks (ImageMagick).')
+    parser.add_argument("files", nargs="*", metavar="file", default=["Bilder"],
+                        help="Pictures, or directories containing them, relative to the repository root "
+                             "(default: Bilder).")
+    parser.add_argument("-V", "--variant", action="append", choices=sorted(VARIANT_OPTIONS),
+                        help="Variant to derive, can be given multiple times (default: all).")
+    parser.add_argument("-o", "--out", default=".cache/pyralala/bilder",
+                        help="Output directory, the pictures are written to <out>/<variant>/Bilder, "
+                             "pdflatex finds them by TEXINPUTS=<out>/<variant>: (default: .cache/pyralala/bilder).")
+    parser.add_argument("-j", "--jobs", type=int, help="Number of parallel conversions (default: number of CPUs).")
+    parser.add_argument("--cache", metavar="DIR", help="Cache directory of the conversions (default: --out).")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    paths = []
+    prune = True
+    for path in args.files:
+        if os.path.isdir(path):
+            paths += sorted(p for p in glob.glob(os.path.join(path, "*")) if p.lower().endswith(IMAGE_EXTENSIONS))
+        else:
+            paths.append(path)
+            # single pictures do not remove the others
+            prune = False
+    variants = args.variant or sorted(VARIANT_OPTIONS)
+
+    cache = ImageCache(args.cache or args.out)
+    errors = derive_images(paths, args.out, variants, cache, args.jobs, prune)
+    for (path, variant), error in sorted(errors.items()):
+        print("failed  {} ({}): {}".format(path, variant, error))
+    print("{} pictures, {} variants: {} converted, {} failed in {:.2f} s.".format(
+        len(paths), len(variants), cache.conversions, len(errors), time.perf_counter() - start))
+    sys.exit(1 if errors else 0)
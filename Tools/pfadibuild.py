@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+import argparse, os, sys, time
+from pyralala.build import BuildDB, Builder
+from pyralala.targets import songbook_tasks
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build the songbooks, rebuilding only what changed in content.')
+    parser.add_argument("targets", nargs="*", default=["all"],
+                        help="Files or groups (all, Noten, PDFs) to build (default: all), "
+                             "e.g. Ausgaben/PfadiralalaIV-print.pdf.")
+    parser.add_argument("-j", "--jobs", type=int, help="Number of parallel jobs (default: number of CPUs).")
+    parser.add_argument("-n", "--dry-run", action="store_true", help="Only print the commands, which would run.")
+    parser.add_argument("-k", "--keep-going", action="store_true", help="Continue with other tasks after a failure.")
+    parser.add_argument("-l", "--list", action="store_true", help="List all targets.")
+    parser.add_argument("--db", default=".cache/pyralala/build.json",
+                        help="Build database, relative to the repository root (default: .cache/pyralala/build.json).")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    # all paths are relative to the repository root
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    tasks = songbook_tasks()
+    if args.list:
+        for task in tasks:
+            print(task.name)
+        sys.exit(0)
+
+    builder = Builder(tasks, BuildDB(args.db), args.jobs, args.dry_run, args.keep_going)
+    try:
+        ok = builder.build(args.targets)
+    except Exception as e:
+        print(e)
+        sys.exit(2)
+
+    for name, error in sorted(builder.failed.items()):
+        print("failed  {}: {}".format(name, error.splitlines()[0]))
+    print("{} tasks run, {} failed in {:.2f} s.".format(len(builder.ran), len(builder.failed),
+                                                      time.perf_counter() - start))
+    sys.exit(0 if ok else 1)
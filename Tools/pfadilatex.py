@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+import argparse, os, sys
+from pyralala.index import LEGACY_IDX
+from pyralala.latex import EditionRunner, DEFAULT_STATE_DIR, MAX_PASSES
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build editions with as few pdflatex passes as possible: the passes '
+                                                 'stop as soon as the index (.sbx) and the .aux do not change anymore.')
+    parser.add_argument("editions", nargs="+", metavar="edition",
+                        help="Editions, by name or as Ausgaben/<name>.tex, relative to the repository root.")
+    parser.add_argument("-V", "--variant", action="append", default=[], choices=["print", "pics", "ebook"],
+                        help="Also build this variant with the final index, can be given multiple times.")
+    parser.add_argument("--max-passes", type=int, default=MAX_PASSES,
+                        help="Fail, if the index did not converge after this many passes (default: {}).".format(
+                            MAX_PASSES))
+    parser.add_argument("--state", default=DEFAULT_STATE_DIR,
+                        help="Directory of the index states (default: {}).".format(DEFAULT_STATE_DIR))
+    parser.add_argument("--legacy-marker", default=LEGACY_IDX,
+                        help="Marks the titles of another edition in a combined index, & is the title "
+                             "(default: {}).".format(LEGACY_IDX.replace("%", "%%")))
+    parser.add_argument("-v", "--verbose", action="store_true", help="Print the commands.")
+    args = parser.parse_args()
+
+    failed = False
+    for edition in args.editions:
+        edition = os.path.splitext(os.path.basename(edition))[0]
+        runner = EditionRunner(edition, args.state, args.max_passes, sys.stdout if args.verbose else None,
+                               args.legacy_marker)
+        try:
+            runner.run([""] + ["-" + v for v in args.variant])
+        except Exception as e:
+            print("failed  Ausgaben/{}: {}".format(edition, e))
+            failed = True
+            continue
+        print("Ausgaben/{}: {} pdflatex passes, {} songidx runs.".format(edition, runner.passes, runner.index_runs))
+    sys.exit(1 if failed else 0)
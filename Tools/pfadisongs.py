@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+import argparse, glob, os, sys, time
+from pyralala.deps import DependencyScanner
+from pyralala.songpdf import SongFormat, compile_songs, DEFAULT_FORMAT_DIR, SONG_TEMPLATE
+
+
+def outdated(song, pdf, scanner):
+    """ True if pdf is older than the song, Misc/Song.tex or a file they include. """
+    try:
+        built = os.path.getmtime(pdf)
+    except OSError:
+        return True
+    deps = scanner.dependencies(song) + scanner.dependencies(SONG_TEMPLATE)
+    return any(os.path.exists(d) and os.path.getmtime(d) > built for d in deps)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compile a pdf of each song with a preloaded format of the '
+                                                 'Misc/Song.tex preamble and parallel pdflatex jobs.')
+    parser.add_argument("files", nargs="*", metavar="file", default=["Lieder"],
+                        help="Songs, or directories containing them, relative to the repository root "
+                             "(default: Lieder).")
+    parser.add_argument("-o", "--out", default="PDFs", help="Output directory (default: PDFs).")
+    parser.add_argument("-j", "--jobs", type=int, help="Number of parallel pdflatex jobs (default: number of CPUs).")
+    parser.add_argument("-f", "--force", action="store_true", help="Also compile songs whose pdf is up to date.")
+    parser.add_argument("--no-format", action="store_true", help="Compile the full preamble for each song.")
+    parser.add_argument("--cache", metavar="DIR", default=DEFAULT_FORMAT_DIR,
+                        help="Directory of the format (default: {}).".format(DEFAULT_FORMAT_DIR))
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    songs = []
+    for path in args.files:
+        songs += sorted(glob.glob(os.path.join(path, "*.tex"))) if os.path.isdir(path) else [path]
+
+    scanner = DependencyScanner(os.path.join(os.path.dirname(args.cache.rstrip("/")), "deps.json"))
+    if not args.force:
+        songs = [s for s in songs
+                 if outdated(s, os.path.join(args.out, os.path.splitext(os.path.basename(s))[0] + ".pdf"), scanner)]
+    scanner.save()
+
+    song_format = None if args.no_format else SongFormat(args.cache, scanner=scanner)
+    errors = compile_songs(songs, args.out, song_format, args.jobs)
+    if song_format is not None and song_format.error is not None:
+        print("warning {}".format(song_format.error))
+
+    for song, error in sorted(errors.items()):
+        print("failed  {}".format(error))
+    print("{} of {} songs compiled, {} failed in {:.2f} s.".format(
+        len(songs) - len(errors), len(songs), len(errors), time.perf_counter() - start))
+    sys.exit(1 if errors else 0)
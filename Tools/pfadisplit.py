@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+import argparse, sys, time
+from pyralala.split import split_edition
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Split the pdf of an edition with all songs into a pdf per song, '
+                                                 'by the pages of the songs in its index (.sxd).')
+    parser.add_argument("edition", nargs="?", default="Ausgaben/SplitEdition.tex",
+                        help="The compiled edition, each song starting on a new page, see "
+                             "Tools/generate_songbook.sh --split (default: Ausgaben/SplitEdition.tex).")
+    parser.add_argument("-o", "--out", default="PDFs", help="Output directory (default: PDFs).")
+    parser.add_argument("--pdf", help="The pdf of the edition (default: the edition with .pdf).")
+    parser.add_argument("--sxd", help="The index of the edition (default: the edition with .sxd).")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        written = split_edition(args.edition, args.out, args.pdf, args.sxd)
+    except Exception as e:
+        print("failed  {}: {}".format(args.edition, e))
+        sys.exit(1)
+    print("{} song pdfs with {} pages written in {:.2f} s.".format(len(written), sum(written.values()),
+                                                                   time.perf_counter() - start))
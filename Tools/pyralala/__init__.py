@@ -6,61 +6,116 @@ Pyralala
 @site: jonashoechst.de
 """
 from pyralala.data import *
-import TexSoup
+from pyralala.data import DEFAULT_CHORD_TABLE
+from pyralala.lexer import Arg, Command, tokenize, plain_text
+from pyralala.chords import Chord, Transposer, parse_chord
 import re
 
-# TexSoup parses the chords backets as math environment, as '\[' begins this.
-# As chors don't end like a math env, but just with a closing brackt, TexSoup fails parsing.
-# As a workaround, the math backets just ignored for our case.
-# The ALL_TOKENS constant needs to be rewritten.
-TexSoup.reader.MATH_TOKENS.remove('\[')
-TexSoup.reader.MATH_TOKENS.remove('\]')
-TexSoup.reader.ALL_TOKENS.remove('\[')
-TexSoup.reader.ALL_TOKENS.remove('\]')
+
+def __getattr__(name):
+    # heavier modules are only imported on first use, to keep startup fast
+    if name == "SongCache":
+        from pyralala.cache import SongCache
+        return SongCache
+    if name == "Library":
+        from pyralala.library import Library
+        return Library
+    if name == "SearchIndex":
+        from pyralala.search import SearchIndex
+        return SearchIndex
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
 
 
 IGNORE_CMD = {"intersong", "centering", "markboth", "beginscripture", "endscripture",
-              "nolyrics", "newline", "newpage", "transpose", "vfill", "newchords", "$"}
+              "nolyrics", "newline", "newpage", "vfill", "newchords", "$",
+              "hfill", "vspace", "gtab", "break", "bf", "bfseries", "notenames"}
+
+# songs package environments, which are handled like their \begin... commands
+SONG_ENVIRONMENTS = {"verse", "verse*", "chorus"}
+
+
+def _patch_texsoup():
+    r""" Prepares TexSoup for parsing chords, only needed by the TexSoup fallback.
+
+    TexSoup parses the chords backets as math environment, as '\[' begins this.
+    As chors don't end like a math env, but just with a closing brackt, TexSoup fails parsing.
+    As a workaround, the math backets just ignored for our case.
+    The ALL_TOKENS constant needs to be rewritten.
+    """
+    import TexSoup
+    for tokens in (TexSoup.reader.MATH_TOKENS, TexSoup.reader.ALL_TOKENS):
+        tokens.discard('\\[')
+        tokens.discard('\\]')
+    return TexSoup
+
+
+def texsoup_tokenize(source):
+    """ Yields the same tokens as pyralala.lexer.tokenize, using TexSoup. """
+    TexSoup = _patch_texsoup()
+
+    def convert(d):
+        if isinstance(d, str):
+            yield str(d)
+        elif isinstance(d, TexSoup.data.RArg):
+            yield d.value
+        # probably an escaped sharp-chord
+        elif d.name.startswith("#"):
+            yield str(d)[1:]
+        elif isinstance(d, TexSoup.data.TexEnv) and d.name in SONG_ENVIRONMENTS:
+            yield Command("begin", [Arg(d.name)])
+            for c in d.contents:
+                yield from convert(c)
+            yield Command("end", [Arg(d.name)])
+        else:
+            yield Command(d.name, [Arg(a.value, isinstance(a, TexSoup.data.OArg)) for a in d.args])
+
+    for d in TexSoup.TexSoup(source).expr.contents:
+        yield from convert(d)
 
 
 class SongReader:
-    def __init__(self, file_path):
+    def __init__(self, file_path, tokenizer=tokenize, chord_table=DEFAULT_CHORD_TABLE):
         self.file_path = file_path
         with open(file_path, "r") as file:
             self.lines = file.read()
 
-        self.tex = TexSoup.TexSoup(self.lines)
+        self.tokenizer = tokenizer
+        self.chord_table = chord_table
         self.song = DummySong()
         self._commands = {'everychorus': 'Refrain'}
 
     @staticmethod
     def parse_opt_args(args):
         parsed = []
-        ex = re.compile(r"(\w+={[\w \(\),]+})")
-        for pair in ex.findall(args):
-            key, val = pair.split("=")
-            parsed.append((key, val.strip("{}")))
+        ex = re.compile(r"(\w+)\s*=\s*{([^{}]*)}")
+        for key, val in ex.findall(args):
+            parsed.append((key, " ".join(val.split())))
         return parsed
 
+    def read_arg(self, arg):
+        for d in self.tokenizer(arg.value):
+            self.read_content(d)
+
     def read_content(self, d):
         if isinstance(d, str):
             self.song.add_text(d)
-        elif isinstance(d, TexSoup.data.RArg):
-            self.song.add_text(d.value)
 
         elif d.name == "beginsong":
             for a in d.args:
-                if isinstance(a, TexSoup.data.RArg):
-                    self.song = Song(a.value)
-                elif isinstance(a, TexSoup.data.OArg):
+                if not a.optional:
+                    self.song = Song(a.value, chord_table=self.chord_table)
+                else:
                     self.song.info = SongReader.parse_opt_args(a.value)
         elif d.name == "endsong":
             self.song.endsong()
 
         elif d.name == "renewcommand":
-            name = d.args[0].contents[0].name
-            arg = list(d.contents)[1].args.all[0].contents[1]
-            self._commands[name] = arg
+            name = d.args[0].value.strip().lstrip("\\")
+            self._commands[name] = plain_text(d.args[1].contents).strip()
+
+        elif d.name in ("begin", "end"):
+            if d.args[0].value in SONG_ENVIRONMENTS:
+                self.read_content(Command(d.name + d.args[0].value))
 
         elif d.name == "beginchorus":
             self.song.beginchorus(self._commands['everychorus'])
@@ -68,20 +123,16 @@ class SongReader:
             self.song.beginchorus("Refrain (wdh.)")
             self.song.endmusicpart()
         elif d.name == "repchorus":
-            self.song.beginchorus("Refrain ({}x)".format(d.args[0]))
+            self.song.beginchorus("Refrain ({}x)".format(d.args[0].value))
             self.song.endmusicpart()
 
         elif d.name == "beginverse":
             self.song.beginverse()
-            for c in d.contents:
-                self.song.add_text(c)
         elif d.name == "beginverse*":
             self.song.beginanonverse()
-            for c in d.contents:
-                self.song.add_text(c)
         elif d.name == "interlude":
             self.song.beginanonverse()
-            self.song.add_text(d.args[0])
+            self.read_arg(d.args[0])
             self.song.endmusicpart()
 
         elif d.name in ["endverse", "endverse*", "endchorus"]:
@@ -89,38 +140,44 @@ class SongReader:
 
         elif d.name == "memorize":
             if len(d.args) == 1:
-                self.song.memorize(key=d.args[0])
+                self.song.memorize(key=d.args[0].value)
             else:
                 self.song.memorize()
         elif d.name == "replay":
             if len(d.args) == 1:
-                self.song.replay(key=d.args[0])
+                self.song.replay(key=d.args[0].value)
             else:
                 self.song.replay()
 
+        elif d.name == "transpose":
+            self.song.transpose(int(d.args[0].value))
+
         elif d.name == "lrep":
             self.song.add_text("|:")
         elif d.name == "rrep":
             self.song.add_text(":|")
         elif d.name == "rep":
-            self.song.add_text(" (x{})".format(d.args[0]))
+            self.song.add_text(" (x{})".format(d.args[0].value))
         elif d.name == "echo":
-            self.song.add_text("({})".format(d.args[0]))
+            self.song.add_text("(")
+            self.read_arg(d.args[0])
+            self.song.add_text(")")
         elif d.name == "emph":
-            self.song.add_text("*{}*".format(d.args[0]))
+            self.song.add_text("*")
+            self.read_arg(d.args[0])
+            self.song.add_text("*")
+        elif d.name in ["textit", "textbf", "textnote"]:
+            self.read_arg(d.args[0])
 
         elif d.name == "includegraphics":
             options = []
             for a in d.args:
-                if isinstance(a, TexSoup.data.RArg):
+                if not a.optional:
                     path = a.value
-                elif isinstance(a, TexSoup.data.OArg):
+                else:
                     options = SongReader.parse_opt_args(a.value)
             self.song.includegraphics(path, options)
 
-        # probably an escaped sharp-chord
-        elif d.name.startswith("#"):
-            self.song.add_text(str(d)[1:])
         elif d.name in IGNORE_CMD:
             pass
         else:
@@ -128,9 +185,5 @@ class SongReader:
                 "Element is not parsed: \"{}\" ({})".format(d.name, type(d)))
 
     def read(self):
-        try:
-            for d in self.tex.expr.contents:
-                self.read_content(d)
-        except AttributeError as e:
-            print(d)
-            raise e
+        for d in self.tokenizer(self.lines):
+            self.read_content(d)
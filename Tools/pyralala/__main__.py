@@ -0,0 +1,64 @@
+"""
+Command line interface: python -m pyralala export --format txt,md,html Lieder -o out
+"""
+import argparse
+import sys
+
+
+def export(args):
+    from pyralala.batch import FORMATS, export_corpus
+    from pyralala.library import find_songs
+
+    formats = [f.strip() for f in args.format.split(",") if f.strip()]
+    for fmt in formats:
+        if fmt not in FORMATS:
+            print("Unknown format {}, choose from {}.".format(fmt, ", ".join(FORMATS)), file=sys.stderr)
+            return 2
+
+    options = {"transpose": args.transpose, "notation": args.notation, "width": args.width, "minify": args.minify,
+               "svg_cache": args.svg_cache}
+    report = export_corpus(list(find_songs(args.files)), args.out, formats, options, args.cache, args.jobs,
+                           args.force)
+
+    for path, errors in sorted(report.errors.items()):
+        for stage, error in sorted(errors.items()):
+            print("failed  {} [{}] ({})".format(path, stage, error))
+    for line in report.lines():
+        print(line)
+    print("{} outputs unchanged, {} songs failed.".format(report.skipped, len(report.errors)))
+    return 1 if report.errors else 0
+
+
+def main(argv=None):
+    from pyralala.chords import NOTATIONS
+
+    parser = argparse.ArgumentParser(prog="python -m pyralala", description="Tools for the songs of Pfadiralala.")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    export_parser = commands.add_parser("export", help="Export songs as text, markdown and html files.")
+    export_parser.add_argument("files", nargs="+", metavar="file",
+                               help="The LaTeX song files, or directories containing them.")
+    export_parser.add_argument("-o", "--out", default="export",
+                               help="Output directory, each format is written into a subdirectory (default: export).")
+    export_parser.add_argument("-f", "--format", default="txt,md,html",
+                               help="Comma separated output formats: txt, md, html (default: all).")
+    export_parser.add_argument("-j", "--jobs", type=int,
+                               help="Number of worker processes (default: number of CPUs).")
+    export_parser.add_argument("-t", "--transpose", type=int, default=0,
+                               help="Transpose all chords by this number of semitones, in addition to \\transpose.")
+    export_parser.add_argument("-n", "--notation", choices=sorted(NOTATIONS), default="german",
+                               help="Note names of transposed chords (default: german).")
+    export_parser.add_argument("-w", "--width", type=int, help="Wrap txt and md lines to this number of columns.")
+    export_parser.add_argument("--minify", action="store_true", help="Minify the html output.")
+    export_parser.add_argument("--force", action="store_true", help="Export all songs, even unchanged ones.")
+    export_parser.add_argument("--svg-cache", metavar="DIR", help="Cache converted graphics in this directory.")
+    export_parser.add_argument("--cache", metavar="DIR", help="Cache parsed songs in this directory.")
+    export_parser.set_defaults(run=export)
+
+    args = parser.parse_args(argv)
+    return args.run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
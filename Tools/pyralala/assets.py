@@ -0,0 +1,95 @@
+"""
+Shared stylesheet, minification and precompression of exported files
+"""
+import os
+import re
+
+__all__ = ["stylesheet", "write_stylesheet", "minify_css", "minify_html", "minify_lines", "write_file",
+           "compress_file"]
+
+STYLESHEET = os.path.join(os.path.dirname(__file__), "pyralala.css")
+
+_CSS_COMMENT = re.compile(r"/\*.*?\*/", re.S)
+_CSS_SPACE = re.compile(r"\s*([{};,>])\s*")
+# innermost blocks hold the declarations, a space before a colon of a selector is a descendant combinator
+_CSS_DECLARATIONS = re.compile(r"{[^{}]*}")
+_CSS_COLON = re.compile(r"\s*:\s*")
+
+_stylesheet = None
+
+
+def stylesheet():
+    """ Returns the stylesheet and a hash of its content, it is read once per process. """
+    global _stylesheet
+    if _stylesheet is None:
+        import hashlib
+
+        with open(STYLESHEET, "r") as css_file:
+            css = css_file.read()
+        _stylesheet = (css, hashlib.sha256(css.encode()).hexdigest()[:12])
+    return _stylesheet
+
+
+def minify_css(css):
+    css = _CSS_COMMENT.sub("", css)
+    css = _CSS_SPACE.sub(r"\1", " ".join(css.split()))
+    css = _CSS_DECLARATIONS.sub(lambda m: _CSS_COLON.sub(":", m.group(0)), css)
+    return css.replace(";}", "}")
+
+
+def minify_lines(chunks):
+    """ Yields the lines of html chunks without indentation and empty lines.
+
+    Line breaks are kept, as they separate inline elements.
+    """
+    for chunk in chunks:
+        for line in chunk.splitlines():
+            line = line.strip()
+            if len(line) > 0:
+                yield line
+
+
+def minify_html(html):
+    return "\n".join(minify_lines([html]))
+
+
+def write_stylesheet(directory, compress=False):
+    """ Writes the minified stylesheet as pyralala.<hash>.css into directory, returns its file name.
+
+    The file is only written, if it does not exist yet, as its name changes with its content.
+    """
+    css, css_hash = stylesheet()
+    name = "pyralala.{}.css".format(css_hash)
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        write_file(path, minify_css(css), compress)
+    return name
+
+
+def write_file(path, text, compress=False):
+    """ Writes text to path, with compress also as .gz and, if brotli is installed, .br file. """
+    data = text.encode()
+    with open(path, "wb") as out:
+        out.write(data)
+    if compress:
+        compress_file(path, data)
+
+
+def compress_file(path, data=None):
+    """ Writes path.gz and, if brotli is installed, path.br next to path. """
+    import gzip
+
+    if data is None:
+        with open(path, "rb") as in_file:
+            data = in_file.read()
+    with open(path + ".gz", "wb") as out:
+        # mtime=0 keeps the output reproducible
+        out.write(gzip.compress(data, compresslevel=9, mtime=0))
+
+    try:
+        import brotli
+    except ImportError:
+        return
+    with open(path + ".br", "wb") as out:
+        out.write(brotli.compress(data, mode=brotli.MODE_TEXT))
@@ -0,0 +1,214 @@
+"""
+Export of a corpus into several formats, with a single parse per song
+"""
+import os
+import json
+import time
+import collections
+
+from pyralala.cache import file_hash, template_hash
+
+__all__ = ["FORMATS", "ExportReport", "export_song", "export_corpus"]
+
+# format: compiler class name in pyralala.export, file extension
+FORMATS = collections.OrderedDict([
+    ("txt", ("Compiler", ".txt")),
+    ("md", ("MarkdownCompiler", ".md")),
+    ("html", ("HTMLCompiler", ".html")),
+])
+MANIFEST = ".manifest.json"
+
+# songs are only exported in worker processes, if enough of them changed
+MIN_PARALLEL_SONGS = 32
+
+
+def compiler_options(fmt, options):
+    """ Returns the keyword arguments of the compiler of fmt, which change its output. """
+    args = {"transpose": options.get("transpose", 0), "notation": options.get("notation", "german")}
+    if fmt == "html":
+        args["minify"] = options.get("minify", False)
+    else:
+        args["width"] = options.get("width")
+    return args
+
+
+def _compiler(fmt, options):
+    import pyralala.export
+
+    args = compiler_options(fmt, options)
+    if fmt == "html":
+        from pyralala.graphics import SVGCache
+
+        args["stylesheet"] = options.get("stylesheet")
+        if options.get("svg_cache"):
+            args["graphics"] = SVGCache(options["svg_cache"])
+    return getattr(pyralala.export, FORMATS[fmt][0])(**args)
+
+
+def export_song(path, outputs, options, cache_dir=None):
+    """ Parses a song once and writes it in each format of outputs, a list of (format, output path).
+
+    Returns the seconds spent per stage, the graphics the song includes and the
+    error messages per stage.
+    """
+    import pyralala
+
+    timings = {}
+    errors = {}
+    start = time.perf_counter()
+    try:
+        if cache_dir:
+            song = pyralala.SongCache(cache_dir).read(path)
+        else:
+            reader = pyralala.SongReader(path)
+            reader.read()
+            song = reader.song
+    except Exception as e:
+        errors["parse"] = "{}: {}".format(type(e).__name__, e)
+        return timings, [], errors
+    finally:
+        timings["parse"] = time.perf_counter() - start
+
+    graphics = [part.path for part in song._contents if isinstance(part, song.Graphics)]
+    for fmt, out_path in outputs:
+        start = time.perf_counter()
+        compiler = _compiler(fmt, options)
+        try:
+            with open(out_path + ".tmp", "w") as out:
+                compiler.compile_to(song, out)
+            os.replace(out_path + ".tmp", out_path)
+        except Exception as e:
+            errors[fmt] = "{}: {}".format(type(e).__name__, e)
+            if os.path.exists(out_path + ".tmp"):
+                os.remove(out_path + ".tmp")
+        timings[fmt] = time.perf_counter() - start
+    return timings, graphics, errors
+
+
+def _export_song(item):
+    return export_song(*item)
+
+
+class ExportReport(object):
+    """ Summary of an export: counts and seconds per stage, and errors per song. """
+
+    def __init__(self):
+        self.seconds = collections.OrderedDict()
+        self.counts = collections.OrderedDict()
+        self.errors = {}
+        self.skipped = 0
+
+    def add(self, stage, seconds, count=1):
+        self.seconds[stage] = self.seconds.get(stage, 0) + seconds
+        self.counts[stage] = self.counts.get(stage, 0) + count
+
+    def lines(self):
+        yield "{:<8} {:>10} {:>7}".format("stage", "ms", "count")
+        for stage, seconds in self.seconds.items():
+            yield "{:<8} {:>10.1f} {:>7}".format(stage, seconds * 1000, self.counts[stage])
+
+
+def _load_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST), "r") as manifest_file:
+            return json.load(manifest_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(out_dir, manifest):
+    path = os.path.join(out_dir, MANIFEST)
+    with open(path + ".tmp", "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def _up_to_date(entry, key, out_path):
+    if entry is None or entry["key"] != key or not os.path.exists(out_path):
+        return False
+    try:
+        return all(file_hash(pdf) == pdf_hash for pdf, pdf_hash in entry["graphics"].items())
+    except OSError:
+        return False
+
+
+def export_corpus(files, out_dir, formats=("txt", "md", "html"), options={}, cache_dir=None, jobs=None,
+                  force=False):
+    """ Writes each song of files into out_dir/<format>/, skipping outputs whose inputs are unchanged.
+
+    Outputs of songs no longer in files are removed, in the formats of this export.
+    Returns an ExportReport. Parse and compile times are summed over all worker processes.
+    """
+    report = ExportReport()
+    wall = time.perf_counter()
+    options = dict(options)
+    if "html" in formats:
+        from pyralala.assets import write_stylesheet
+
+        options["stylesheet"] = write_stylesheet(os.path.join(out_dir, "html"))
+    for fmt in formats:
+        os.makedirs(os.path.join(out_dir, fmt), exist_ok=True)
+
+    # decide which outputs of which songs are outdated
+    start = time.perf_counter()
+    old = _load_manifest(out_dir)
+    manifest = {}
+    templates = dict((fmt, template_hash(dict(compiler_options(fmt, options), format=fmt))) for fmt in formats)
+    todo = []
+    keys = {}
+    for path in files:
+        song_hash = file_hash(path)
+        name = os.path.splitext(os.path.basename(path))[0]
+        outputs = []
+        for fmt in formats:
+            out_name = os.path.join(fmt, name + FORMATS[fmt][1])
+            key = "{}-{}".format(templates[fmt], song_hash)
+            keys[out_name] = key
+            if not force and _up_to_date(old.get(out_name), key, os.path.join(out_dir, out_name)):
+                manifest[out_name] = old[out_name]
+                report.skipped += 1
+            else:
+                outputs.append((fmt, os.path.join(out_dir, out_name)))
+        if len(outputs) > 0:
+            todo.append((path, outputs, options, cache_dir))
+    report.add("check", time.perf_counter() - start, len(files))
+
+    if len(todo) >= MIN_PARALLEL_SONGS and jobs != 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(_export_song, todo, chunksize=8))
+    else:
+        results = [_export_song(item) for item in todo]
+
+    for (path, outputs, _, _), (timings, graphics, errors) in zip(todo, results):
+        if "parse" in timings:
+            report.add("parse", timings["parse"])
+        for fmt, out_path in outputs:
+            if fmt in timings:
+                report.add(fmt, timings[fmt])
+            if fmt in errors or "parse" in errors:
+                continue
+            out_name = os.path.relpath(out_path, out_dir)
+            # only html embeds the graphics
+            try:
+                graphics_hashes = dict((pdf, file_hash(pdf)) for pdf in graphics if fmt == "html")
+            except OSError:
+                continue
+            manifest[out_name] = {"key": keys[out_name], "graphics": graphics_hashes}
+        if len(errors) > 0:
+            report.errors[path] = errors
+
+    # remove outputs of songs, which were deleted or renamed, other formats are kept for their next export
+    for out_name, entry in old.items():
+        if out_name in keys:
+            continue
+        if out_name.split(os.sep)[0] in formats:
+            if os.path.exists(os.path.join(out_dir, out_name)):
+                os.remove(os.path.join(out_dir, out_name))
+        else:
+            manifest[out_name] = entry
+    _save_manifest(out_dir, manifest)
+    report.add("total", time.perf_counter() - wall, len(todo))
+    return report
+
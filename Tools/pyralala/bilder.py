@@ -0,0 +1,148 @@
+"""
+Pictures of Bilder/ derived per pdf variant: grayscale for print, smaller for ebooks
+"""
+import os
+import shutil
+import hashlib
+import threading
+import subprocess
+
+from pyralala.cache import DEFAULT_CACHE_DIR
+
+__all__ = ["ImageCache", "derive_images", "derived_path", "graphics_path", "VARIANT_OPTIONS"]
+
+CONVERT = ["convert"]
+# ImageMagick options of each variant, the pictures fit on an A5 page at the given resolution
+VARIANT_OPTIONS = {
+    "print": ["-colorspace", "Gray", "-resize", "1748x2480>", "-density", "300", "-units", "PixelsPerInch", "-strip"],
+    "ebook": ["-resize", "874x1240>", "-density", "150", "-units", "PixelsPerInch", "-quality", "75", "-strip"],
+}
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+# changing the derivation invalidates the cache
+BILDER_VERSION = b"1"
+
+
+def graphics_path(directory, variant):
+    """ TEXINPUTS for pdflatex to find the pictures of a variant before the originals.
+
+    Bilder/<name> is searched in the derived directory first, the empty entry
+    at the end keeps the default search path, including the originals. The
+    TEXINPUTS of the environment is read on each call, right before pdflatex runs.
+    """
+    return os.path.join(directory, variant) + os.pathsep + os.environ.get("TEXINPUTS", "")
+
+
+class ImageCache(object):
+    """ Derives pictures with ImageMagick, each distinct picture and variant only once.
+
+    Results are stored per variant by a hash of the picture and the options of
+    the variant, so renaming or copying a picture does not convert it again.
+    """
+
+    def __init__(self, directory=os.path.join(DEFAULT_CACHE_DIR, "bilder")):
+        self.directory = directory
+        self.conversions = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(directory, "objects"), exist_ok=True)
+
+    def derive(self, path, variant, out_path):
+        """ Writes the picture of a variant to out_path, only if its content changes.
+
+        Returns the path of the cached picture.
+        """
+        options = VARIANT_OPTIONS[variant]
+        ext = os.path.splitext(path)[1].lower()
+        digest = hashlib.sha256(BILDER_VERSION)
+        with open(path, "rb") as image_file:
+            digest.update(hashlib.sha256(image_file.read()).digest())
+        digest.update(" ".join(CONVERT + options).encode())
+        cached = os.path.join(self.directory, "objects", variant, digest.hexdigest() + ext)
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+
+        if not os.path.exists(cached):
+            temp = "{}.tmp.{}{}".format(cached, os.getpid(), ext)
+            try:
+                result = subprocess.run(CONVERT + [path] + options + [temp], stdout=subprocess.PIPE,
+                                        stderr=subprocess.STDOUT, universal_newlines=True, errors="replace")
+            except OSError as e:
+                raise Exception("{}: {}".format(path, e))
+            if result.returncode != 0 or not os.path.exists(temp):
+                if os.path.exists(temp):
+                    os.remove(temp)
+                raise Exception("{}: convert failed:\n{}".format(path, result.stdout.strip()))
+            # atomic, parallel runs may derive the same picture
+            os.replace(temp, cached)
+            with self._lock:
+                self.conversions += 1
+
+        if os.path.exists(out_path) and os.path.getsize(out_path) == os.path.getsize(cached):
+            with open(out_path, "rb") as out_file, open(cached, "rb") as cached_file:
+                if out_file.read() == cached_file.read():
+                    return cached
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        shutil.copyfile(cached, out_path)
+        return cached
+
+    def evict(self, variant, used):
+        """ Removes the cached pictures of a variant, which are not in used. """
+        used = set(os.path.normpath(p) for p in used)
+        directory = os.path.join(self.directory, "objects", variant)
+        if not os.path.isdir(directory):
+            return
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            # temporary files of running conversions are kept
+            if os.path.normpath(path) not in used and ".tmp." not in name:
+                os.remove(path)
+
+
+def derived_path(out_dir, variant, path):
+    """ Path of the picture of a variant, pdflatex finds it by the path relative to the repository root. """
+    relative = os.path.relpath(path)
+    if relative.startswith(os.pardir + os.sep):
+        raise Exception("{} is outside of the current directory.".format(path))
+    return os.path.join(out_dir, variant, relative)
+
+
+def derive_images(paths, out_dir, variants=("print", "ebook"), cache=None, jobs=None, prune=False):
+    """ Derives the pictures into out_dir/<variant>/<path> with a pool of threads.
+
+    With prune, other files in out_dir/<variant>, e.g. of removed originals,
+    are deleted, and the cached pictures no picture of paths uses are evicted.
+    Returns the errors by (path, variant).
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    cache = cache or ImageCache()
+    items = [(path, variant) for variant in variants for path in paths]
+
+    used = set()
+
+    def run(item):
+        path, variant = item
+        out = None
+        try:
+            out = derived_path(out_dir, variant, path)
+            used.add(cache.derive(path, variant, out))
+        except Exception as e:
+            # pdflatex uses the original instead of an outdated picture
+            if out is not None and os.path.exists(out):
+                os.remove(out)
+            return e
+        return None
+
+    # ImageMagick runs in separate processes, threads are enough to run it in parallel
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as executor:
+        results = list(executor.map(run, items))
+
+    if prune:
+        for variant in variants:
+            cache.evict(variant, used)
+        expected = set(os.path.normpath(derived_path(out_dir, variant, path)) for (path, variant), error
+                       in zip(items, results) if error is None)
+        for variant in variants:
+            for root, _, files in os.walk(os.path.join(out_dir, variant)):
+                for name in files:
+                    if os.path.normpath(os.path.join(root, name)) not in expected:
+                        os.remove(os.path.join(root, name))
+    return dict((item, error) for item, error in zip(items, results) if error is not None)
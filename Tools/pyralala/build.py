@@ -0,0 +1,264 @@
+"""
+Build of files by content hashes, with independent tasks run in parallel
+"""
+import os
+import sys
+import json
+import hashlib
+
+__all__ = ["Task", "BuildDB", "Builder"]
+
+DB_VERSION = 1
+
+
+class Task(object):
+    """ A build step, it runs its commands if its commands or the content of an input changed.
+
+    Commands are argument lists or shell command strings, run in the build root
+    with env added to the environment, or functions called with the task.
+    Tasks producing an input of a task run before it, after lists further
+    tasks to run before. Tasks with the same lock never run at the same time,
+    e.g. passes writing the same auxiliary files.
+    """
+
+    def __init__(self, name, inputs=(), outputs=(), commands=(), env=None, after=(), lock=None):
+        self.name = name
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.commands = list(commands)
+        self.env = env or {}
+        self.after = list(after)
+        self.lock = lock
+
+    def __repr__(self):
+        return "Task({!r})".format(self.name)
+
+    def describe(self):
+        """ Returns the commands as text, functions by their name. """
+        lines = []
+        env = "".join("{}={} ".format(k, v) for k, v in sorted(self.env.items()))
+        for command in self.commands:
+            if callable(command):
+                lines.append("{}({})".format(command.__name__, self.name))
+            elif isinstance(command, str):
+                lines.append(env + command)
+            else:
+                lines.append(env + " ".join(command))
+        return lines
+
+
+class BuildDB(object):
+    """ File hashes and task signatures of previous builds.
+
+    A file is only hashed again when its size or modification time changed,
+    so touching a file or checking it out again does not cause a rebuild.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.files = {}
+        self.tasks = {}
+        self._changed = False
+        try:
+            with open(path, "r") as db_file:
+                data = json.load(db_file)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == DB_VERSION:
+            self.files = data["files"]
+            self.tasks = data["tasks"]
+
+    def hash(self, path):
+        """ Returns the sha256 of a file, or None if it does not exist. """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        entry = self.files.get(path)
+        if entry is not None and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+            return entry[2]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as hashed_file:
+            for block in iter(lambda: hashed_file.read(1 << 20), b""):
+                digest.update(block)
+        self.files[path] = [stat.st_mtime_ns, stat.st_size, digest.hexdigest()]
+        self._changed = True
+        return digest.hexdigest()
+
+    def signature(self, task):
+        """ Hash of the commands and input contents of task, None if an input is missing. """
+        digest = hashlib.sha256(json.dumps([task.describe(), sorted(task.env.items())]).encode())
+        for path in task.inputs:
+            file_hash = self.hash(path)
+            if file_hash is None:
+                return None
+            digest.update("{}\0{}\0".format(path, file_hash).encode())
+        return digest.hexdigest()
+
+    def record(self, task, signature):
+        self.tasks[task.name] = signature
+        self._changed = True
+
+    def forget(self, task):
+        if self.tasks.pop(task.name, None) is not None:
+            self._changed = True
+
+    def save(self):
+        if not self._changed:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with open(self.path + ".tmp", "w") as db_file:
+            json.dump({"version": DB_VERSION, "files": self.files, "tasks": self.tasks}, db_file)
+        os.replace(self.path + ".tmp", self.path)
+        self._changed = False
+
+
+class Builder(object):
+    """ Runs the outdated tasks needed for targets, independent tasks in parallel. """
+
+    def __init__(self, tasks, db, jobs=None, dry_run=False, keep_going=False, out=sys.stdout):
+        self.tasks = dict((task.name, task) for task in tasks)
+        self.producers = {}
+        for task in tasks:
+            for path in task.outputs:
+                self.producers[path] = task
+        self.db = db
+        self.jobs = jobs or os.cpu_count()
+        self.dry_run = dry_run
+        self.keep_going = keep_going
+        self.out = out
+        self.ran = []
+        self.failed = {}
+
+    def resolve(self, target):
+        """ Returns the task of a task name or an output path. """
+        if target in self.tasks:
+            return self.tasks[target]
+        if target in self.producers:
+            return self.producers[target]
+        raise Exception("No task builds {}.".format(target))
+
+    def _dependencies(self, task):
+        deps = [self.producers[path] for path in task.inputs if path in self.producers]
+        deps += [self.resolve(name) for name in task.after]
+        return [d for i, d in enumerate(deps) if d is not task and d not in deps[:i]]
+
+    def _needed(self, targets):
+        # tasks of targets and their dependencies, dependencies first
+        order = []
+        state = {}
+        for target in targets:
+            stack = [(self.resolve(target), False)]
+            while len(stack) > 0:
+                task, expanded = stack.pop()
+                if expanded:
+                    state[task.name] = "done"
+                    order.append(task)
+                    continue
+                if state.get(task.name) == "done":
+                    continue
+                if state.get(task.name) == "visiting":
+                    raise Exception("Dependency cycle at {}.".format(task.name))
+                state[task.name] = "visiting"
+                stack.append((task, True))
+                stack += [(d, False) for d in reversed(self._dependencies(task)) if state.get(d.name) != "done"]
+        return order
+
+    def _run(self, task):
+        """ Runs the commands of task, returns None or an error message. """
+        import subprocess
+
+        env = dict(os.environ, **task.env)
+        for command, text in zip(task.commands, task.describe()):
+            if callable(command):
+                try:
+                    command(task)
+                except Exception as e:
+                    return "{}: {}".format(type(e).__name__, e)
+                continue
+            result = subprocess.run(command, shell=isinstance(command, str), env=env, stdout=subprocess.PIPE,
+                                    stderr=subprocess.STDOUT, universal_newlines=True)
+            if result.returncode != 0:
+                output = "\n".join(result.stdout.splitlines()[-20:])
+                return "{} failed with exit code {}:\n{}".format(text, result.returncode, output)
+        return None
+
+    def build(self, targets):
+        """ Builds targets, returns True if all tasks succeeded. """
+        from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+        order = self._needed(targets)
+        dependencies = dict((task.name, self._dependencies(task)) for task in order)
+        done = set()
+        # tasks, which will run or ran in this build, their dependents are outdated in a dry run
+        changed = set()
+        locks = set()
+        running = {}
+        signatures = {}
+        pending = list(order)
+
+        # commands run in separate processes, threads are enough to run them in parallel
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            while len(pending) > 0 or len(running) > 0:
+                waiting = len(pending)
+                for task in list(pending):
+                    if len(running) >= self.jobs:
+                        break
+                    deps = dependencies[task.name]
+                    if any(d.name not in done for d in deps) or (task.lock is not None and task.lock in locks):
+                        continue
+                    pending.remove(task)
+                    if any(d.name in self.failed for d in deps):
+                        self.failed[task.name] = "Not built, as a dependency failed."
+                        done.add(task.name)
+                        continue
+
+                    signature = self.db.signature(task)
+                    outdated = (signature is None or self.db.tasks.get(task.name) != signature
+                                or not all(os.path.exists(p) for p in task.outputs)
+                                or (self.dry_run and any(d.name in changed for d in deps)))
+                    if not outdated:
+                        done.add(task.name)
+                        continue
+                    if signature is None and not any(d.name in changed for d in deps):
+                        missing = [p for p in task.inputs if not os.path.exists(p)]
+                        self.failed[task.name] = "Missing inputs: {}".format(", ".join(missing))
+                        done.add(task.name)
+                        continue
+
+                    changed.add(task.name)
+                    for line in task.describe():
+                        print(line, file=self.out)
+                    if self.dry_run:
+                        done.add(task.name)
+                        continue
+                    if task.lock is not None:
+                        locks.add(task.lock)
+                    signatures[task.name] = signature
+                    running[executor.submit(self._run, task)] = task
+
+                if len(running) == 0:
+                    if len(pending) == waiting:
+                        raise Exception("Tasks can not be scheduled: {}".format(pending))
+                    continue
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    task = running.pop(future)
+                    locks.discard(task.lock)
+                    done.add(task.name)
+                    self.ran.append(task)
+                    error = future.result()
+                    if error is None and signatures[task.name] is not None:
+                        self.db.record(task, signatures[task.name])
+                    else:
+                        self.db.forget(task)
+                    if error is not None:
+                        self.failed[task.name] = error
+                        print("failed  {}\n{}".format(task.name, error), file=self.out)
+                        if not self.keep_going:
+                            pending = []
+                self.db.save()
+        self.db.save()
+        return len(self.failed) == 0
@@ -0,0 +1,132 @@
+"""
+On-disk cache of parsed songs, keyed by file content and parser version
+"""
+import os
+import pickle
+import hashlib
+
+__all__ = ["SongCache", "file_hash", "template_hash"]
+
+# Modules the parsed songs depend on, changing one of them invalidates the cache
+PARSER_MODULES = ("__init__.py", "data.py", "lexer.py")
+
+DEFAULT_CACHE_DIR = os.path.join(os.environ.get(
+    "XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "pyralala")
+
+# modules exported songs depend on, besides the options of the output
+TEMPLATE_MODULES = ("__init__.py", "data.py", "lexer.py", "chords.py", "layout.py", "export.py", "assets.py",
+                    "graphics.py", "pyralala.css")
+
+_parser_version = None
+
+
+def parser_version():
+    """ Hash of the parser sources, computed once per process. """
+    global _parser_version
+    if _parser_version is not None:
+        return _parser_version
+
+    digest = hashlib.sha256()
+    for name in PARSER_MODULES:
+        with open(os.path.join(os.path.dirname(__file__), name), "rb") as module_file:
+            digest.update(module_file.read())
+    _parser_version = digest.hexdigest()
+    return _parser_version
+
+
+def file_hash(path, _hashes={}):
+    # files are hashed once per process
+    if path not in _hashes:
+        digest = hashlib.sha256()
+        with open(path, "rb") as hashed_file:
+            digest.update(hashed_file.read())
+        _hashes[path] = digest.hexdigest()
+    return _hashes[path]
+
+
+def template_hash(options, modules=TEMPLATE_MODULES):
+    """ Hash of the pyralala modules and the output options, songs are rendered with. """
+    import json
+
+    digest = hashlib.sha256(json.dumps(options, sort_keys=True).encode())
+    for name in modules:
+        digest.update(file_hash(os.path.join(os.path.dirname(__file__), name)).encode())
+    return digest.hexdigest()
+
+
+class SongCache(object):
+    def __init__(self, directory, max_size=64 * 1024 * 1024):
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(content, tokenizer):
+        digest = hashlib.sha256(parser_version().encode())
+        digest.update(tokenizer.__name__.encode())
+        digest.update(content)
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".pickle")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as cache_file:
+                song = pickle.load(cache_file)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError):
+            self.misses += 1
+            return None
+
+        # mark as recently used for eviction
+        os.utime(path)
+        self.hits += 1
+        return song
+
+    def put(self, key, song):
+        import tempfile
+
+        # write atomically, parallel runs may store the same song
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as cache_file:
+            pickle.dump(song, cache_file, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, self._path(key))
+
+    def read(self, file_path, tokenizer=None):
+        """ Returns the finalized song of file_path, parsing it only on a cache miss. """
+        from pyralala import SongReader, tokenize
+
+        tokenizer = tokenizer or tokenize
+        with open(file_path, "rb") as song_file:
+            content = song_file.read()
+        key = self.key(content, tokenizer)
+
+        song = self.get(key)
+        if song is None:
+            reader = SongReader(file_path, tokenizer=tokenizer)
+            reader.read()
+            song = reader.song
+            self.put(key, song)
+        return song
+
+    def evict(self):
+        """ Removes least recently used entries, until max_size is satisfied. """
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".pickle"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        size = sum(e[1] for e in entries)
+        for _, entry_size, path in sorted(entries):
+            if size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+        return size
@@ -0,0 +1,150 @@
+"""
+Chord symbols and their transposition
+"""
+import re
+
+__all__ = ["Chord", "parse_chord", "Transposer", "NOTATIONS"]
+
+# semitones above C, "B" is the german b flat, "H" the b
+NOTE_VALUES = {"C": 0, "D": 2, "E": 4, "F": 5, "G": 7, "A": 9, "B": 10, "H": 11}
+ACCIDENTALS = {"#": 1, "is": 1, "&": -1, "b": -1, "es": -1, "s": -1}
+
+# note names by semitone above C, spelled with sharps and with flats
+NOTATIONS = {
+    "german": (("C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "H"),
+               ("C", "D&", "D", "E&", "E", "F", "G&", "G", "A&", "A", "B", "H")),
+    "english": (("C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"),
+                ("C", "Db", "D", "Eb", "E", "F", "Gb", "G", "Ab", "A", "Bb", "B")),
+}
+
+# keys written with flats, like the songs package decides it for \transpose
+FLAT_KEYS = {3, 5, 8, 10}
+# minor keys written with flats: Cm, Dm, Fm, Gm and Bbm, e.g. G#m has fewer accidentals than Abm
+FLAT_MINOR_KEYS = {0, 2, 5, 7, 10}
+
+_NOTE = r"([A-Ha-h])(is|es|(?<=[AaEe])s|[#&b])?"
+_QUALITY = r"(?:maj|min|dim|aug|sus|add|m|M|\+|\d+|[#&b]\d+|/9|\(\d+\))*"
+_CHORD = re.compile(r"([(^]*)" + _NOTE + "(" + _QUALITY + ")(?:/" + _NOTE + r")?(\)*)")
+# chord symbols may contain sequences of chords, e.g. "G-C-G" or "Em ~~~ Em"
+_SEPARATORS = re.compile(r"([\s\-~|,]+)")
+_LETTER = re.compile(r"[^\W\d_]")
+
+
+class Chord(object):
+    """ A parsed chord symbol, consisting of literal text and notes.
+
+    Notes are stored as (semitone, lowercase) tuples, all other parts as strings.
+    """
+    __slots__ = ("name", "parts", "key", "_transposed")
+
+    def __init__(self, name, parts, key=None):
+        self.name = name
+        self.parts = parts
+        # (semitone, minor) of the first chord, to select sharps or flats
+        self.key = key
+        self._transposed = {}
+
+    def transpose(self, steps, note_names):
+        """ Returns the chord name transposed by steps semitones, using note_names. """
+        steps %= 12
+        if steps == 0:
+            return self.name
+        try:
+            return self._transposed[steps, note_names]
+        except KeyError:
+            pass
+
+        out = []
+        for part in self.parts:
+            if isinstance(part, str):
+                out.append(part)
+            else:
+                name = note_names[(part[0] + steps) % 12]
+                out.append(name.lower() if part[1] else name)
+        self._transposed[steps, note_names] = "".join(out)
+        return self._transposed[steps, note_names]
+
+    def __repr__(self):
+        return "Chord({!r})".format(self.name)
+
+
+def _note_value(letter, accidental):
+    value = NOTE_VALUES[letter.upper()]
+    # "B&" and "Bb" are written for the german "B"
+    if accidental and not (letter in "Bb" and ACCIDENTALS[accidental] < 0):
+        value += ACCIDENTALS[accidental]
+    return value % 12
+
+
+def _parse_word(word):
+    m = _CHORD.fullmatch(word)
+    if m is None:
+        return None
+    prefix, root, root_acc, quality, bass, bass_acc, suffix = m.groups()
+    parts = [prefix, (_note_value(root, root_acc), root.islower()), quality]
+    if bass:
+        parts += ["/", (_note_value(bass, bass_acc), bass.islower())]
+    parts.append(suffix)
+    return parts
+
+
+_parsed = {}
+
+
+def parse_chord(name):
+    """ Parses a chord symbol, each distinct symbol is only parsed once. """
+    try:
+        return _parsed[name]
+    except KeyError:
+        pass
+
+    words = _SEPARATORS.split(name)
+    chords = [_parse_word(w) if i % 2 == 0 else None for i, w in enumerate(words)]
+    # lowercase notes are only single notes, if the symbol is not a text, like "a capella"
+    is_text = any(c is None and _LETTER.search(w) for i, (w, c) in enumerate(zip(words, chords)) if i % 2 == 0)
+
+    parts = []
+    key = None
+    for word, chord in zip(words, chords):
+        if chord is None or (is_text and chord[1][1]):
+            parts.append(word)
+            continue
+        if key is None and not chord[1][1]:
+            key = (chord[1][0], chord[2].startswith("m") and not chord[2].startswith("maj"))
+        parts += [p for p in chord if p != ""]
+
+    # merge adjacent text, so transposing is a simple join
+    merged = []
+    for part in parts:
+        if isinstance(part, str) and len(merged) > 0 and isinstance(merged[-1], str):
+            merged[-1] += part
+        else:
+            merged.append(part)
+
+    _parsed[name] = Chord(name, tuple(merged), key)
+    return _parsed[name]
+
+
+class Transposer(object):
+    """ Transposes the chord names of a song.
+
+    Like the songs package, sharps or flats are chosen by the key of the first
+    transposed chord, unless prefer_sharps is given.
+    """
+
+    def __init__(self, steps=0, notation="german", prefer_sharps=None):
+        self.steps = steps
+        self.notation = NOTATIONS[notation]
+        self.prefer_sharps = prefer_sharps
+
+    def __call__(self, name, steps=0):
+        steps = (self.steps + steps) % 12
+        if steps == 0:
+            return name
+
+        chord = parse_chord(name)
+        if self.prefer_sharps is None and chord.key is not None:
+            value, minor = chord.key
+            value = (value + steps) % 12
+            self.prefer_sharps = value not in (FLAT_MINOR_KEYS if minor else FLAT_KEYS)
+        return chord.transpose(steps, self.notation[0 if self.prefer_sharps in (True, None) else 1])
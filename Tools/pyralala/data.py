@@ -2,10 +2,11 @@
 Data structures used by pyralala
 """
 import re
+import array
 import itertools
 import collections
 
-__all__ = ["Song", "DummySong"]
+__all__ = ["Song", "DummySong", "ChordTable", "ChordMismatchError"]
 
 METAINFO_FORMAT = collections.OrderedDict([
     ("mel", " Melodie: {}"),
@@ -29,74 +30,181 @@ SONGBOOK_FORMAT = collections.OrderedDict([
     ("biest", "Das Biest: {} "),
 ])
 
+EMPTY_COLUMN = array.array("H")
+
+COMMENT = re.compile(r"%[^\n]*")
+# inline chords, e.g. "\[Am]", and chord markers "^"
+CHORD_MARKERS = re.compile(r"\\\[([^\]]+)\]|\^")
+
+
+class ChordMismatchError(Exception):
+    """ Raised when a part has more chord markers than memorized chords. """
+
+    def __init__(self, key, markers, chords, line):
+        self.key = key
+        self.markers = markers
+        self.chords = chords
+        self.line = line
+        Exception.__init__(self, "Part has {} chord markers, but only {} chords are memorized{} (at \"{}\")".format(
+            self.markers, self.chords, " as \"{}\"".format(key) if key else "", line))
+
+
+class ChordTable(object):
+    """ Symbol table of chord names, shared by all songs of a corpus.
+
+    Songs store chords as small integers, each distinct chord name is kept once.
+    """
+    __slots__ = ("names", "_ids")
+
+    def __init__(self):
+        self.names = []
+        self._ids = {}
+
+    def intern(self, name):
+        try:
+            return self._ids[name]
+        except KeyError:
+            self._ids[name] = len(self.names)
+            self.names.append(name)
+            return self._ids[name]
+
+    def intern_all(self, names):
+        return array.array("H", [self.intern(n) for n in names])
+
+    def __getitem__(self, chord_id):
+        return self.names[chord_id]
+
+    def __len__(self):
+        return len(self.names)
+
+
+# symbol table used by songs, which are not part of a dedicated corpus
+DEFAULT_CHORD_TABLE = ChordTable()
+
 
 class DummySong(object):
+    __slots__ = ()
+
     def add_text(self, text):
         return
 
+    def transpose(self, steps):
+        return
+
 
 class Song(object):
+    __slots__ = ("title", "info", "chord_table", "_contents", "_verse_counter", "_memory", "_memorize_key",
+                 "_transposition")
+
     class MusicPart(object):
+        """ Lyrics and chords of a verse or chorus.
+
+        The lyrics are stored as one string with line offsets, the chords as
+        columns of line number, position and chord id.
+        """
+        __slots__ = ("_fragments", "_replay_key", "_chord_table", "_text", "_line_offsets",
+                     "_chord_lines", "_chord_positions", "_chord_ids", "transposition")
+
         def __init__(self):
-            self._raw_text = ""
-            self._lines = []
-            self._replay_key = ""
+            self.transposition = 0
+            self._fragments = []
+            # None until set by Song.replay or a memorize key
+            self._replay_key = None
+            self._chord_table = DEFAULT_CHORD_TABLE
+            self._text = ""
+            self._line_offsets = EMPTY_COLUMN
+            self._chord_lines = EMPTY_COLUMN
+            self._chord_positions = EMPTY_COLUMN
+            self._chord_ids = EMPTY_COLUMN
 
         def append(self, new_text):
-            self._raw_text += str(new_text)
+            self._fragments.append(str(new_text))
 
-        def end(self, memory, memorize_key=None):
-            # remove comments
-            lines = [line.split("%")[0]
-                     for line in self._raw_text.splitlines()]
-            # take only nonempty lines
-            self._lines = ([l for l in lines if len(l) > 0])
+        def end(self, memory, memorize_key=None, chord_table=DEFAULT_CHORD_TABLE):
+            self._chord_table = chord_table
+            # remove comments and empty lines
+            raw_text = COMMENT.sub("", "".join(self._fragments))
+            raw_text = "\n".join([l for l in raw_text.splitlines() if len(l) > 0])
+            self._fragments = None
 
+            markers = self._extract_markers(raw_text)
+
+            memorized = False
             if not memorize_key == None:
-                chords = self._get_memorize_chords()
+                chords = [chord for chord in markers if chord is not None]
                 if len(chords) > 0:
-                    memory[memorize_key] = chords
-                self._replay_key = memorize_key
-
-            self._finalize(memory)
-
-        def _finalize(self, memory):
-            # create lyrics and chords array
-            self.lyrics = []
-            self.chords = []
-
-            # lookup previously saved chords
-            try:
-                chords = memory[self._replay_key]
-                chord_gen = (c for c in chords)
-            except KeyError:
+                    memory[memorize_key] = chord_table.intern_all(chords)
+                # a part replaying another key keeps replaying it
+                if self._replay_key is None:
+                    self._replay_key = memorize_key
+                    memorized = True
+            if self._replay_key is None:
+                self._replay_key = ""
+
+            self._finalize(markers, memory, memorized)
+
+        def _extract_markers(self, raw_text):
+            """ Strips chords and chord markers from raw_text in a single pass.
+
+            Sets lyrics, line and position of each marker, and returns the list of
+            markers: the name of an inline chord or None for a "^".
+            """
+            # texts and markers alternate: [text, marker, text, marker, ..., text]
+            pieces = CHORD_MARKERS.split(raw_text)
+            lines = []
+            positions = []
+            line = pieces[0].count("\n")
+            pos = len(pieces[0]) - pieces[0].rfind("\n") - 1
+            for text in itertools.islice(pieces, 2, None, 2):
+                lines.append(line)
+                positions.append(pos)
+                newlines = text.count("\n")
+                if newlines > 0:
+                    line += newlines
+                    pos = len(text) - text.rfind("\n") - 1
+                else:
+                    pos += len(text)
+            self._chord_lines = array.array("H", lines)
+            self._chord_positions = array.array("H", positions)
+
+            self._text = "".join(pieces[0::2])
+            offsets = array.array("I", [0])
+            if len(raw_text) > 0:
+                i = self._text.find("\n")
+                while i >= 0:
+                    offsets.append(i + 1)
+                    i = self._text.find("\n", i + 1)
+                offsets.append(len(self._text) + 1)
+            self._line_offsets = offsets
+            return pieces[1::2]
+
+        def _finalize(self, markers, memory, memorized):
+            # markers of memorized parts and "^" markers take the saved chords in order,
+            # inline chords of replaying parts are added as extra chords.
+            chords = memory.get(self._replay_key, EMPTY_COLUMN)
+            if memorized or markers.count(None) == len(markers):
+                if len(markers) > len(chords):
+                    self._chord_mismatch(len(markers), chords, len(chords))
+                # share memorized chords instead of copying them
+                self._chord_ids = chords
                 return
 
-            # get extra chords for this part
-            extra = self._get_memorize_chords(token="§")
-            extra_gen = (c for c in extra)
-
-            # loop over all chars in all lines and pick the matching chords
-            for l in self._lines:
-                line_chords = []
-                loc = 0
-                for c in l:
-                    if c == '^':
-                        line_chords.append((loc, next(chord_gen)))
-                    elif c == "$":
-                        line_chords.append((loc, next(extra_gen)))
-                    else:
-                        loc += 1
-                self.lyrics.append(l.replace("^", "").replace("§", ""))
-                self.chords.append(line_chords)
-
-        def _get_memorize_chords(self, token="^"):
-            # find all the chords
-            ex = re.compile(r"\\\[([^\]]+)\]")
-            chords = ex.findall("\n".join(self._lines))
-            # replace chords in the lines
-            self._lines = [ex.subn(token, l)[0] for l in self._lines]
-            return chords
+            chord_ids = array.array("H")
+            used = 0
+            for chord in markers:
+                if chord is None:
+                    if used >= len(chords):
+                        self._chord_mismatch(markers.count(None), chords, len(chord_ids))
+                    chord_ids.append(chords[used])
+                    used += 1
+                else:
+                    chord_ids.append(self._chord_table.intern(chord))
+            # copy to trim the over-allocation of append
+            self._chord_ids = array.array("H", chord_ids)
+
+        def _chord_mismatch(self, markers, chords, index):
+            raise ChordMismatchError(self._replay_key, markers, len(chords),
+                                     self.line(self._chord_lines[index]))
 
         def __repr__(self, head="[Music Part]"):
             ret = "{}\n".format(head)
@@ -104,12 +212,51 @@ class Song(object):
                 return ret
             return ret + self.chorded_text + "\n\n"
 
+        def __getstate__(self):
+            # chord ids are only valid within a process, pickle chord names instead
+            return (self.transposition, self._replay_key, self._text, self._line_offsets, self._chord_lines, self._chord_positions,
+                    [self._chord_table[c] for c in self._chord_ids[:len(self._chord_lines)]])
+
+        def __setstate__(self, state):
+            Song.MusicPart.__init__(self)
+            (self.transposition, self._replay_key, self._text, self._line_offsets, self._chord_lines, self._chord_positions,
+             chord_names) = state
+            self._chord_ids = self._chord_table.intern_all(chord_names)
+
+        @property
+        def line_count(self):
+            return max(len(self._line_offsets) - 1, 0)
+
+        def line(self, i):
+            return self._text[self._line_offsets[i]:self._line_offsets[i + 1] - 1]
+
+        @property
+        def lyrics(self):
+            return [self.line(i) for i in range(self.line_count)]
+
+        @property
+        def chords(self):
+            return self.get_chords()
+
+        def get_chords(self, transposer=None):
+            """ Returns the (position, name) chords of each line, optionally transposed. """
+            chords = [[] for _ in range(self.line_count)]
+            names = self._chord_table.names
+            for line_number, pos, chord_id in zip(self._chord_lines, self._chord_positions, self._chord_ids):
+                if transposer is None:
+                    chords[line_number].append((pos, names[chord_id]))
+                else:
+                    chords[line_number].append((pos, transposer(names[chord_id], self.transposition)))
+            return chords
+
         @property
         def text(self, sep="\n"):
-            return sep.join(self.lyrics)
+            return self._text
             # return sep.join([l.replace("^", "") for l in self.lines])
 
     class Chorus(MusicPart):
+        __slots__ = ("heading",)
+
         def __init__(self, heading):
             Song.MusicPart.__init__(self)
             self.heading = heading
@@ -117,7 +264,16 @@ class Song(object):
         def __repr__(self):
             return Song.MusicPart.__repr__(self, "[{}]".format(self.heading))
 
+        def __getstate__(self):
+            return (self.heading, Song.MusicPart.__getstate__(self))
+
+        def __setstate__(self, state):
+            self.heading, state = state
+            Song.MusicPart.__setstate__(self, state)
+
     class Verse(MusicPart):
+        __slots__ = ("verse_number",)
+
         def __init__(self, verse_number):
             Song.MusicPart.__init__(self)
             self.verse_number = verse_number
@@ -125,7 +281,16 @@ class Song(object):
         def __repr__(self):
             return Song.MusicPart.__repr__(self, "[Verse {}]".format(self.verse_number))
 
+        def __getstate__(self):
+            return (self.verse_number, Song.MusicPart.__getstate__(self))
+
+        def __setstate__(self, state):
+            self.verse_number, state = state
+            Song.MusicPart.__setstate__(self, state)
+
     class AnonVerse(MusicPart):
+        __slots__ = ()
+
         def __init__(self):
             Song.MusicPart.__init__(self)
 
@@ -133,6 +298,8 @@ class Song(object):
             return Song.MusicPart.__repr__(self, "")
 
     class Intermediate():
+        __slots__ = ()
+
         def append(self, new_text):
             pass
 
@@ -140,6 +307,8 @@ class Song(object):
             return ""
 
     class Graphics():
+        __slots__ = ("path", "options")
+
         def __init__(self, path, options=[]):
             self.path = path
             self.options = options
@@ -147,36 +316,54 @@ class Song(object):
         def __repr__(self):
             return "[Graphic: {}]\n\n".format(self.path)
 
-    def __init__(self, title, info=[]):
+    def __init__(self, title, info=[], chord_table=DEFAULT_CHORD_TABLE):
         self.title = title
         self.info = info
+        self.chord_table = chord_table
         self._contents = []
         self._verse_counter = 0
         self._memory = {}
         self._memorize_key = None
+        self._transposition = 0
         self._contents.append(self.Intermediate())
 
+    def __getstate__(self):
+        # the chord table and the memorized chords are only valid within a process, the parts pickle chord names
+        return (self.title, self.info, self._contents)
+
+    def __setstate__(self, state):
+        self.title, self.info, self._contents = state
+        self.chord_table = DEFAULT_CHORD_TABLE
+        self._verse_counter = 0
+        self._memory = {}
+        self._memorize_key = None
+        self._transposition = 0
+
     def __repr__(self):
         ascii_song = "### {} ###\n\n".format(self.title)
         for c in self._contents:
             ascii_song += str(c)
         return ascii_song
 
+    def _beginmusicpart(self, part):
+        part.transposition = self._transposition
+        self._contents.append(part)
+
     def beginchorus(self, heading):
-        self._contents.append(self.Chorus(heading))
+        self._beginmusicpart(self.Chorus(heading))
 
     def beginverse(self):
         self._verse_counter += 1
-        self._contents.append(self.Verse(self._verse_counter))
+        self._beginmusicpart(self.Verse(self._verse_counter))
 
     def beginanonverse(self):
-        self._contents.append(self.AnonVerse())
+        self._beginmusicpart(self.AnonVerse())
 
     def endmusicpart(self):
-        # implicit memorize, if default is not yet set.
-        if not "" in self._memory:
+        # implicit memorize, if default is not yet set and no other key is given or replayed.
+        if self._memorize_key == None and not "" in self._memory and self._contents[-1]._replay_key is None:
             self._memorize_key = ""
-        self._contents[-1].end(self._memory, self._memorize_key)
+        self._contents[-1].end(self._memory, self._memorize_key, self.chord_table)
         self._contents.append(self.Intermediate())
 
         # reset memorize key after use
@@ -198,6 +385,10 @@ class Song(object):
     def add_text(self, text):
         self._contents[-1].append(text)
 
+    def transpose(self, steps):
+        """ Transposes the chords of the following parts, like \\transpose of the songs package. """
+        self._transposition = (self._transposition + steps) % 12
+
     @staticmethod
     def _key_formatter(formats, data):
         out = []
@@ -0,0 +1,155 @@
+"""
+Dependencies of LaTeX files: transitive \\input, graphics, wallpapers and packages
+"""
+import os
+import re
+import json
+
+from pyralala.cache import DEFAULT_CACHE_DIR
+
+__all__ = ["DependencyScanner", "references", "make_rules"]
+
+DEFAULT_DEPS_CACHE = os.path.join(DEFAULT_CACHE_DIR, "deps.json")
+# changing the scanner invalidates the cache
+DEPS_VERSION = 1
+# extensions tried by pdflatex for graphics without extension
+GRAPHICS_EXTENSIONS = (".pdf", ".png", ".jpg", ".jpeg", ".PDF", ".PNG", ".JPG", ".JPEG")
+
+_COMMENT = re.compile(r"(?<!\\)%.*")
+_OPTIONS = r"\s*(?:\[[^\]]*\])?\s*"
+_REFERENCES = (
+    ("input", re.compile(r"\\(?:input|include)\s*{([^{}\\]+)}")),
+    ("graphics", re.compile(r"\\includegraphics" + _OPTIONS + r"{([^{}\\]+)}")),
+    ("graphics", re.compile(r"\\ThisLRCornerWallPaper\s*{[^{}]*}\s*{([^{}\\]+)}")),
+    ("package", re.compile(r"\\(?:usepackage|RequirePackage)" + _OPTIONS + r"{([^{}\\]+)}")),
+)
+
+
+def references(source):
+    """ Returns the (kind, name) references of a LaTeX source, ignoring comments.
+
+    Names containing macros, e.g. \\input{\\SONG}, can not be resolved and are left out.
+    """
+    source = "\n".join(_COMMENT.sub("", line) for line in source.splitlines())
+    refs = []
+    for kind, regex in _REFERENCES:
+        for name in regex.findall(source):
+            if kind == "package":
+                refs += [(kind, n.strip()) for n in name.split(",") if n.strip()]
+            else:
+                refs.append((kind, name.strip()))
+    return refs
+
+
+class DependencyScanner(object):
+    """ Resolves the files a LaTeX file depends on, transitively.
+
+    Paths are relative to the build root, as seen by pdflatex. The references
+    of each file are cached by its size and modification time.
+    """
+
+    def __init__(self, cache_path=DEFAULT_DEPS_CACHE, search_path=None):
+        self.cache_path = cache_path
+        # like pdflatex, files are searched in the build root and in TEXINPUTS
+        if search_path is None:
+            search_path = [d for d in os.environ.get("TEXINPUTS", "").split(os.pathsep) if d and d != "."]
+        self.search_path = ["."] + [d.rstrip("/") for d in search_path]
+        self.missing = {}
+        self._files = {}
+        self._changed = False
+        if not cache_path:
+            return
+        try:
+            with open(cache_path, "r") as cache_file:
+                data = json.load(cache_file)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == DEPS_VERSION:
+            self._files = data["files"]
+
+    def save(self):
+        if not self._changed or not self.cache_path:
+            return
+        directory = os.path.dirname(os.path.abspath(self.cache_path))
+        os.makedirs(directory, exist_ok=True)
+        with open(self.cache_path + ".tmp", "w") as cache_file:
+            json.dump({"version": DEPS_VERSION, "files": self._files}, cache_file)
+        os.replace(self.cache_path + ".tmp", self.cache_path)
+        self._changed = False
+
+    def _references(self, path):
+        stat = os.stat(path)
+        entry = self._files.get(path)
+        if entry is not None and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+            return entry[2]
+        with open(path, "r", errors="replace") as tex_file:
+            refs = references(tex_file.read())
+        self._files[path] = [stat.st_mtime_ns, stat.st_size, refs]
+        self._changed = True
+        return refs
+
+    def _find(self, name, extensions):
+        for directory in self.search_path:
+            base = os.path.normpath(os.path.join(directory, name))
+            for ext in extensions:
+                if os.path.isfile(base + ext):
+                    return base + ext
+        return None
+
+    def resolve(self, kind, name):
+        """ Returns the path of a reference, None if it is not found. """
+        if kind == "input":
+            return self._find(name, ("", ".tex") if os.path.splitext(name)[1] else (".tex", ""))
+        if kind == "package":
+            return self._find(name, (".sty",))
+        path = self._find(name, ("",) + GRAPHICS_EXTENSIONS)
+        if path is None and os.path.splitext(name)[1]:
+            # generated graphics, e.g. Noten/*.pdf, are dependencies before they exist
+            return os.path.normpath(name)
+        return path
+
+    def direct(self, path):
+        """ Returns the files path references directly. """
+        deps = []
+        for kind, name in self._references(path):
+            dep = self.resolve(kind, name)
+            if dep is None:
+                # packages not found are installed ones, e.g. graphicx
+                if kind != "package":
+                    self.missing.setdefault(path, []).append(name)
+            elif dep not in deps:
+                deps.append(dep)
+        return deps
+
+    def dependencies(self, path):
+        """ Returns path and all files it depends on transitively, in the order they are found. """
+        path = os.path.normpath(path)
+        found = [path]
+        seen = set(found)
+        i = 0
+        while i < len(found):
+            current = found[i]
+            i += 1
+            # only existing LaTeX sources are scanned further, not graphics
+            if not current.endswith((".tex", ".sty")) or not os.path.isfile(current):
+                continue
+            for dep in self.direct(current):
+                if dep not in seen:
+                    seen.add(dep)
+                    found.append(dep)
+        return found
+
+
+def make_rules(rules):
+    """ Returns Makefile rules of (targets, dependencies) pairs, as written by gcc -MD -MP.
+
+    Each dependency also gets an empty rule, so make does not fail when a file
+    is deleted and the rules are outdated.
+    """
+    lines = []
+    deps = {}
+    for targets, dependencies in rules:
+        lines.append("{}: {}".format(" ".join(targets), " \\\n  ".join(dependencies)))
+        deps.update((d, None) for d in dependencies)
+    lines += [""] + ["{}:".format(d) for d in deps]
+    return "\n".join(lines) + "\n"
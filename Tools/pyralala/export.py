@@ -1,135 +1,269 @@
 """
 Data structures used by pyralala
 """
+import os
+import re
 import sys
-import itertools
-import os.path
-import tempfile
-import subprocess
+import struct
 import pyralala
+from pyralala.assets import stylesheet, minify_css, minify_lines
+from pyralala.layout import layout
 
-__all__ = ["Compiler"]
+__all__ = ["Compiler", "MarkdownCompiler", "HTMLCompiler", "song_record", "write_bundle", "Bundle"]
+
+BOOK_TITLE = "Pfadiralala IV"
+TOC_TITLE = "Inhaltsverzeichnis"
+
+# bundle file layout:
+#   header: magic, version, flags, number of records, number of title slots, offset of the title slots
+#   record table: (offset, length) of each record, indexed by song id
+#   records: one JSON object per song, zlib compressed with BUNDLE_COMPRESSED
+#   title slots: open addressing hash table of (crc32, song id, string offset, string length)
+#   title strings: utf-8 encoded normalized titles, referenced by the slots
+BUNDLE_MAGIC = b"PYRB"
+BUNDLE_VERSION = 1
+BUNDLE_COMPRESSED = 1
+_BUNDLE_HEADER = struct.Struct("<4sHHIIQ")
+_BUNDLE_RECORD = struct.Struct("<QI")
+_BUNDLE_SLOT = struct.Struct("<IIII")
+_EMPTY_SLOT = 0xFFFFFFFF
 
 
 class Compiler(object):
-    def __init__(self):
+    """ Compiles songs into lines of text.
+
+    The _compile_* methods are generators, so songs and books can be written
+    to a file object as they are compiled, without collecting them in memory.
+    """
+
+    def __init__(self, transpose=0, notation="german", width=None):
+        """ Chords are transposed by the song's \\transpose and additional transpose semitones.
+
+        With width, lyrics lines are wrapped to this number of columns, e.g. 40 for phones.
+        """
+        self.transpose = transpose
+        self.notation = notation
+        self.width = width
         self._lines = []
+        self._transposer = None
 
     def compile(self, song, out=sys.stdout):
-        self._lines = []
-        self._compile_start(song)
+        """ Compiles song into memory, to be written by write(). """
+        self._lines = list(self.iter_compile(song))
+
+    def write(self, out=sys.stdout):
+        self._write_lines(self._lines, out)
+
+    def iter_compile(self, song):
+        """ Yields the lines of song. """
+        yield from self._compile_start(song)
+        yield from self._compile_song(song)
+        yield from self._compile_end(song)
+
+    def compile_to(self, song, out=sys.stdout):
+        """ Writes song to the file object out, while it is compiled. """
+        self._write_lines(self.iter_compile(song), out)
+
+    def iter_book(self, songs, title=BOOK_TITLE):
+        """ Yields the lines of a single document of all songs, with a table of contents. """
+        songs = list(songs)
+        yield from self._book_start(songs, title)
+        for number, song in enumerate(songs):
+            yield from self._book_song(number, song)
+        yield from self._book_end(songs)
+
+    def compile_book(self, songs, out=sys.stdout, title=BOOK_TITLE):
+        """ Writes a single document of all songs to the file object out, while it is compiled. """
+        self._write_lines(self.iter_book(songs, title), out)
 
+    @staticmethod
+    def _write_lines(lines, out):
+        lines = iter(lines)
+        for line in lines:
+            out.write(line)
+            break
+        for line in lines:
+            out.write("\n")
+            out.write(line)
+
+    def _compile_song(self, song):
+        self._transposer = pyralala.Transposer(self.transpose, self.notation)
         for part in song._contents:
             if isinstance(part, pyralala.data.Song.MusicPart):
-                self._compile_music(part)
+                yield from self._compile_music(part)
             elif isinstance(part, pyralala.data.Song.Intermediate):
                 pass
             elif isinstance(part, pyralala.data.Song.Graphics):
-                self._compile_graphics(part)
+                yield from self._compile_graphics(part)
             else:
                 raise Exception(
                     "Implementation missing for song part {}.".format(type(part)))
 
-        self._compile_end(song)
-
-    def write(self, out=sys.stdout):
-        out.write("\n".join(self._lines))
-
     def _compile_start(self, song):
-        self._lines.append("### {} ###".format(song.title))
-        self._lines.append("")
+        yield "### {} ###".format(song.title)
+        yield ""
 
     def _compile_end(self, song):
-        pass
+        return
+        yield
+
+    def _book_start(self, songs, title):
+        yield "=== {} ===".format(title)
+        yield ""
+        yield "{}:".format(TOC_TITLE)
+        for number, song in enumerate(songs):
+            yield "{:4}. {}".format(number + 1, song.title)
+        yield ""
+
+    def _book_song(self, number, song):
+        yield from self.iter_compile(song)
+        yield ""
+
+    def _book_end(self, songs):
+        return
+        yield
 
     def _compile_music(self, part):
         if isinstance(part, pyralala.data.Song.Chorus):
-            self._lines.append("[{}]".format(part.heading))
+            yield "[{}]".format(part.heading)
         elif isinstance(part, pyralala.data.Song.Verse):
-            self._lines.append("[Verse {}]".format(part.verse_number))
+            yield "[Verse {}]".format(part.verse_number)
 
-        chord_lines = [self._gen_chord_line(c) for c in part.chords]
-        self._lines += itertools.chain(*zip(chord_lines, part.lyrics))
-        if len(chord_lines) > 0:
-            self._lines.append("")
-            self._lines.append("")
+        yield from self._layout_music(part)
+        if part.line_count > 0:
+            yield ""
+            yield ""
 
     def _compile_graphics(self, part):
-        self._lines.append("[Graphic: {}]".format(part.path))
-        self._lines.append("")
+        yield "[Graphic: {}]".format(part.path)
+        yield ""
 
-    @staticmethod
-    def _gen_chord_line(chords):
-        out = ""
-        for pos, val in chords:
-            out = out.ljust(pos) + val
-        return out
+    def _layout_music(self, part):
+        # alternating chord and lyrics lines
+        for lyric_line, chords in zip(part.lyrics, part.get_chords(self._transposer)):
+            for line in layout(lyric_line, chords, self.width):
+                yield from line
 
 
 class MarkdownCompiler(Compiler):
     def _compile_start(self, song):
-        self._lines.append("## {} ".format(song.title))
-        self._lines.append("")
+        yield "## {} ".format(song.title)
+        yield ""
+
+    def _book_start(self, songs, title):
+        yield "# {}".format(title)
+        yield ""
+        yield "## {}".format(TOC_TITLE)
+        yield ""
+        anchors = {}
+        for song in songs:
+            yield "- [{}](#{})".format(song.title, self._anchor(song.title, anchors))
+        yield ""
 
-    def _compile_end(self, song):
-        pass
+    @staticmethod
+    def _anchor(heading, anchors):
+        # anchors as generated for headings by common markdown renderers, e.g. GitHub
+        anchor = re.sub(r"[^\w\- ]", "", heading.strip().lower()).replace(" ", "-")
+        count = anchors.get(anchor, 0)
+        anchors[anchor] = count + 1
+        return anchor if count == 0 else "{}-{}".format(anchor, count)
 
     def _compile_music(self, part):
         if isinstance(part, pyralala.data.Song.Chorus):
-            self._lines.append("#### {}".format(part.heading))
+            yield "#### {}".format(part.heading)
         elif isinstance(part, pyralala.data.Song.Verse):
-            self._lines.append("#### Verse {}".format(part.verse_number))
+            yield "#### Verse {}".format(part.verse_number)
 
         if len(part.lyrics) > 0:
-            self._lines.append("```")
-            chord_lines = [self._gen_chord_line(c) for c in part.chords]
-            self._lines += itertools.chain(*zip(chord_lines, part.lyrics))
-            self._lines.append("```")
-            self._lines.append("")
+            yield "```"
+            yield from self._layout_music(part)
+            yield "```"
+            yield ""
 
     def _compile_graphics(self, part):
-        self._lines.append("![](../{})".format(part.path))
-        self._lines.append("")
-
-    @staticmethod
-    def _gen_chord_line(chords):
-        out = ""
-        for pos, val in chords:
-            out = out.ljust(pos) + val
-        return out
-
-
-SVG_IGNORE_ATTRIBUTES = ("height", "width")
+        yield "![](../{})".format(part.path)
+        yield ""
 
 
 class HTMLCompiler(Compiler):
-    def _compile_start(self, song):
-        self._lines.append("<html>")
-        self._lines.append("<head>")
-        self._lines.append("    <title>{}</title>".format(song.title))
-        self._lines.append("    <meta charset=\"UTF-8\">")
-        self._lines.append(
-            "    <meta name=\"viewport\" content=\"width=device-width, initial-scale=0.5, user-scalable=yes\">")
-        self._lines.append(
-            "    <meta name=\"keywords\" content=\"Liederbuch, Songbook, Songs, Bündisch, Pfadfinder, Pfadiralala, VCP\">")
-        for k, v in song.info:
-            self._lines.append(
-                "    <meta name=\"{}\" content=\"{}\">".format(k, v))
+    def __init__(self, transpose=0, notation="german", stylesheet=None, minify=False, graphics=None, root=None):
+        """ With stylesheet, pages link to this url instead of embedding the css.
+
+        Graphics are converted by the given SVGCache, by default one keeping the SVGs in memory. Their
+        paths are relative to root, by default the working directory.
+        """
+        Compiler.__init__(self, transpose, notation)
+        self.stylesheet = stylesheet
+        self.minify = minify
+        self.graphics = graphics
+        self.root = root
+
+    def _write_lines(self, lines, out):
+        Compiler._write_lines(minify_lines(lines) if self.minify else lines, out)
+
+    def _document_start(self, title, info=()):
+        yield "<html>"
+        yield "<head>"
+        yield "    <title>{}</title>".format(title)
+        yield "    <meta charset=\"UTF-8\">"
+        yield "    <meta name=\"viewport\" content=\"width=device-width, initial-scale=0.5, user-scalable=yes\">"
+        yield "    <meta name=\"keywords\" content=\"Liederbuch, Songbook, Songs, Bündisch, Pfadfinder, Pfadiralala, VCP\">"
+        for k, v in info:
+            yield "    <meta name=\"{}\" content=\"{}\">".format(k, v)
             # additionally set the song author as document author (to enable search engines better matching)
             if k in ["wuw", "mel", "txt"]:
-                self._lines.append(
-                    "    <meta name=\"author\" content=\"{}\">".format(v))
-        self._lines.append("    ")
-        self._lines.append("    <style>")
-        head_path = os.path.join(os.path.dirname(__file__), "pyralala.css")
-        with open(head_path, "r") as head_file:
-            self._lines.append(head_file.read())
-        self._lines.append("    </style>")
-        self._lines.append("</head>")
-        self._lines.append("<body>")
-        self._lines.append("<header>")
-        self._lines.append("    <h2> {} </h2>".format(song.title))
-        self._lines.append("</header>")
+                yield "    <meta name=\"author\" content=\"{}\">".format(v)
+        yield "    "
+        if self.stylesheet:
+            yield "    <link rel=\"stylesheet\" href=\"{}\">".format(self.stylesheet)
+        else:
+            css = stylesheet()[0]
+            yield "    <style>"
+            yield minify_css(css) if self.minify else css
+            yield "    </style>"
+        yield "</head>"
+        yield "<body>"
+
+    def _song_header(self, song):
+        yield "<header>"
+        yield "    <h2> {} </h2>".format(song.title)
+        yield "</header>"
+
+    def _song_footer(self, song):
+        yield "<footer>"
+        yield "    <h3>{}</h3>".format("".join(song.metainfo))
+        yield "    <h4>{}</h4>".format("".join(song.songbookinfo))
+        yield "</footer>"
+
+    def _compile_start(self, song):
+        yield from self._document_start(song.title, song.info)
+        yield from self._song_header(song)
+
+    def _compile_end(self, song):
+        yield from self._song_footer(song)
+        yield "</body>"
+        yield "</html>"
+
+    def _book_start(self, songs, title):
+        yield from self._document_start(title)
+        yield "<nav>"
+        yield "    <h2>{}</h2>".format(TOC_TITLE)
+        yield "    <ol>"
+        for number, song in enumerate(songs):
+            yield "        <li><a href=\"#song-{}\">{}</a></li>".format(number + 1, song.title)
+        yield "    </ol>"
+        yield "</nav>"
+
+    def _book_song(self, number, song):
+        yield "<article id=\"song-{}\">".format(number + 1)
+        yield from self._song_header(song)
+        yield from self._compile_song(song)
+        yield from self._song_footer(song)
+        yield "</article>"
+
+    def _book_end(self, songs):
+        yield "</body>"
+        yield "</html>"
 
     @staticmethod
     def _gen_music_line(lyric_line, chord_line):
@@ -146,42 +280,179 @@ class HTMLCompiler(Compiler):
 
     def _compile_music(self, part):
         if isinstance(part, pyralala.data.Song.Chorus):
-            self._lines.append("<div class=\"chorus\">")
-            self._lines.append("    <h3>{}</h3>".format(part.heading))
+            yield "<div class=\"chorus\">"
+            yield "    <h3>{}</h3>".format(part.heading)
         elif isinstance(part, pyralala.data.Song.Verse):
-            self._lines.append("<div class=\"verse\">")
+            yield "<div class=\"verse\">"
 
         if len(part.lyrics) > 0:
             if isinstance(part, pyralala.data.Song.Verse):
-                self._lines.append(
-                    "    <h3>{}.</h3>".format(part.verse_number))
-
-            for lyric_line, chord_line in zip(part.lyrics, part.chords):
-                self._lines.append(
-                    self._gen_music_line(lyric_line, chord_line))
+                yield "    <h3>{}.</h3>".format(part.verse_number)
 
-        self._lines.append("</div>")
+            for lyric_line, chord_line in zip(part.lyrics, part.get_chords(self._transposer)):
+                yield self._gen_music_line(lyric_line, chord_line)
 
-    def _compile_end(self, song):
-        self._lines.append("<footer>")
-        self._lines.append("    <h3>{}</h3>".format("".join(song.metainfo)))
-        self._lines.append(
-            "    <h4>{}</h4>".format("".join(song.songbookinfo)))
-        self._lines.append("</footer>")
-        self._lines.append("</body>")
-        self._lines.append("</html>")
+        yield "</div>"
 
     def _compile_graphics(self, part):
-        graphics_id = os.path.splitext(os.path.basename(part.path))[0]
-        temp_name = tempfile.mktemp()
-        subprocess.call(["pdf2svg", part.path, temp_name])
-        with open(temp_name, "r") as temp_file:
-            svg = temp_file.readlines()
-
-            self._lines.append(" ".join([attr for attr in svg[1].split(
-                " ") if not attr.startswith(SVG_IGNORE_ATTRIBUTES)]))
-
-            for svg_line in svg[2:]:
-                self._lines.append(svg_line[:-1].replace("glyph", graphics_id))
-
-        os.remove(temp_name)
+        if self.graphics is None:
+            from pyralala.graphics import SVGCache
+            self.graphics = SVGCache()
+        yield self.graphics.svg(os.path.join(self.root or "", part.path))
+
+
+def song_record(song):
+    """ Returns the JSON serializable record of song, as stored in a bundle.
+
+    Chords are stored untransposed with the transposition of their part, as
+    (position, name) pairs for each lyrics line.
+    """
+    parts = []
+    for part in song._contents:
+        if isinstance(part, pyralala.data.Song.MusicPart):
+            record = {"type": "verse", "transposition": part.transposition, "lyrics": part.lyrics,
+                      "chords": part.get_chords()}
+            if isinstance(part, pyralala.data.Song.Chorus):
+                record["type"] = "chorus"
+                record["heading"] = part.heading
+            elif isinstance(part, pyralala.data.Song.Verse):
+                record["number"] = part.verse_number
+            parts.append(record)
+        elif isinstance(part, pyralala.data.Song.Graphics):
+            parts.append({"type": "graphics", "path": part.path, "options": part.options})
+    return {"title": song.title, "info": song.info, "parts": parts}
+
+
+def _title_keys(song):
+    from pyralala.library import normalize
+
+    keys = [normalize(song.title)]
+    keys += [normalize(value) for key, value in song.info if key == "index"]
+    return [k for i, k in enumerate(keys) if k not in keys[:i]]
+
+
+def _title_hash(key):
+    import zlib
+
+    return zlib.crc32(key.encode())
+
+
+def write_bundle(songs, path, compress=False):
+    """ Writes songs into a single bundle file, the song ids are their positions in songs.
+
+    With compress, each record is compressed on its own, so single songs can still be decoded.
+    """
+    import json
+    import zlib
+
+    songs = list(songs)
+    table = []
+    titles = []
+    with open(path, "wb") as out:
+        # header and record table are written, once the offsets are known
+        offset = _BUNDLE_HEADER.size + _BUNDLE_RECORD.size * len(songs)
+        out.seek(offset)
+        for song_id, song in enumerate(songs):
+            data = json.dumps(song_record(song), ensure_ascii=False, separators=(",", ":")).encode()
+            if compress:
+                data = zlib.compress(data, 9)
+            out.write(data)
+            table.append(_BUNDLE_RECORD.pack(offset, len(data)))
+            offset += len(data)
+            titles += [(key, song_id) for key in _title_keys(song)]
+
+        # at most half of the slots are used, the slot count is a power of two
+        slot_count = 1
+        while slot_count < 2 * len(titles):
+            slot_count *= 2
+        slots = [None] * slot_count
+        strings = []
+        string_offset = 0
+        for key, song_id in titles:
+            encoded = key.encode()
+            title_hash = _title_hash(key)
+            slot = title_hash & (slot_count - 1)
+            while slots[slot] is not None:
+                slot = (slot + 1) & (slot_count - 1)
+            slots[slot] = _BUNDLE_SLOT.pack(title_hash, song_id, string_offset, len(encoded))
+            strings.append(encoded)
+            string_offset += len(encoded)
+        empty = _BUNDLE_SLOT.pack(0, _EMPTY_SLOT, 0, 0)
+        out.write(b"".join(slot or empty for slot in slots))
+        out.write(b"".join(strings))
+
+        out.seek(0)
+        out.write(_BUNDLE_HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, BUNDLE_COMPRESSED if compress else 0,
+                                      len(songs), slot_count, offset))
+        out.write(b"".join(table))
+    return len(songs)
+
+
+class Bundle(object):
+    """ Reads single songs of a bundle file, without reading the whole file.
+
+    The file is memory mapped, records are looked up by id or title in constant
+    time and only the requested records are decoded.
+    """
+
+    def __init__(self, path):
+        import mmap
+
+        self.path = path
+        with open(path, "rb") as bundle_file:
+            self._data = mmap.mmap(bundle_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self._flags, self._count, self._slot_count, self._slots_offset = \
+            _BUNDLE_HEADER.unpack_from(self._data)
+        if magic != BUNDLE_MAGIC or version != BUNDLE_VERSION:
+            self.close()
+            raise Exception("{} is not a bundle of version {}.".format(path, BUNDLE_VERSION))
+        self._strings_offset = self._slots_offset + _BUNDLE_SLOT.size * self._slot_count
+
+    def close(self):
+        self._data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, song_id):
+        """ Returns the record of song id, as written by song_record(). """
+        import json
+        import zlib
+
+        if not 0 <= song_id < self._count:
+            raise IndexError("Song id {} out of range.".format(song_id))
+        offset, length = _BUNDLE_RECORD.unpack_from(self._data, _BUNDLE_HEADER.size + _BUNDLE_RECORD.size * song_id)
+        data = self._data[offset:offset + length]
+        if self._flags & BUNDLE_COMPRESSED:
+            data = zlib.decompress(data)
+        return json.loads(data.decode())
+
+    def find(self, title):
+        """ Returns the ids of all songs with title or alternative title. """
+        from pyralala.library import normalize
+
+        title = normalize(title)
+        title_hash = _title_hash(title)
+        key = title.encode()
+        song_ids = []
+        slot = title_hash & (self._slot_count - 1)
+        while True:
+            slot_hash, song_id, string_offset, length = _BUNDLE_SLOT.unpack_from(
+                self._data, self._slots_offset + _BUNDLE_SLOT.size * slot)
+            if song_id == _EMPTY_SLOT:
+                return song_ids
+            if slot_hash == title_hash and length == len(key):
+                start = self._strings_offset + string_offset
+                if self._data[start:start + length] == key:
+                    song_ids.append(song_id)
+            slot = (slot + 1) & (self._slot_count - 1)
+
+    def by_title(self, title):
+        """ Returns the records of all songs with title or alternative title. """
+        return [self[song_id] for song_id in self.find(title)]
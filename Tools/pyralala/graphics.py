@@ -0,0 +1,125 @@
+"""
+Content-addressed cache of graphics converted to inline SVG
+"""
+import os
+import hashlib
+
+__all__ = ["SVGCache", "find_graphics"]
+
+SVG_IGNORE_ATTRIBUTES = ("height", "width")
+# changing the post-processing invalidates the cache
+SVG_VERSION = b"1"
+
+
+def find_graphics(source):
+    """ Returns the paths of all graphics included by a song's LaTeX source. """
+    from pyralala.lexer import Command, tokenize
+
+    return [t.args[-1].value for t in tokenize(source)
+            if isinstance(t, Command) and t.name == "includegraphics" and len(t.args) > 0]
+
+
+def postprocess(svg, graphics_id):
+    """ Strips the xml declaration and the svg size, and makes glyph ids unique within a page. """
+    lines = svg.splitlines()
+    out = [" ".join([attr for attr in lines[1].split(" ") if not attr.startswith(SVG_IGNORE_ATTRIBUTES)])]
+    out += [l.replace("glyph", graphics_id) for l in lines[2:]]
+    return "\n".join(out)
+
+
+class SVGCache(object):
+    """ Converts PDF graphics with pdf2svg, each distinct file only once.
+
+    Converted SVGs are stored by a hash of the PDF content and the graphics id,
+    so they are shared by songs and reused by later runs. Without directory,
+    they are only kept in memory, for the lifetime of the cache.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.conversions = 0
+        self._memory = {}
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def graphics_id(path):
+        return os.path.splitext(os.path.basename(path))[0]
+
+    def _path(self, pdf_path):
+        digest = hashlib.sha256(SVG_VERSION)
+        with open(pdf_path, "rb") as pdf_file:
+            digest.update(pdf_file.read())
+        digest.update(self.graphics_id(pdf_path).encode())
+        return os.path.join(self.directory or "", digest.hexdigest() + ".svg")
+
+    def _cached(self, path):
+        return path in self._memory if self.directory is None else os.path.exists(path)
+
+    def svg(self, pdf_path):
+        """ Returns the post-processed SVG of pdf_path, converting it on a cache miss. """
+        path = self._path(pdf_path)
+        if self.directory is None:
+            if path not in self._memory:
+                self._memory[path] = self._convert(pdf_path, path)
+            return self._memory[path]
+        try:
+            with open(path, "r") as svg_file:
+                return svg_file.read()
+        except FileNotFoundError:
+            pass
+        return self._convert(pdf_path, path)
+
+    def _convert(self, pdf_path, path):
+        import tempfile
+        import subprocess
+
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        try:
+            self.conversions += 1
+            result = subprocess.run(["pdf2svg", pdf_path, temp_path], stdout=subprocess.DEVNULL,
+                                    stderr=subprocess.PIPE, universal_newlines=True)
+            if result.returncode != 0:
+                raise Exception("pdf2svg failed for {}: {}".format(pdf_path, result.stderr.strip()))
+            with open(temp_path, "r") as temp_file:
+                svg = postprocess(temp_file.read(), self.graphics_id(pdf_path))
+            if self.directory is None:
+                self._memory[path] = svg
+                return svg
+            with open(temp_path, "w") as temp_file:
+                temp_file.write(svg)
+            # atomic, parallel runs may convert the same file
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return svg
+
+    def prefetch(self, pdf_paths, jobs=None):
+        """ Converts all distinct, not yet cached PDFs concurrently. Returns the errors by path. """
+        from concurrent.futures import ThreadPoolExecutor
+
+        todo = []
+        errors = {}
+        for pdf_path in set(pdf_paths):
+            try:
+                path = self._path(pdf_path)
+            except OSError as e:
+                errors[pdf_path] = e
+                continue
+            if not self._cached(path):
+                todo.append((pdf_path, path))
+
+        def convert(item):
+            try:
+                self._convert(*item)
+            except Exception as e:
+                return item[0], e
+
+        # pdf2svg runs in its own process, threads are enough to run conversions in parallel
+        with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as executor:
+            for error in executor.map(convert, todo):
+                if error is not None:
+                    errors[error[0]] = error[1]
+        return errors
@@ -0,0 +1,141 @@
+"""
+Imposition of the pages of an edition onto printed sheets: cut stacks, saddle-stitched booklets and n-up
+"""
+import os
+
+__all__ = ["cut_stack", "booklet", "n_up", "impose", "LAYOUTS", "PAPER"]
+
+# width and height in pt (portrait)
+PAPER = {"a3": (842, 1191), "a4": (595, 842), "a5": (420, 595)}
+# pages per side of a sheet: (columns, rows)
+GRID = {1: (1, 1), 2: (2, 1), 4: (2, 2)}
+
+
+def _ceil(a, b):
+    return -(-a // b)
+
+
+def _mirror(slots):
+    """ The slots of the back side, the columns of each row reversed, as they are behind the front side. """
+    columns = GRID[len(slots)][0]
+    return [page for row in range(0, len(slots), columns) for page in reversed(slots[row:row + columns])]
+
+
+def cut_stack(n, slots=2):
+    """ Sides of the sheets, which are cut into a stack per slot and stacked in the order of the slots.
+
+    Each stack holds consecutive pages, so the first 2 * sheets pages are on
+    the first slot of the sheets. Yields the page numbers of each side,
+    front and back alternating, None for blank pages.
+    """
+    sheets = _ceil(n, 2 * slots)
+    for i in range(sheets):
+        front = [j * 2 * sheets + 2 * i for j in range(slots)]
+        back = _mirror([page + 1 for page in front])
+        for side in (front, back):
+            yield [page if page < n else None for page in side]
+
+
+def booklet(n, signature=0):
+    """ Sides of saddle-stitched signatures with 2 pages per side, folded in the middle.
+
+    signature is the number of pages of each signature, a multiple of 4, or
+    0 for a single signature. The last signature only has the pages it
+    needs, rounded up to a multiple of 4, the blank pages are at its end.
+    """
+    if signature % 4 != 0:
+        raise Exception("The pages of a signature ({}) are not a multiple of 4.".format(signature))
+    size = signature or _ceil(n, 4) * 4
+    for first in range(0, n, size):
+        pages = min(size, _ceil(n - first, 4) * 4)
+        last = first + pages - 1
+        for k in range(pages // 4):
+            front = [last - 2 * k, first + 2 * k]
+            back = [first + 2 * k + 1, last - 2 * k - 1]
+            for side in (front, back):
+                yield [page if page < n else None for page in side]
+
+
+def n_up(n, slots=2):
+    """ Sides with slots consecutive pages each, in reading order. """
+    for first in range(0, n, slots):
+        yield [page if page < n else None for page in range(first, first + slots)]
+
+
+LAYOUTS = {"cut-stack": cut_stack, "booklet": booklet, "n-up": n_up}
+
+
+def _sheet_size(width, height, nup, paper):
+    columns, rows = GRID[nup]
+    if paper is None:
+        return columns * width, rows * height, 1
+    short, long = PAPER[paper]
+    # the orientation of the paper, which fits the grid of pages best
+    sheet_width, sheet_height = (long, short) if columns * width > rows * height else (short, long)
+    return sheet_width, sheet_height, min(sheet_width / (columns * width), sheet_height / (rows * height))
+
+
+def impose(pdf_path, out_path, layout="cut-stack", nup=1, signature=0, paper=None):
+    """ Writes the pages of pdf_path imposed by a layout to out_path, returns (pages, sheets).
+
+    With nup 1 the pages are only reordered, for printing with 2 pages per
+    side of a sheet (cut-stack and booklet), with nup 2 or 4 the pages of a
+    side are placed on a single page, scaled to fit paper if given. Pages
+    are read from the pdf as the layout needs them, blank pages have the
+    size of the first page.
+    """
+    import pypdf
+
+    if nup not in GRID:
+        raise Exception("{} pages per side are not supported, only {}.".format(nup, ", ".join(map(str, GRID))))
+    reader = pypdf.PdfReader(pdf_path)
+    n = len(reader.pages)
+    if n == 0:
+        raise Exception("{} has no pages.".format(pdf_path))
+
+    slots = max(nup, 2)
+    if layout == "booklet":
+        if slots != 2:
+            raise Exception("A booklet has 2 pages per side, not {}.".format(nup))
+        sides = booklet(n, signature)
+    else:
+        sides = LAYOUTS[layout](n, slots)
+
+    box = reader.pages[0].mediabox
+    width, height = float(box.width), float(box.height)
+    writer = pypdf.PdfWriter()
+    count = 0
+    if nup == 1:
+        for side in sides:
+            count += 1
+            for page in side:
+                if page is None:
+                    writer.add_blank_page(width, height)
+                else:
+                    writer.add_page(reader.pages[page])
+    else:
+        columns, rows = GRID[nup]
+        sheet_width, sheet_height, scale = _sheet_size(width, height, nup, paper)
+        cell_width, cell_height = sheet_width / columns, sheet_height / rows
+        for side in sides:
+            count += 1
+            sheet = writer.add_blank_page(sheet_width, sheet_height)
+            for slot, page in enumerate(side):
+                if page is None:
+                    continue
+                source = reader.pages[page]
+                if source.rotation:
+                    source.transfer_rotation_to_content()
+                box = source.mediabox
+                # each page is centered in its cell, the first row at the top
+                x = (slot % columns) * cell_width + (cell_width - float(box.width) * scale) / 2
+                y = (rows - 1 - slot // columns) * cell_height + (cell_height - float(box.height) * scale) / 2
+                sheet.merge_transformed_page(source, pypdf.Transformation()
+                                             .translate(-float(box.left), -float(box.bottom)).scale(scale)
+                                             .translate(x, y))
+
+    with open(out_path + ".tmp", "wb") as out_file:
+        writer.write(out_file)
+    os.replace(out_path + ".tmp", out_path)
+    # sides are printed on both sides of a sheet
+    return n, _ceil(count, 2)
@@ -0,0 +1,113 @@
+"""
+Song index data files (.sxd) of the songs package, as written by pdflatex and read by songidx
+"""
+import os
+import re
+
+__all__ = ["IndexEntry", "SongIndex", "iter_sxd", "read_sxd", "legacy_entry", "merge_sxd", "LEGACY_IDX"]
+
+# marker of the titles of another edition in a combined index, & is the title
+LEGACY_IDX = "~~~{\\textit{&}}"
+
+_LINK = re.compile(r"song(\d+)-(\d+)\.(\d+)$")
+
+
+class IndexEntry(object):
+    """ A title of a song: the index text, the reference (e.g. the page) and the hyperlink anchor. """
+
+    def __init__(self, title, ref, link):
+        self.title = title
+        self.ref = ref
+        self.link = link
+
+    def __repr__(self):
+        return "IndexEntry({!r}, {!r}, {!r})".format(self.title, self.ref, self.link)
+
+    @property
+    def song_number(self):
+        """ The number of the song in its songs environment, from the anchor, or None. """
+        match = _LINK.match(self.link)
+        return int(match.group(2)) if match else None
+
+
+class SongIndex(object):
+    """ The header line and the items of an .sxd file.
+
+    Items are IndexEntry objects, or strings for the directives of songidx,
+    e.g. "%prefix The", which are single lines starting with %.
+    """
+
+    def __init__(self, header, items=()):
+        self.header = header
+        self.items = list(items)
+
+    @property
+    def entries(self):
+        return [item for item in self.items if isinstance(item, IndexEntry)]
+
+
+def iter_sxd(path):
+    """ Yields the header line and then the items of an .sxd file, reading it line by line. """
+    with open(path, "r", encoding="utf-8", errors="surrogateescape") as sxd_file:
+        lines = (line.rstrip("\n") for line in sxd_file)
+        header = next(lines, None)
+        if header is None:
+            raise Exception("{} is empty.".format(path))
+        yield header
+        number = 1
+        for line in lines:
+            number += 1
+            if line.startswith("%"):
+                yield line
+                continue
+            ref, link = next(lines, None), next(lines, None)
+            if link is None:
+                raise Exception("{}:{}: incomplete entry.".format(path, number))
+            number += 2
+            yield IndexEntry(line, ref, link)
+
+
+def read_sxd(path):
+    """ Parses an .sxd file into a SongIndex. """
+    items = iter_sxd(path)
+    return SongIndex(next(items), items)
+
+
+def legacy_entry(entry, marker=LEGACY_IDX):
+    """ Returns entry as listed in the index of another edition: without hyperlink, the title marked.
+
+    As with sed, & in marker is replaced by the title, leading * of the
+    title, which songidx reads as markup, are kept in front.
+    """
+    title = entry.title.lstrip("*")
+    if title != "":
+        title = entry.title[:len(entry.title) - len(title)] + marker.replace("&", title)
+    else:
+        title = entry.title
+    return IndexEntry(title, entry.ref, "")
+
+
+def merge_sxd(sources, out_path):
+    """ Writes the index of several editions to out_path, in a single pass over the sources.
+
+    sources are (path, marker) pairs, entries of a source with a marker are
+    legacy entries, see legacy_entry. The header of the first source is kept.
+    Returns the number of entries written.
+    """
+    count = 0
+    with open(out_path + ".tmp", "w", encoding="utf-8", errors="surrogateescape") as out:
+        for i, (path, marker) in enumerate(sources):
+            items = iter_sxd(path)
+            header = next(items)
+            if i == 0:
+                out.write(header + "\n")
+            for item in items:
+                if isinstance(item, IndexEntry):
+                    if marker is not None:
+                        item = legacy_entry(item, marker)
+                    out.write("{}\n{}\n{}\n".format(item.title, item.ref, item.link))
+                    count += 1
+                else:
+                    out.write(item + "\n")
+    os.replace(out_path + ".tmp", out_path)
+    return count
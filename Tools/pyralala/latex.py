@@ -0,0 +1,120 @@
+"""
+pdflatex passes of an edition, run until its index and references reach a fixed point
+"""
+import os
+import json
+import hashlib
+import subprocess
+
+from pyralala.index import LEGACY_IDX, merge_sxd
+from pyralala.bilder import graphics_path
+from pyralala.targets import PDFLATEX, VARIANTS, BILDER_DIR, BILDER_VARIANTS, index_sources, index_command
+
+__all__ = ["EditionRunner"]
+
+DEFAULT_STATE_DIR = ".cache/pyralala/latex"
+MAX_PASSES = 5
+
+
+def _hash(path):
+    try:
+        with open(path, "rb") as hashed_file:
+            return hashlib.sha256(hashed_file.read()).hexdigest()
+    except OSError:
+        return None
+
+
+class EditionRunner(object):
+    """ Runs pdflatex on an edition until the index (.sbx) and the .aux do not change anymore.
+
+    The songs package writes the song titles and pages to .sxd, which songidx
+    compiles into the .sbx index read by the next pass. The .sxd the current
+    .sbx was compiled from is remembered in a state file, so songidx only
+    runs when songs or pages changed, and a rebuild after e.g. a typo needs a
+    single pass. Paths are relative to the repository root.
+    """
+
+    def __init__(self, edition, state_dir=DEFAULT_STATE_DIR, max_passes=MAX_PASSES, out=None,
+                 legacy_marker=LEGACY_IDX):
+        self.edition = edition
+        self.base = "Ausgaben/" + edition
+        # one file per edition, editions may be built in parallel
+        self.state_path = os.path.join(state_dir, edition + ".json")
+        self.max_passes = max_passes
+        self.legacy_marker = legacy_marker
+        self.out = out
+        self.passes = 0
+        self.index_runs = 0
+        try:
+            with open(self.state_path, "r") as state_file:
+                self._state = json.load(state_file)
+        except (OSError, ValueError):
+            self._state = {}
+
+    def _log(self, line):
+        if self.out is not None:
+            print(line, file=self.out)
+
+    def _save(self):
+        directory = os.path.dirname(os.path.abspath(self.state_path))
+        os.makedirs(directory, exist_ok=True)
+        with open(self.state_path + ".tmp", "w") as state_file:
+            json.dump(self._state, state_file)
+        os.replace(self.state_path + ".tmp", self.state_path)
+
+    def _run(self, command, env=None, shell=False):
+        self._log(" ".join(command) if not shell else command)
+        result = subprocess.run(command, shell=shell, env=dict(os.environ, **(env or {})), stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT, universal_newlines=True, errors="replace")
+        if result.returncode != 0:
+            raise Exception("{} failed with exit code {}:\n{}".format(
+                command if shell else command[0], result.returncode, "\n".join(result.stdout.splitlines()[-20:])))
+
+    def pdflatex(self, suffix=""):
+        """ Runs one pass of pdflatex for a variant of the edition. """
+        env = dict(VARIANTS[suffix])
+        if suffix in BILDER_VARIANTS:
+            env["TEXINPUTS"] = graphics_path(BILDER_DIR, BILDER_VARIANTS[suffix])
+        self._run(PDFLATEX + ["-jobname=" + self.base + suffix, self.base + ".tex"], env)
+        if suffix == "":
+            self.passes += 1
+
+    def index(self):
+        """ Compiles .sxd into .sbx, unless the current .sbx was compiled from the same .sxd.
+
+        A combined index is first merged into .merged.sxd, see merge_sxd.
+        """
+        sources = index_sources(self.edition, self.legacy_marker)
+        key = []
+        for path, marker in sources:
+            sxd_hash = _hash(path)
+            if sxd_hash is None:
+                raise Exception("The index needs {}, it is written by pdflatex.".format(path))
+            key.append([path, sxd_hash, marker])
+
+        sbx = self._state.get("sbx")
+        if self._state.get("sxd") == key and sbx is not None and sbx == _hash(self.base + ".sbx"):
+            return
+        sxd = self.base + ".sxd"
+        if len(sources) > 1:
+            sxd = self.base + ".merged.sxd"
+            self._log("merge {} into {}".format(" ".join(path for path, _ in sources), sxd))
+            merge_sxd(sources, sxd)
+        self._run(index_command(sxd, self.base + ".sbx"), shell=True)
+        self.index_runs += 1
+        self._state = {"sxd": key, "sbx": _hash(self.base + ".sbx")}
+        self._save()
+
+    def run(self, variants=("",)):
+        """ Runs the passes of the draft pdf until the fixed point, then one pass for each other variant. """
+        while True:
+            before = (_hash(self.base + ".sbx"), _hash(self.base + ".aux"))
+            self.pdflatex()
+            self.index()
+            if (_hash(self.base + ".sbx"), _hash(self.base + ".aux")) == before:
+                break
+            if self.passes >= self.max_passes:
+                raise Exception("{} did not converge after {} passes.".format(self.base, self.passes))
+        for suffix in variants:
+            if suffix != "":
+                self.pdflatex(suffix)
@@ -0,0 +1,106 @@
+"""
+Layout of chord lines over lyrics lines for plain text output
+"""
+
+__all__ = ["layout", "resolve_collisions", "chord_line"]
+
+# minimal number of spaces between two chords
+CHORD_GAP = 1
+
+
+def chord_line(chords):
+    """ Returns the text line of (column, name) chords. """
+    parts = []
+    column = 0
+    for pos, name in chords:
+        parts.append(" " * (pos - column))
+        parts.append(name)
+        column = max(column, pos) + len(name)
+    return "".join(parts)
+
+
+def resolve_collisions(lyric, chords):
+    """ Moves overlapping chords apart by padding the lyric line below them.
+
+    chords are (position, name) tuples sorted by position. Within a word the
+    lyric line is padded with hyphens, otherwise with spaces. Returns the padded
+    lyric line and the chords at their new columns.
+    """
+    pieces = []
+    placed = []
+    copied = 0
+    shift = 0
+    free = 0
+    for pos, name in chords:
+        column = pos + shift
+        if len(placed) > 0 and column < free:
+            padding = free - column
+            if pos < len(lyric):
+                pieces.append(lyric[copied:pos])
+                copied = pos
+                in_word = 0 < pos < len(lyric) and not lyric[pos - 1].isspace() and not lyric[pos].isspace()
+                pieces.append(("-" if in_word else " ") * padding)
+            shift += padding
+            column = free
+        placed.append((column, name))
+        free = column + len(name) + CHORD_GAP
+    if copied == 0:
+        return lyric, placed
+    pieces.append(lyric[copied:])
+    return "".join(pieces), placed
+
+
+def layout(lyric, chords, width=None):
+    """ Returns the (chord line, lyric line) pairs of a lyric line and its chords.
+
+    Overlapping chords are moved apart, and with width the line is wrapped at
+    spaces, so no line is longer than width, as long as no word or chord is.
+    Chords stay above the lyrics they belong to. Runs in linear time.
+    """
+    lyric, chords = resolve_collisions(lyric, chords)
+    length = len(lyric)
+    if len(chords) > 0:
+        length = max(length, chords[-1][0] + len(chords[-1][1]))
+    if width is None or length <= width:
+        return [(chord_line(chords), lyric)]
+
+    lines = []
+    start = 0
+    first = 0
+    while start < length:
+        stop = start + width
+        if stop >= length:
+            end = length
+        elif stop >= len(lyric):
+            end = stop
+        else:
+            # break at the last space within the width, or inside a word, if there is none
+            end = lyric.rfind(" ", start + 1, stop + 1)
+            if end < 0:
+                end = stop
+
+        # chords must not be split and not exceed the width, break before them otherwise
+        i = first
+        while i < len(chords) and chords[i][0] < end:
+            pos, name = chords[i]
+            if pos > start and pos + len(name) > stop:
+                space = lyric.rfind(" ", start + 1, min(pos, len(lyric)) + 1)
+                end = space if space > start else pos
+                break
+            i += 1
+
+        line_chords = []
+        while first < len(chords) and chords[first][0] < end:
+            line_chords.append((chords[first][0] - start, chords[first][1]))
+            first += 1
+        if end < length:
+            lines.append((chord_line(line_chords), lyric[start:end].rstrip()))
+        else:
+            lines.append((chord_line(line_chords), lyric[start:end]))
+
+        # the space at the break is dropped, unless a chord is placed above it
+        start = end
+        if end < length and (end >= len(lyric) or lyric[end] == " "):
+            if first == len(chords) or chords[first][0] != end:
+                start += 1
+    return lines
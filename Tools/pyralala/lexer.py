@@ -0,0 +1,196 @@
+"""
+Streaming tokenizer for the LaTeX subset used by the songs package
+"""
+import re
+
+__all__ = ["Command", "Arg", "tokenize", "plain_text"]
+
+# Arguments read after a command: "{" is a mandatory, "[" an optional argument.
+# Commands not listed here don't take any arguments.
+ARGUMENTS = {
+    "beginsong": "{[",
+    "includegraphics": "[{",
+    "memorize": "[",
+    "replay": "[",
+    "rep": "{",
+    "repchorus": "{",
+    "echo": "{",
+    "emph": "{",
+    "textit": "{",
+    "textbf": "{",
+    "textnote": "{",
+    "interlude": "{",
+    "renewcommand": "{{",
+    "newchords": "{",
+    "transpose": "{",
+    "gtab": "{{",
+    "vspace": "{",
+    "beginscripture": "{",
+    "markboth": "{{",
+    "notenames": "{{{{{{{",
+    "begin": "{",
+    "end": "{",
+    # edition files
+    "input": "{",
+    "providecommand": "{{",
+    "songchapter": "{",
+    "setthumb": "{{",
+}
+
+# Arguments read after \begin{environment}
+ENV_ARGUMENTS = {
+    "minipage": "[{",
+    "wrapfigure": "[{[{",
+    "tabularx": "{{",
+}
+
+# Control symbols and text macros, which are replaced by plain text
+SYMBOLS = {
+    "#": "#", "&": "&", "%": "%", "$": "$", "_": "_", "{": "{", "}": "}",
+    " ": " ", "\n": " ", ",": " ", "-": "", "=": "", "\\": "\n",
+    "dq": "\"", "ae": "æ",
+}
+
+_TEXT = re.compile(r"[^\\{}%$]+")
+_NAME = re.compile(r"[a-zA-Z]+\*?|.", re.S)
+_SPACE = re.compile(r"[ \t]*\n?[ \t]*")
+_BALANCED = re.compile(r"\\.|%[^\n]*|[{}\]]", re.S)
+_MATH = re.compile(r"(?:\\.|[^$\\])*\$", re.S)
+
+
+class Arg(object):
+    def __init__(self, value, optional=False):
+        self.value = value
+        self.optional = optional
+
+    @property
+    def contents(self):
+        return tokenize(self.value)
+
+    def __str__(self):
+        return self.value
+
+    def __repr__(self):
+        return "{}{}{}".format("[" if self.optional else "{", self.value, "]" if self.optional else "}")
+
+
+class Command(object):
+    def __init__(self, name, args=None):
+        self.name = name
+        self.args = args or []
+
+    def __repr__(self):
+        return "\\{}{}".format(self.name, "".join(repr(a) for a in self.args))
+
+
+class _Lexer(object):
+    def __init__(self, source):
+        self.source = source
+        self.pos = 0
+
+    def tokens(self):
+        source = self.source
+        while self.pos < len(source):
+            c = source[self.pos]
+            if c == "\\":
+                yield from self._command()
+            elif c == "{":
+                self.pos += 1
+                yield from tokenize(self._balanced("}"))
+            elif c == "}":
+                raise SyntaxError("Unexpected }} at position {}.".format(self.pos))
+            elif c == "%":
+                end = source.find("\n", self.pos)
+                self.pos = len(source) if end < 0 else end
+            elif c == "$":
+                m = _MATH.match(source, self.pos + 1)
+                if m is None:
+                    raise EOFError("Expecting $. Reached end of file.")
+                self.pos = m.end()
+                yield Command("$", [Arg(m.group()[:-1])])
+            else:
+                m = _TEXT.match(source, self.pos)
+                self.pos = m.end()
+                yield m.group()
+
+    def _command(self):
+        m = _NAME.match(self.source, self.pos + 1)
+        if m is None:
+            raise EOFError("Expecting command name. Reached end of file.")
+        name = m.group()
+        self.pos = m.end()
+
+        if name == "[":
+            # commands in chords, e.g. \rep{4}, are read like in the lyrics
+            yield "\\["
+            yield from tokenize(self._balanced("]"))
+            yield "]"
+        elif name in SYMBOLS:
+            yield SYMBOLS[name]
+        else:
+            args = self._arguments(ARGUMENTS.get(name, ""))
+            if name == "begin" and len(args) > 0:
+                args += self._arguments(ENV_ARGUMENTS.get(args[0].value, ""))
+            yield Command(name, args)
+
+    def _arguments(self, spec):
+        args = []
+        for kind in spec:
+            start = _SPACE.match(self.source, self.pos).end()
+            if kind == "[":
+                if self.source.startswith("[", start):
+                    self.pos = start + 1
+                    args.append(Arg(self._balanced("]"), optional=True))
+            elif self.source.startswith("{", start):
+                self.pos = start + 1
+                args.append(Arg(self._balanced("}")))
+            else:
+                # a single token is a valid argument as well
+                m = _NAME.match(self.source, start + 1 if self.source.startswith("\\", start) else start)
+                if m is None:
+                    break
+                args.append(Arg(self.source[start:m.end()]))
+                self.pos = m.end()
+        return args
+
+    def _balanced(self, close):
+        # returns the source up to the closing delimiter, comments removed
+        depth = 0
+        parts = []
+        start = self.pos
+        for m in _BALANCED.finditer(self.source, self.pos):
+            c = m.group()
+            if c.startswith("%"):
+                parts.append(self.source[start:m.start()])
+                start = m.end()
+            elif c == "{":
+                depth += 1
+            elif c == "}" and depth > 0:
+                depth -= 1
+            elif c == close and depth == 0:
+                parts.append(self.source[start:m.start()])
+                self.pos = m.end()
+                return "".join(parts)
+        raise EOFError("Expecting {}. Reached end of file.".format(close))
+
+
+def tokenize(source):
+    """ Yields text strings and Command objects in order of their occurrence.
+
+    Groups are flattened into the stream, comments are dropped and chords are
+    passed through as text ("\\[", "Am", "]"), so they can be extracted later on.
+    """
+    return _Lexer(source).tokens()
+
+
+def plain_text(tokens):
+    """ Joins the text of the given tokens, including the text of mandatory
+    arguments, e.g. for "\\textnote{\\bf Bridge}" this returns " Bridge".
+    """
+    parts = []
+    for t in tokens:
+        if isinstance(t, str):
+            parts.append(t)
+        elif t.name != "$":
+            parts += [plain_text(a.contents) for a in t.args if not a.optional]
+    return "".join(parts)
@@ -0,0 +1,224 @@
+"""
+A corpus of songs, loaded once, with indexes of their metadata
+"""
+import os
+import re
+import bisect
+
+from pyralala.data import Song, SONGBOOK_FORMAT
+from pyralala.cache import SongCache
+
+__all__ = ["Library", "find_songs", "normalize"]
+
+AUTHOR_KEYS = ("wuw", "mel", "txt")
+YEAR_KEYS = ("jahr", "meljahr", "txtjahr")
+
+# songs are only parsed in worker processes, if enough of them are not cached
+MIN_PARALLEL_SONGS = 32
+
+_YEAR = re.compile(r"\b(1[0-9]{3}|20[0-9]{2})\b")
+# separators of multiple authors, outside of parentheses
+_AUTHOR_SEPARATORS = re.compile(r"\s*(?:,|;|/|&| und | and )\s*(?![^()]*\))")
+_PARENTHESES = re.compile(r"^(.*?)\s*\((.*)\)$")
+
+
+def normalize(text):
+    """ Key for looking up titles and authors: case-folded with collapsed whitespace. """
+    return " ".join(text.casefold().split()).strip(" .,;:!?'\"")
+
+
+def find_songs(paths):
+    """ Yields the song files of paths, directories are searched for .tex files. """
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.endswith(".tex"):
+                    yield os.path.join(path, name)
+        else:
+            yield path
+
+
+def authors(value):
+    """ Splits an author field into the names it is found by.
+
+    "olka (Erich Scholz), Nerother Wandervogel" is found by the complete value,
+    "olka (Erich Scholz)", "olka", "Erich Scholz" and "Nerother Wandervogel".
+    """
+    names = [value]
+    for name in _AUTHOR_SEPARATORS.split(value):
+        names.append(name)
+        m = _PARENTHESES.match(name)
+        if m is not None:
+            names += m.groups()
+    return [n for n in (normalize(n) for n in names) if len(n) > 0]
+
+
+def _parse(path):
+    """ Parses a song, returns the song and an error message or None.
+
+    On errors the partially read song is returned, its metadata is still usable.
+    """
+    from pyralala import SongReader
+
+    reader = SongReader(path)
+    try:
+        reader.read()
+    except Exception as e:
+        song = reader.song if isinstance(reader.song, Song) else None
+        return song, "{}: {}".format(type(e).__name__, e)
+    return reader.song, None
+
+
+def _parse_and_store(path, key, cache_dir):
+    song, error = _parse(path)
+    if error is None and cache_dir:
+        SongCache(cache_dir).put(key, song)
+    return song, error
+
+
+class Library(object):
+    """ Songs of a corpus and their metadata indexes.
+
+    Songs are identified by their file path, all queries return lists of paths
+    in corpus order, the Song objects are found in Library.songs.
+    """
+
+    def __init__(self):
+        self.songs = {}
+        self.errors = {}
+        self._order = {}
+        self._titles = {}
+        self._sorted_titles = []
+        self._authors = {}
+        self._years = []
+        self._year_paths = []
+        self._songbooks = {}
+
+    @classmethod
+    def load(cls, paths=("Lieder",), cache_dir=None, jobs=None):
+        """ Loads all songs of paths, parsing them in parallel and caching them in cache_dir, if given. """
+        from pyralala import tokenize
+
+        library = cls()
+        files = list(find_songs(paths))
+        cache = SongCache(cache_dir) if cache_dir else None
+
+        songs = {}
+        missing = []
+        for path in files:
+            if cache is None:
+                missing.append((path, None))
+                continue
+            with open(path, "rb") as song_file:
+                key = SongCache.key(song_file.read(), tokenize)
+            song = cache.get(key)
+            if song is None:
+                missing.append((path, key))
+            else:
+                songs[path] = (song, None)
+
+        if len(missing) >= MIN_PARALLEL_SONGS and jobs != 1:
+            from concurrent.futures import ProcessPoolExecutor
+
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                results = executor.map(_parse_and_store, [m[0] for m in missing], [m[1] for m in missing],
+                                       [cache_dir] * len(missing), chunksize=8)
+                songs.update(zip([m[0] for m in missing], results))
+        else:
+            for path, key in missing:
+                songs[path] = _parse_and_store(path, key, cache_dir)
+
+        for path in files:
+            song, error = songs[path]
+            if error is not None:
+                library.errors[path] = error
+            if song is not None:
+                library.add(path, song)
+        library._sort()
+        return library
+
+    def add(self, path, song):
+        """ Adds a song and indexes its metadata. """
+        self.songs[path] = song
+        self._order[path] = len(self._order)
+        self._titles.setdefault(normalize(song.title), []).append(path)
+
+        for key, value in song.info:
+            if key == "index":
+                self._titles.setdefault(normalize(value), []).append(path)
+            elif key in AUTHOR_KEYS:
+                for name in authors(value):
+                    paths = self._authors.setdefault(name, [])
+                    if len(paths) == 0 or paths[-1] != path:
+                        paths.append(path)
+            elif key in YEAR_KEYS:
+                m = _YEAR.search(value)
+                if m is not None:
+                    self._years.append((int(m.group()), path))
+            elif key in SONGBOOK_FORMAT:
+                self._songbooks.setdefault(key, {}).setdefault(value, []).append(path)
+
+    def _sort(self):
+        self._sorted_titles = sorted(self._titles)
+        self._years = sorted(set(self._years))
+        self._year_paths = [y[1] for y in self._years]
+        self._years = [y[0] for y in self._years]
+
+    def __len__(self):
+        return len(self.songs)
+
+    def __iter__(self):
+        return iter(self.songs)
+
+    def __getitem__(self, path):
+        return self.songs[path]
+
+    def by_title(self, title):
+        """ Songs with the given title or alternative \"index\" title. """
+        return list(self._titles.get(normalize(title), []))
+
+    def titles_starting(self, prefix):
+        """ Songs with a title or alternative title starting with prefix. """
+        prefix = normalize(prefix)
+        paths = []
+        for title in self._sorted_titles[bisect.bisect_left(self._sorted_titles, prefix):]:
+            if not title.startswith(prefix):
+                break
+            paths += self._titles[title]
+        return self._ordered(set(paths))
+
+    def by_author(self, name):
+        """ Songs written or composed by name (wuw, mel or txt). """
+        return list(self._authors.get(normalize(name), []))
+
+    def by_year(self, first, last=None):
+        """ Songs with a year (jahr, meljahr or txtjahr) from first to last, inclusive. """
+        last = first if last is None else last
+        start = bisect.bisect_left(self._years, first)
+        end = bisect.bisect_right(self._years, last)
+        return self._ordered(set(self._year_paths[start:end]))
+
+    def by_songbook(self, book, reference=None):
+        """ Songs found in a legacy songbook, e.g. "pfii", optionally at reference. """
+        refs = self._songbooks.get(book, {})
+        if reference is not None:
+            return list(refs.get(str(reference), []))
+        return self._ordered(set(p for paths in refs.values() for p in paths))
+
+    def songbook_references(self, book):
+        """ Dictionary of reference to songs of a legacy songbook. """
+        return dict(self._songbooks.get(book, {}))
+
+    def query(self, title=None, author=None, years=None, songbook=None):
+        """ Songs matching all given criteria, years is a (first, last) tuple. """
+        result = None
+        for given, lookup in ((title, self.by_title), (author, self.by_author),
+                              (years, lambda y: self.by_year(*y)), (songbook, self.by_songbook)):
+            if given is None:
+                continue
+            paths = set(lookup(given))
+            result = paths if result is None else result & paths
+        return list(self.songs) if result is None else self._ordered(result)
+
+    def _ordered(self, paths):
+        return sorted(paths, key=self._order.__getitem__)
@@ -0,0 +1,176 @@
+"""
+Sheet music of ABC_Noten: abcm2ps, ps2pdf and pdfcrop with a cache per stage
+"""
+import os
+import shutil
+import hashlib
+import subprocess
+
+from pyralala.cache import DEFAULT_CACHE_DIR
+
+__all__ = ["NotenCache", "TuneError", "convert_tunes"]
+
+ABC_FORMAT = "Misc/abcm2ps.fmt"
+ABCM2PS = ["abcm2ps", "-c"]
+# changing the stages invalidates the cache
+NOTEN_VERSION = b"1"
+
+
+class TuneError(Exception):
+    """ A stage failed for a tune, diagnostics holds the lines reported by the tool. """
+
+    def __init__(self, tune, stage, diagnostics):
+        Exception.__init__(self, tune, stage, diagnostics)
+        self.tune = tune
+        self.stage = stage
+        self.diagnostics = diagnostics
+
+    def __str__(self):
+        return "{}: {} failed".format(self.tune, self.stage)
+
+
+def _digest(*parts):
+    digest = hashlib.sha256(NOTEN_VERSION)
+    for part in parts:
+        digest.update(hashlib.sha256(part).digest())
+    return digest.hexdigest()
+
+
+def _read(path):
+    with open(path, "rb") as in_file:
+        return in_file.read()
+
+
+def diagnostics(output):
+    """ Returns the warning and error lines of abcm2ps output. """
+    return [l.strip() for l in output.splitlines() if "error" in l.lower() or "warning" in l.lower()]
+
+
+class NotenCache(object):
+    """ Converts tunes into cropped pdfs, each stage only when its input changed.
+
+    The result of each stage is stored by a hash of its input, the first stage
+    by a hash of the tune and the format file.
+    """
+
+    def __init__(self, directory=os.path.join(DEFAULT_CACHE_DIR, "noten"), format_path=ABC_FORMAT):
+        self.directory = directory
+        self.format_path = format_path
+        self.runs = dict((stage, 0) for stage in ("abcm2ps", "ps2pdf", "pdfcrop"))
+        os.makedirs(directory, exist_ok=True)
+
+    def _stage(self, stage, key, suffix, run, extra=()):
+        """ Returns the path of the cached result of a stage, running it on a cache miss.
+
+        extra are further files written by run, a missing one is a cache miss as well.
+        """
+        path = os.path.join(self.directory, key + suffix)
+        if os.path.exists(path) and all(os.path.exists(p) for p in extra):
+            return path
+        temp_dir = path + ".tmp.{}".format(os.getpid())
+        os.makedirs(temp_dir, exist_ok=True)
+        try:
+            self.runs[stage] += 1
+            result = run(temp_dir)
+            # atomic, parallel runs may convert the same tune
+            os.replace(result, path)
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        return path
+
+    def convert(self, mcm_path, out_path):
+        """ Writes the cropped pdf of a tune to out_path, returns the warnings of abcm2ps.
+
+        out_path is only written if its content changes. On errors, a TuneError is
+        raised and an outdated out_path is removed.
+        """
+        tune = os.path.splitext(os.path.basename(mcm_path))[0]
+        try:
+            ps_key = _digest(_read(mcm_path), _read(self.format_path), " ".join(ABCM2PS).encode())
+            warnings_path = os.path.join(self.directory, ps_key + ".log")
+
+            def abcm2ps(temp_dir):
+                ps = os.path.join(temp_dir, tune + ".ps")
+                try:
+                    result = subprocess.run(ABCM2PS + ["-F", os.path.abspath(self.format_path), "-O", ps,
+                                                       os.path.abspath(mcm_path)],
+                                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                            universal_newlines=True, errors="replace")
+                except OSError as e:
+                    raise TuneError(tune, "abcm2ps", [str(e)])
+                if result.returncode != 0 or not os.path.exists(ps) or os.path.getsize(ps) == 0:
+                    raise TuneError(tune, "abcm2ps", diagnostics(result.stdout) or result.stdout.splitlines()[-5:])
+                # the warnings are kept with the cached result
+                with open(warnings_path, "w") as warnings_file:
+                    warnings_file.write("\n".join(diagnostics(result.stdout)))
+                return ps
+
+            ps = self._stage("abcm2ps", ps_key, ".ps", abcm2ps, [warnings_path])
+            with open(warnings_path, "r") as warnings_file:
+                warnings = warnings_file.read().splitlines()
+            pdf = self._stage("ps2pdf", _digest(_read(ps)), ".a5.pdf",
+                              lambda temp_dir: self._run(tune, "ps2pdf", ps, os.path.join(temp_dir, "a5.pdf")))
+            cropped = self._stage("pdfcrop", _digest(_read(pdf)), ".pdf",
+                                  lambda temp_dir: self._run(tune, "pdfcrop", pdf, os.path.join(temp_dir, "crop.pdf")))
+        except (TuneError, OSError) as e:
+            if os.path.exists(out_path):
+                os.remove(out_path)
+            if isinstance(e, OSError):
+                raise TuneError(tune, "read", [str(e)])
+            raise
+
+        data = _read(cropped)
+        if not os.path.exists(out_path) or _read(out_path) != data:
+            os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+            shutil.copyfile(cropped, out_path)
+        return warnings
+
+    @staticmethod
+    def _run(tune, tool, in_path, out_path):
+        try:
+            result = subprocess.run([tool, in_path, out_path], stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                    universal_newlines=True, errors="replace")
+        except OSError as e:
+            raise TuneError(tune, tool, [str(e)])
+        if result.returncode != 0 or not os.path.exists(out_path):
+            raise TuneError(tune, tool, result.stdout.splitlines()[-5:])
+        return out_path
+
+
+def _convert(item):
+    cache, mcm_path, out_path = item
+    before = dict(cache.runs)
+    try:
+        warnings, error = cache.convert(mcm_path, out_path), None
+    except TuneError as e:
+        warnings, error = [], e
+    return warnings, error, dict((stage, n - before[stage]) for stage, n in cache.runs.items())
+
+
+def convert_tunes(mcm_paths, out_dir="Noten", cache=None, jobs=None):
+    """ Converts tunes into out_dir/<tune>.pdf with a pool of worker processes.
+
+    Returns the warnings and the TuneErrors by tune file, and the number of runs per stage.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    cache = cache or NotenCache()
+    items = [(cache, path, os.path.join(out_dir, os.path.splitext(os.path.basename(path))[0] + ".pdf"))
+             for path in mcm_paths]
+    if jobs == 1 or len(items) <= 1:
+        results = [_convert(item) for item in items]
+    else:
+        with ProcessPoolExecutor(max_workers=min(jobs or os.cpu_count(), len(items))) as executor:
+            results = list(executor.map(_convert, items, chunksize=4))
+
+    warnings = {}
+    errors = {}
+    runs = dict((stage, 0) for stage in cache.runs)
+    for path, (tune_warnings, error, tune_runs) in zip(mcm_paths, results):
+        if len(tune_warnings) > 0:
+            warnings[path] = tune_warnings
+        if error is not None:
+            errors[path] = error
+        for stage, n in tune_runs.items():
+            runs[stage] += n
+    return warnings, errors, runs
@@ -0,0 +1,204 @@
+"""
+Full-text search index of song lyrics
+"""
+import os
+import re
+import array
+import pickle
+import hashlib
+import collections
+
+from pyralala.data import Song
+from pyralala.cache import DEFAULT_CACHE_DIR, parser_version
+
+__all__ = ["SearchIndex", "Hit", "fold", "words"]
+
+INDEX_VERSION = 1
+DEFAULT_INDEX = os.path.join(DEFAULT_CACHE_DIR, "lyrics.idx")
+
+# umlauts and ß are folded, so "Strasse" finds "Straße" and "uber" finds "über"
+FOLDING = str.maketrans({"ä": "a", "ö": "o", "ü": "u", "ß": "ss", "'": None, "’": None})
+_WORD = re.compile(r"\w+")
+_QUERY = re.compile(r"\"([^\"]*)\"|(\S+)")
+
+Hit = collections.namedtuple("Hit", ["title", "path", "part", "line_number", "line"])
+
+# per file: id, content hash, title, part labels, lyrics lines per part, indexed terms
+_File = collections.namedtuple("_File", ["id", "hash", "title", "parts", "lines", "terms"])
+
+
+def fold(text):
+    return text.casefold().replace("|:", " ").replace(":|", " ").translate(FOLDING)
+
+
+def words(text):
+    """ Returns the folded words of text, as they are indexed. """
+    return _WORD.findall(fold(text))
+
+
+def part_label(part):
+    if isinstance(part, Song.Verse):
+        return "Verse {}".format(part.verse_number)
+    if isinstance(part, Song.Chorus):
+        return part.heading
+    return ""
+
+
+class SearchIndex(object):
+    """ Inverted index of the lyrics of a corpus, stored in a single file.
+
+    Postings are (file id, part, line, word position) tuples of unsigned shorts,
+    the word position counts across the lines of a part, so phrases may span lines.
+    """
+
+    def __init__(self, path=DEFAULT_INDEX):
+        self.path = path
+        self._files = {}
+        self._postings = {}
+        self._changed = False
+        self._load()
+
+    def _version(self):
+        return "{}-{}".format(INDEX_VERSION, parser_version())
+
+    def _load(self):
+        import zlib
+
+        try:
+            with open(self.path, "rb") as index_file:
+                version, files, postings = pickle.loads(zlib.decompress(index_file.read()))
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError, zlib.error):
+            return
+        if version == self._version():
+            self._files = {path: _File(*f) for path, f in files.items()}
+            self._postings = postings
+
+    def save(self):
+        """ Writes the index atomically, if it was changed. """
+        import zlib
+        import tempfile
+
+        if not self._changed:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        data = (self._version(), {path: tuple(f) for path, f in self._files.items()}, self._postings)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as index_file:
+            index_file.write(zlib.compress(pickle.dumps(data, pickle.HIGHEST_PROTOCOL)))
+        os.replace(temp_path, self.path)
+        self._changed = False
+
+    def __len__(self):
+        return len(self._files)
+
+    def update(self, paths=("Lieder",), cache_dir=None, jobs=None):
+        """ Re-indexes new and changed songs of paths, removes deleted songs.
+
+        Returns the number of changed files.
+        """
+        from pyralala.library import Library, find_songs
+
+        hashes = {}
+        for path in find_songs(paths):
+            with open(path, "rb") as song_file:
+                hashes[path] = hashlib.sha256(song_file.read()).hexdigest()
+
+        removed = [p for p in self._files if p not in hashes]
+        changed = [p for p, h in hashes.items() if p not in self._files or self._files[p].hash != h]
+        for path in removed + changed:
+            self.remove(path)
+
+        if len(changed) > 0:
+            library = Library.load(changed, cache_dir=cache_dir, jobs=jobs)
+            for path in changed:
+                if path in library.songs:
+                    self.add(path, library.songs[path], hashes[path])
+                else:
+                    # remember unreadable files as well, so they are not parsed again
+                    self._add_file(path, hashes[path], "", [], [], {})
+        return len(removed) + len(changed)
+
+    def _add_file(self, path, content_hash, title, parts, lines, postings):
+        used = set(f.id for f in self._files.values())
+        file_id = next(i for i in range(len(used) + 1) if i not in used)
+        for term, entries in postings.items():
+            for entry in entries:
+                entry[0] = file_id
+            encoded = array.array("H", [n for entry in entries for n in entry]).tobytes()
+            self._postings[term] = self._postings.get(term, b"") + encoded
+        self._files[path] = _File(file_id, content_hash, title, parts, lines, sorted(postings))
+        self._changed = True
+
+    def add(self, path, song, content_hash=""):
+        """ Indexes the lyrics of song, stored as file path. """
+        self.remove(path)
+        parts = []
+        lines = []
+        postings = collections.defaultdict(list)
+        for part in song._contents:
+            if not isinstance(part, Song.MusicPart):
+                continue
+            part_number = len(parts)
+            parts.append(part_label(part))
+            lines.append(part.lyrics)
+            position = 0
+            for line_number, line in enumerate(lines[-1]):
+                for word in words(line):
+                    postings[word].append([0, part_number, line_number, position])
+                    position += 1
+        self._add_file(path, content_hash, song.title, parts, lines, postings)
+
+    def remove(self, path):
+        """ Removes a file from the index. """
+        entry = self._files.pop(path, None)
+        if entry is None:
+            return
+        for term in entry.terms:
+            postings = array.array("H", self._postings[term])
+            kept = array.array("H")
+            for i in range(0, len(postings), 4):
+                if postings[i] != entry.id:
+                    kept.extend(postings[i:i + 4])
+            if len(kept) > 0:
+                self._postings[term] = kept.tobytes()
+            else:
+                del self._postings[term]
+        self._changed = True
+
+    def _positions(self, phrase):
+        # set of (file id, part, line, position) of the first word of phrase
+        terms = words(phrase)
+        if len(terms) == 0:
+            return set()
+        matches = None
+        for offset, term in enumerate(terms):
+            postings = array.array("H", self._postings.get(term, b""))
+            found = set(zip(postings[0::4], postings[1::4], (pos - offset for pos in postings[3::4])))
+            matches = found if matches is None else matches & found
+            if len(matches) == 0:
+                return set()
+
+        # look up the line of each match
+        postings = array.array("H", self._postings[terms[0]])
+        lines = dict(((f, p, pos), line) for f, p, line, pos in zip(*(postings[i::4] for i in range(4))))
+        return set((f, p, lines[f, p, pos], pos) for f, p, pos in matches)
+
+    def search(self, query):
+        """ Returns the hits of query, a hit is a part containing all words and "quoted phrases". """
+        parts = None
+        first = {}
+        for phrase, word in _QUERY.findall(query):
+            positions = self._positions(phrase or word)
+            found = set((f, p) for f, p, _, _ in positions)
+            for f, p, line, pos in sorted(positions):
+                first.setdefault((f, p), line)
+            parts = found if parts is None else parts & found
+
+        files = dict((f.id, (path, f)) for path, f in self._files.items())
+        hits = []
+        for file_id, part in sorted(parts or (), key=lambda fp: (files[fp[0]][0], fp[1])):
+            path, entry = files[file_id]
+            line_number = first[file_id, part]
+            hits.append(Hit(entry.title, path, entry.parts[part], line_number, entry.lines[part][line_number]))
+        return hits
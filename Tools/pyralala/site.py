@@ -0,0 +1,231 @@
+"""
+Static website of a songbook edition, rebuilt incrementally
+"""
+import os
+import json
+import html
+
+from pyralala.cache import file_hash, template_hash, TEMPLATE_MODULES
+from pyralala.lexer import Command, tokenize, plain_text
+
+__all__ = ["Edition", "SiteBuilder"]
+
+MANIFEST = ".manifest.json"
+# modules the generated pages depend on, changing one of them rebuilds all pages
+SITE_MODULES = TEMPLATE_MODULES + ("site.py",)
+
+
+class Edition(object):
+    """ Songs of an edition file (Ausgaben/*.tex) in book order.
+
+    songs is a list of (chapter, thumb, song path) tuples, chapter and thumb
+    are the latest \\songchapter and \\setthumb before the song, or "".
+    """
+
+    def __init__(self, path, root=None):
+        self.path = path
+        # inputs are relative to the repository root, the parent of Ausgaben/
+        self.root = root if root is not None else os.path.dirname(os.path.dirname(os.path.abspath(path)))
+        self.title = os.path.splitext(os.path.basename(path))[0]
+        self.songs = []
+
+        with open(path, "r") as edition_file:
+            source = edition_file.read()
+
+        chapter = ""
+        thumb = ""
+        for t in tokenize(source):
+            if not isinstance(t, Command) or len(t.args) == 0:
+                continue
+            if t.name == "providecommand" and t.args[0].value.strip() == "\\bookname" and len(t.args) > 1:
+                self.title = plain_text(t.args[1].contents).strip()
+            elif t.name == "songchapter":
+                chapter = plain_text(t.args[0].contents).strip()
+            elif t.name == "setthumb":
+                thumb = plain_text(t.args[0].contents).strip()
+            elif t.name == "input" and t.args[0].value.strip().startswith("Lieder/"):
+                song_path = t.args[0].value.strip()
+                if not song_path.endswith(".tex"):
+                    song_path += ".tex"
+                self.songs.append((chapter, thumb, os.path.join(self.root, song_path)))
+
+
+def page_name(song_path):
+    return os.path.splitext(os.path.basename(song_path))[0] + ".html"
+
+
+class SiteBuilder(object):
+    """ Renders the song pages, chapter pages and an alphabetical index of an edition.
+
+    The manifest in the output directory records the hashes of the files each
+    page depends on, so a rebuild only renders pages whose song, graphics or
+    template changed.
+    """
+
+    def __init__(self, edition, out_dir, cache_dir=None, graphics=None, transpose=0, jobs=None):
+        self.edition = edition
+        self.out_dir = out_dir
+        self.cache_dir = cache_dir
+        self.graphics = graphics
+        self.transpose = transpose
+        self.jobs = jobs
+        self.built = []
+        self.skipped = []
+        self.errors = {}
+        self._manifest = {}
+
+    def _load_manifest(self):
+        try:
+            with open(os.path.join(self.out_dir, MANIFEST), "r") as manifest_file:
+                return json.load(manifest_file)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_manifest(self):
+        path = os.path.join(self.out_dir, MANIFEST)
+        with open(path + ".tmp", "w") as manifest_file:
+            json.dump(self._manifest, manifest_file, indent=1, sort_keys=True)
+        os.replace(path + ".tmp", path)
+
+    def _up_to_date(self, old, page, deps):
+        return (page in old and old[page] == deps and os.path.exists(os.path.join(self.out_dir, page)))
+
+    def build(self, force=False):
+        """ Renders all changed pages, returns the list of rendered pages. """
+        from pyralala import Library
+        from pyralala.assets import write_stylesheet
+        from pyralala.export import HTMLCompiler
+        from pyralala.graphics import SVGCache
+
+        os.makedirs(self.out_dir, exist_ok=True)
+        old = {} if force else self._load_manifest()
+        template = template_hash({"transpose": self.transpose}, SITE_MODULES)
+        stylesheet = write_stylesheet(self.out_dir)
+        graphics = self.graphics or SVGCache()
+
+        paths = []
+        for _, _, path in self.edition.songs:
+            if path not in paths:
+                paths.append(path)
+        missing = [p for p in paths if not os.path.exists(p)]
+        for path in missing:
+            self.errors[path] = "Song file not found."
+        paths = [p for p in paths if p not in missing]
+
+        library = Library.load(paths, cache_dir=self.cache_dir, jobs=self.jobs)
+        self.errors.update(library.errors)
+
+        # song pages
+        todo = []
+        for path in paths:
+            page = page_name(path)
+            if path in library.errors:
+                continue
+            song = library.songs[path]
+            pdfs = [part.path for part in song._contents if isinstance(part, song.Graphics)]
+            try:
+                deps = {"template": template, path: file_hash(path)}
+                deps.update((pdf, file_hash(os.path.join(self.edition.root, pdf))) for pdf in pdfs)
+            except OSError as e:
+                self.errors[path] = "{}: {}".format(type(e).__name__, e)
+                continue
+            if self._up_to_date(old, page, deps):
+                self._manifest[page] = deps
+                self.skipped.append(page)
+            else:
+                todo.append((path, page, deps, pdfs))
+
+        # graphics paths are relative to the repository root
+        graphics.prefetch([os.path.join(self.edition.root, pdf) for todo_item in todo for pdf in todo_item[3]],
+                          self.jobs)
+        for path, page, deps, _ in todo:
+            compiler = HTMLCompiler(transpose=self.transpose, stylesheet=stylesheet, minify=True,
+                                    graphics=graphics, root=self.edition.root)
+            out_path = os.path.join(self.out_dir, page)
+            try:
+                with open(out_path, "w") as out:
+                    compiler.compile_to(library.songs[path], out)
+            except Exception as e:
+                # open may have failed as well, the original error is reported
+                if os.path.isfile(out_path):
+                    os.remove(out_path)
+                self.errors[path] = "{}: {}".format(type(e).__name__, e)
+                continue
+            self._manifest[page] = deps
+            self.built.append(page)
+
+        # index pages depend on the edition and the titles of all songs
+        deps = {"template": template, self.edition.path: file_hash(self.edition.path)}
+        deps.update((p, file_hash(p)) for p in paths)
+        songs = [(chapter, thumb, path) for chapter, thumb, path in self.edition.songs
+                 if page_name(path) in self._manifest]
+        compiler = HTMLCompiler(stylesheet=stylesheet, minify=True)
+        for page, lines in self._index_pages(songs, library, compiler):
+            if self._up_to_date(old, page, deps):
+                self.skipped.append(page)
+            else:
+                with open(os.path.join(self.out_dir, page), "w") as out:
+                    compiler._write_lines(lines, out)
+                self.built.append(page)
+            self._manifest[page] = deps
+
+        # remove pages of songs, which are no longer part of the edition
+        for page in old:
+            if page not in self._manifest and os.path.exists(os.path.join(self.out_dir, page)):
+                os.remove(os.path.join(self.out_dir, page))
+        self._save_manifest()
+        return self.built
+
+    @staticmethod
+    def _page(compiler, title, body):
+        yield from compiler._document_start(title)
+        yield "<header>"
+        yield "    <h2> {} </h2>".format(html.escape(title))
+        yield "</header>"
+        yield from body
+        yield "</body>"
+        yield "</html>"
+
+    @staticmethod
+    def _link(path, title):
+        return "<li><a href=\"{}\">{}</a></li>".format(page_name(path), html.escape(title))
+
+    def _index_pages(self, songs, library, compiler):
+        chapters = {}
+        for chapter, thumb, path in songs:
+            chapters.setdefault(chapter, []).append((thumb, path))
+        chapter_pages = ["kapitel-{}.html".format(i + 1) for i in range(len(chapters))]
+
+        # overview of the chapters, or of all songs, if the edition has no chapters
+        body = ["<ol>"]
+        if len(chapters) > 1 or "" not in chapters:
+            body += ["<li><a href=\"{}\">{}</a></li>".format(page, html.escape(chapter or self.edition.title))
+                     for page, chapter in zip(chapter_pages, chapters)]
+        else:
+            body += [self._link(path, library.songs[path].title) for _, _, path in songs]
+        body += ["</ol>", "<p><a href=\"alphabetisch.html\">Alphabetisches Verzeichnis</a></p>"]
+        yield "index.html", self._page(compiler, self.edition.title, body)
+
+        for page, (chapter, entries) in zip(chapter_pages, chapters.items()):
+            body = []
+            thumb = None
+            for entry_thumb, path in entries:
+                if entry_thumb != thumb:
+                    if thumb is not None:
+                        body.append("</ul>")
+                    body += ["<h3>{}</h3>".format(html.escape(entry_thumb)), "<ul>"]
+                    thumb = entry_thumb
+                body.append(self._link(path, library.songs[path].title))
+            body.append("</ul>")
+            yield page, self._page(compiler, chapter or self.edition.title, body)
+
+        # alphabetical index of titles and alternative titles
+        titles = set()
+        for _, _, path in songs:
+            song = library.songs[path]
+            titles.add((song.title, path))
+            titles.update((value, path) for key, value in song.info if key == "index")
+        body = ["<ul>"]
+        body += [self._link(path, title) for title, path in sorted(titles, key=lambda t: (t[0].casefold(), t[1]))]
+        body.append("</ul>")
+        yield "alphabetisch.html", self._page(compiler, "Alphabetisches Verzeichnis", body)
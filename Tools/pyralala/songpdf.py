@@ -0,0 +1,141 @@
+"""
+pdfs of single songs, compiled against a preloaded format of the Misc/Song.tex preamble
+"""
+import os
+import shutil
+import hashlib
+import tempfile
+import threading
+import subprocess
+
+__all__ = ["SongFormat", "compile_song", "compile_songs"]
+
+SONG_TEMPLATE = "Misc/Song.tex"
+PDFLATEX = ["pdflatex", "--interaction=nonstopmode", "--halt-on-error", "--enable-write18", "-shell-escape"]
+DEFAULT_FORMAT_DIR = ".cache/pyralala/format"
+# changing the dump command invalidates the format
+FORMAT_VERSION = b"1"
+
+
+def _log_tail(path, output):
+    try:
+        with open(path, "r", errors="replace") as log_file:
+            return "\n".join(log_file.read().splitlines()[-20:])
+    except OSError:
+        return "\n".join(output.splitlines()[-20:])
+
+
+class SongFormat(object):
+    """ A pdflatex format with the preamble of Misc/Song.tex, dumped by mylatexformat.
+
+    The format is dumped again when the template, a file it inputs or
+    pdflatex changed. If the preamble can not be dumped, path() returns None
+    and songs are compiled without format.
+    """
+
+    def __init__(self, directory=DEFAULT_FORMAT_DIR, template=SONG_TEMPLATE, scanner=None):
+        self.directory = directory
+        self.template = template
+        self.scanner = scanner
+        self.error = None
+        self._lock = threading.Lock()
+        self._path = None
+        self._checked = False
+
+    def key(self):
+        """ Hash of the template, the files it depends on and the pdflatex version. """
+        from pyralala.deps import DependencyScanner
+
+        scanner = self.scanner or DependencyScanner(None)
+        digest = hashlib.sha256(FORMAT_VERSION)
+        for path in scanner.dependencies(self.template):
+            with open(path, "rb") as dep_file:
+                digest.update(hashlib.sha256(dep_file.read()).digest())
+        version = subprocess.run(["pdflatex", "--version"], stdout=subprocess.PIPE, universal_newlines=True)
+        digest.update(version.stdout.encode())
+        return digest.hexdigest()
+
+    def path(self):
+        """ Returns the format name to pass by -fmt, dumping it on first use, or None. """
+        with self._lock:
+            if not self._checked:
+                self._checked = True
+                self._path = self._dump()
+            return self._path
+
+    def _dump(self):
+        name = os.path.splitext(os.path.basename(self.template))[0]
+        fmt = os.path.join(self.directory, name)
+        key_path = fmt + ".key"
+        key = self.key()
+        try:
+            with open(key_path, "r") as key_file:
+                cached = key_file.read().split()
+        except OSError:
+            cached = []
+        if cached == [key, "ok"] and os.path.exists(fmt + ".fmt"):
+            return fmt
+        if cached == [key, "failed"]:
+            self.error = "The preamble of {} can not be dumped, see {}.log.".format(self.template, fmt)
+            return None
+
+        os.makedirs(self.directory, exist_ok=True)
+        result = subprocess.run(PDFLATEX + ["-ini", "-jobname=" + name, "-output-directory=" + self.directory,
+                                            "&pdflatex", "mylatexformat.ltx", self.template],
+                                stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True,
+                                errors="replace")
+        ok = result.returncode == 0 and os.path.exists(fmt + ".fmt")
+        if not ok:
+            self.error = "Dumping the preamble of {} failed:\n{}".format(self.template,
+                                                                        _log_tail(fmt + ".log", result.stdout))
+        # a failed dump is not retried, until an input changes
+        with open(key_path, "w") as key_file:
+            key_file.write("{} {}\n".format(key, "ok" if ok else "failed"))
+        return fmt if ok else None
+
+
+def compile_song(song, out_path, song_format=None, template=SONG_TEMPLATE):
+    """ Compiles the pdf of a song into out_path, in a temporary directory of its own.
+
+    Parallel runs do not share .aux or .log files. Raises an Exception with
+    the end of the log if pdflatex fails.
+    """
+    fmt = song_format.path() if song_format is not None else None
+    name = os.path.splitext(os.path.basename(out_path))[0]
+    temp_dir = tempfile.mkdtemp(prefix=name + ".", dir=os.path.dirname(out_path) or ".")
+    try:
+        command = PDFLATEX + ["-jobname=" + name, "-output-directory=" + temp_dir]
+        env = dict(os.environ, SONG=song)
+        if fmt is not None:
+            command.append("-fmt=" + os.path.basename(fmt))
+            # kpathsea finds the format in TEXFORMATS, the trailing separator keeps the default path
+            env["TEXFORMATS"] = os.path.dirname(os.path.abspath(fmt)) + os.pathsep + env.get("TEXFORMATS", "")
+        result = subprocess.run(command + [template], env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                universal_newlines=True, errors="replace")
+        pdf = os.path.join(temp_dir, name + ".pdf")
+        if result.returncode != 0 or not os.path.exists(pdf):
+            raise Exception("pdflatex failed for {}:\n{}".format(
+                song, _log_tail(os.path.join(temp_dir, name + ".log"), result.stdout)))
+        os.replace(pdf, out_path)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def compile_songs(songs, out_dir="PDFs", song_format=None, jobs=None):
+    """ Compiles songs into out_dir/<song>.pdf with a bounded pool, returns the errors by song. """
+    from concurrent.futures import ThreadPoolExecutor
+
+    os.makedirs(out_dir, exist_ok=True)
+
+    def run(song):
+        out = os.path.join(out_dir, os.path.splitext(os.path.basename(song))[0] + ".pdf")
+        try:
+            compile_song(song, out, song_format)
+        except Exception as e:
+            return e
+        return None
+
+    # pdflatex runs in separate processes, threads are enough to run them in parallel
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as executor:
+        results = list(executor.map(run, songs))
+    return dict((song, error) for song, error in zip(songs, results) if error is not None)
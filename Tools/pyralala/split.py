@@ -0,0 +1,88 @@
+"""
+Per-song pdfs, split from a single compile of an edition with all songs
+"""
+import os
+
+from pyralala.deps import references
+from pyralala.index import read_sxd
+
+__all__ = ["edition_songs", "song_pages", "split_edition"]
+
+
+def edition_songs(path):
+    """ Returns the song files an edition inputs, in their order. """
+    with open(path, "r") as tex_file:
+        names = [name for kind, name in references(tex_file.read()) if kind == "input"]
+    songs = []
+    for name in names:
+        name = os.path.normpath(name)
+        if name.startswith("Lieder" + os.sep):
+            songs.append(name if name.endswith(".tex") else name + ".tex")
+    return songs
+
+
+def song_pages(index, songs, labels):
+    """ Returns the page numbers (0-based) of each song, by the start pages in the index.
+
+    labels are the page labels of the pdf, as referenced by the index. Each
+    song file contains one song, so the n-th song of the index is the n-th
+    file. A song ends on the page before the next song starts, so its
+    following pages, e.g. with pictures of an intersong block, belong to it.
+    The edition has to start each song on a new page, see generate_songbook.sh
+    --split, a song sharing its last page with the next one only gets its
+    first page.
+    """
+    pages = {}
+    for i, label in enumerate(labels):
+        pages.setdefault(label, i)
+
+    starts = {}
+    for entry in index.entries:
+        if entry.song_number is None or entry.ref not in pages:
+            raise Exception("Index entry {!r} has no song anchor or no page {!r}.".format(entry.title, entry.ref))
+        # alternative titles of a song are listed with the same page
+        starts.setdefault(entry.song_number, pages[entry.ref])
+    if len(starts) != len(songs):
+        raise Exception("The index lists {} songs, the edition inputs {} song files.".format(len(starts), len(songs)))
+
+    first_pages = [starts[n] for n in sorted(starts)]
+    ranges = {}
+    for i, song in enumerate(songs):
+        first = first_pages[i]
+        last = first_pages[i + 1] - 1 if i + 1 < len(first_pages) else len(labels) - 1
+        ranges[song] = list(range(first, max(first, last) + 1))
+    return ranges
+
+
+def _pypdf():
+    try:
+        import pypdf
+    except ImportError:
+        # PyPDF2 3.x has the same API
+        import PyPDF2 as pypdf
+    return pypdf
+
+
+def split_edition(tex_path, out_dir="PDFs", pdf_path=None, sxd_path=None):
+    """ Writes out_dir/<song>.pdf with the pages of each song of a compiled edition.
+
+    Returns the number of pages of each written pdf, by song file.
+    """
+    pypdf = _pypdf()
+    base = os.path.splitext(tex_path)[0]
+    reader = pypdf.PdfReader(pdf_path or base + ".pdf")
+    labels = list(reader.page_labels)
+    ranges = song_pages(read_sxd(sxd_path or base + ".sxd"), edition_songs(tex_path), labels)
+
+    os.makedirs(out_dir, exist_ok=True)
+    written = {}
+    for song, pages in ranges.items():
+        writer = pypdf.PdfWriter()
+        for page in pages:
+            writer.add_page(reader.pages[page])
+        out = os.path.join(out_dir, os.path.splitext(os.path.basename(song))[0] + ".pdf")
+        with open(out + ".tmp", "wb") as out_file:
+            writer.write(out_file)
+        os.replace(out + ".tmp", out)
+        written[song] = len(pages)
+    return written
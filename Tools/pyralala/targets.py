@@ -0,0 +1,210 @@
+"""
+Build tasks of the songbooks, modelled after the Makefile targets
+"""
+import os
+import glob
+import shlex
+
+from pyralala.build import Task
+from pyralala.bilder import derived_path, IMAGE_EXTENSIONS
+from pyralala.deps import DependencyScanner
+from pyralala.index import LEGACY_IDX
+
+__all__ = ["songbook_tasks", "noten_tasks", "song_pdf_tasks", "edition_tasks", "index_sources", "index_command",
+           "bilder_tasks", "VARIANTS"]
+
+PDFLATEX = ["pdflatex", "--interaction=nonstopmode", "--halt-on-error", "--enable-write18", "-shell-escape"]
+SONGIDX = "texlua ./Tools/songidx.lua"
+NOTEN_CACHE = ".cache/pyralala/noten"
+DEPS_CACHE = ".cache/pyralala/deps.json"
+FORMAT_DIR = ".cache/pyralala/format"
+BILDER_DIR = ".cache/pyralala/bilder"
+MISC_DEPS = ["Misc/GrifftabelleGitarre.tex", "Misc/GrifftabelleUkuleleGCEA.tex", "Misc/GrifftabelleUkuleleADFisH.tex",
+             "Misc/GrifftabelleUkuleleDGHE.tex", "Misc/basic.tex", "Misc/songs.sty"]
+
+# suffix of the pdf: environment of the pdflatex run
+VARIANTS = {
+    "": {},
+    "-print": {"PRINT": "1"},
+    "-pics": {"PICS": "1"},
+    "-ebook": {"EBOOK": "1"},
+}
+# variants using derived pictures, see pyralala.bilder, TEXINPUTS finds them before the originals
+BILDER_VARIANTS = {"-print": "print", "-ebook": "ebook"}
+
+# editions, whose index also lists the songs of another edition, with the legacy page reference
+COMBINED_INDEX = {"PfadiralalaIVplus": "PfadiralalaIV"}
+
+# editions generated from all songs: command writing the edition file to stdout, its inputs
+GENERATED_EDITIONS = {
+    "CompleteEdition": ("./Tools/generate_songbook.sh", ["Tools/generate_songbook.sh"]),
+    "SplitEdition": ("./Tools/generate_songbook.sh --split", ["Tools/generate_songbook.sh"]),
+    "CompleteSortedEdition": ("python ./Tools/generate_sorted_songbook.py --cache .cache/pyralala "
+                              "--by index --by txt --by mel --by titel Lieder/*.tex",
+                              ["Tools/generate_sorted_songbook.py"]),
+}
+
+
+def _make_dirs(task):
+    for path in task.outputs:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+
+def _converge(task):
+    from pyralala.latex import EditionRunner
+
+    EditionRunner(os.path.splitext(os.path.basename(task.name))[0]).run()
+
+
+def _split_edition(task):
+    from pyralala.split import split_edition
+
+    split_edition(task.inputs[0])
+
+
+def _derive_images(task):
+    from pyralala.bilder import ImageCache, derive_images
+
+    errors = derive_images(task.inputs, BILDER_DIR, [task.name.split("-")[-1]], ImageCache(BILDER_DIR), prune=True)
+    if len(errors) > 0:
+        raise Exception("\n".join(str(e) for e in errors.values()))
+
+
+def _convert_tune(task):
+    from pyralala.noten import NotenCache, TuneError
+
+    try:
+        NotenCache(NOTEN_CACHE).convert(task.inputs[0], task.outputs[0])
+    except TuneError as e:
+        raise Exception("\n".join([str(e)] + e.diagnostics))
+
+
+def noten_tasks():
+    """ abcm2ps, ps2pdf and pdfcrop of each tune of ABC_Noten into Noten/. """
+    tasks = []
+    for mcm in sorted(glob.glob("ABC_Noten/*.mcm")):
+        out = "Noten/{}.pdf".format(os.path.splitext(os.path.basename(mcm))[0])
+        tasks.append(Task(out, [mcm, "Misc/abcm2ps.fmt"], [out], [_convert_tune]))
+    return tasks
+
+
+def bilder_tasks():
+    """ The pictures of Bilder/ derived for each variant in BILDER_VARIANTS. """
+    images = sorted(p for p in glob.glob("Bilder/*") if p.lower().endswith(IMAGE_EXTENSIONS))
+    return [Task("Bilder-" + variant, images, [derived_path(BILDER_DIR, variant, p) for p in images], [_derive_images])
+            for variant in sorted(BILDER_VARIANTS.values())]
+
+
+def _inputs(paths, generated):
+    # missing files no task generates, e.g. misspelled graphics, are left to pdflatex to report
+    return [p for p in paths if p in generated or os.path.exists(p)]
+
+
+def song_pdf_tasks(scanner, generated=()):
+    """ A pdf of each song in PDFs/, compiled against a preloaded format of Misc/Song.tex. """
+    from pyralala.songpdf import SongFormat, compile_song
+
+    # dumped by the first song compiled
+    song_format = SongFormat(FORMAT_DIR, scanner=scanner)
+
+    def _compile_song(task):
+        compile_song(task.env["SONG"], task.outputs[0], song_format)
+
+    tasks = []
+    # Misc/Song.tex inputs the song by the SONG environment variable
+    template = scanner.dependencies("Misc/Song.tex")
+    for song in sorted(glob.glob("Lieder/*.tex")):
+        out = "PDFs/{}.pdf".format(os.path.splitext(os.path.basename(song))[0])
+        inputs = _inputs(scanner.dependencies(song) + template, generated)
+        tasks.append(Task(out, inputs, [out], [_make_dirs, _compile_song], env={"SONG": song}))
+    return tasks
+
+
+def index_sources(edition, marker=None):
+    """ The .sxd files of the index of an edition, with the marker of their titles or None.
+
+    The titles of the editions in COMBINED_INDEX are marked with marker,
+    LEGACY_IDX by default.
+    """
+    sources = [("Ausgaben/{}.sxd".format(edition), None)]
+    if edition in COMBINED_INDEX:
+        sources.insert(0, ("Ausgaben/{}.sxd".format(COMBINED_INDEX[edition]), marker or LEGACY_IDX))
+    return sources
+
+
+def index_command(sxd, sbx):
+    """ Shell command of songidx, compiling sxd into sbx. """
+    return "{} {} {} > {}.log 2>&1".format(SONGIDX, sxd, sbx, sbx)
+
+
+def edition_tasks(edition, scanner, generated=()):
+    """ The index passes and the pdf variants of an edition.
+
+    The passes of the draft pdf run until the index does not change anymore,
+    see EditionRunner, the other variants use the resulting index. Their
+    inputs are the files the edition includes, so changing another song
+    does not rebuild it.
+    """
+    base = "Ausgaben/" + edition
+    tex = base + ".tex"
+    if os.path.exists(tex):
+        inputs = _inputs(scanner.dependencies(tex), generated)
+    else:
+        # a generated edition, which does not exist yet, may include all songs
+        inputs = [tex] + sorted(glob.glob("Lieder/*.tex")) + MISC_DEPS
+    # all passes write Ausgaben/<edition>.sxd, so they never run at the same time
+    lock = base
+
+    index_inputs = list(inputs)
+    if edition in COMBINED_INDEX:
+        index_inputs.append("Ausgaben/{}.sxd".format(COMBINED_INDEX[edition]))
+    tasks = [Task(base + ".pdf", index_inputs, [base + ".pdf", base + ".sxd", base + ".sbx"], [_converge],
+                  lock=lock)]
+    for suffix, env in VARIANTS.items():
+        if suffix == "":
+            continue
+        pdf = base + suffix + ".pdf"
+        variant_inputs = list(inputs)
+        command = PDFLATEX + ["-jobname=" + base + suffix, tex]
+        if suffix in BILDER_VARIANTS:
+            variant = BILDER_VARIANTS[suffix]
+            variant_inputs += [derived_path(BILDER_DIR, variant, p) for p in inputs if p.startswith("Bilder/")]
+            # the derived pictures are searched first, the TEXINPUTS of the environment is read by the shell
+            # running the task, the empty entry at the end keeps the default search path
+            command = "TEXINPUTS={}{}${{TEXINPUTS}} {}".format(shlex.quote(os.path.join(BILDER_DIR, variant)),
+                                                               os.pathsep, " ".join(map(shlex.quote, command)))
+        tasks.append(Task(pdf, [base + ".sbx"] + variant_inputs, [pdf], [command], env=env, lock=lock))
+    return tasks
+
+
+def songbook_tasks():
+    """ All tasks, with the groups Noten, PDFs, PDFs-split and all, run in the repository root. """
+    scanner = DependencyScanner(DEPS_CACHE)
+    tasks = noten_tasks()
+    noten = set(t.outputs[0] for t in tasks)
+    tasks.append(Task("Noten", after=[t.name for t in tasks]))
+
+    tasks += bilder_tasks()
+
+    pdfs = song_pdf_tasks(scanner, noten)
+    tasks += pdfs
+    tasks.append(Task("PDFs", after=[t.name for t in pdfs]))
+
+    editions = [os.path.splitext(os.path.basename(p))[0] for p in sorted(glob.glob("Ausgaben/*.tex"))]
+    for edition, (command, inputs) in GENERATED_EDITIONS.items():
+        out = "Ausgaben/{}.tex".format(edition)
+        tasks.append(Task(out, inputs + sorted(glob.glob("Lieder/*.tex")), [out], ["{} > {}".format(command, out)]))
+        if edition not in editions:
+            editions.append(edition)
+    for edition in editions:
+        tasks += edition_tasks(edition, scanner, noten)
+    scanner.save()
+    # all song pdfs split from a single compile, it does not replace the tasks of the song pdfs
+    tasks.append(Task("PDFs-split", ["Ausgaben/SplitEdition.tex", "Ausgaben/SplitEdition.pdf",
+                                     "Ausgaben/SplitEdition.sxd"], [], [_split_edition]))
+
+    # the default target of the Makefile: the draft and the pics version of all existing editions
+    existing = [os.path.splitext(os.path.basename(p))[0] for p in sorted(glob.glob("Ausgaben/*.tex"))
+                if p != "Ausgaben/SplitEdition.tex"]
+    tasks.append(Task("all", after=["Ausgaben/{}{}.pdf".format(e, s) for e in existing for s in ("", "-pics")]))
+    return tasks
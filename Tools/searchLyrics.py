@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+# Searches the lyrics of all songs, e.g. searchLyrics.py '"die gedanken sind frei"'
+import argparse, sys
+from pyralala.search import SearchIndex, DEFAULT_INDEX
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search the lyrics of songs. Words in quotes are searched as a phrase.")
+    parser.add_argument("query", nargs="+", help="Words and \"quoted phrases\", which must occur in the same verse.")
+    parser.add_argument("-d", "--songs", action="append",
+                        help="Song files or directories to index (default: Lieder).")
+    parser.add_argument("--index", default=DEFAULT_INDEX, help="Path of the search index (default: {}).".format(DEFAULT_INDEX))
+    parser.add_argument("--cache", metavar="DIR", help="Cache parsed songs in this directory.")
+    args = parser.parse_args()
+
+    index = SearchIndex(args.index)
+    changed = index.update(args.songs or ["Lieder"], cache_dir=args.cache)
+    index.save()
+    if changed > 0:
+        print("Indexed {} changed songs.".format(changed), file=sys.stderr)
+
+    hits = index.search(" ".join(args.query))
+    for hit in hits:
+        print("{} ({}{}): {}".format(hit.title, hit.path, ", " + hit.part if hit.part else "", hit.line.strip()))
+    sys.exit(0 if hits else 1)
@@ -0,0 +1,60 @@
+import gzip
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from pyralala.assets import minify_css, minify_html, write_stylesheet
+
+
+class MinifyTest(unittest.TestCase):
+
+    def test_css(self):
+        css = """/* Kommentar */
+body {
+    color : black;
+    margin: 0 auto ;
+}
+ul > li,
+a:hover { color: red; }
+@media print {
+    .chords span { display: none; }
+}
+"""
+        self.assertEqual(minify_css(css), "body{color:black;margin:0 auto}ul>li,a:hover{color:red}"
+                                          "@media print{.chords span{display:none}}")
+
+    def test_css_selector_colon(self):
+        # the space is a descendant combinator, "div:first-child" would be a different selector
+        self.assertEqual(minify_css("div :first-child { margin : 0 }"), "div :first-child{margin:0}")
+        self.assertEqual(minify_css("@media screen { p ::before { content: \"-\" } }"),
+                         "@media screen{p ::before{content:\"-\"}}")
+
+    def test_html(self):
+        self.assertEqual(minify_html("<p>\n    <b>Eins</b>\n\n    zwei\n</p>\n"), "<p>\n<b>Eins</b>\nzwei\n</p>")
+
+
+class StylesheetTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_write(self):
+        name = write_stylesheet(self.directory, compress=True)
+        self.assertRegex(name, r"^pyralala\.[0-9a-f]{12}\.css$")
+        with open(os.path.join(self.directory, name), "rb") as css_file:
+            css = css_file.read()
+        with gzip.open(os.path.join(self.directory, name + ".gz"), "rb") as gz_file:
+            self.assertEqual(gz_file.read(), css)
+        # the name changes with the content, an existing file is kept
+        self.assertEqual(write_stylesheet(self.directory), name)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from pyralala.batch import export_corpus
+
+LIEDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, "Lieder")
+# songs without graphics, html does not need pdf2svg
+SONGS = ["AceOfSpades.tex", "4ChordSong.tex"]
+
+
+class ExportTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.songs = os.path.join(self.directory, "Lieder")
+        self.out = os.path.join(self.directory, "export")
+        os.makedirs(self.songs)
+        for name in SONGS:
+            shutil.copy(os.path.join(LIEDER, name), self.songs)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def export(self, formats=("txt", "md", "html"), **kwargs):
+        files = sorted(os.path.join(self.songs, name) for name in os.listdir(self.songs))
+        report = export_corpus(files, self.out, formats, jobs=1, **kwargs)
+        self.assertEqual(report.errors, {})
+        return report
+
+    def outputs(self, fmt):
+        return sorted(name for name in os.listdir(os.path.join(self.out, fmt)) if not name.endswith(".css"))
+
+    def test_incremental(self):
+        self.assertEqual(self.export().skipped, 0)
+        self.assertEqual(self.outputs("txt"), ["4ChordSong.txt", "AceOfSpades.txt"])
+        with open(os.path.join(self.out, "txt", "AceOfSpades.txt"), "r") as txt_file:
+            self.assertIn("Ace Of Spades", txt_file.read())
+        self.assertEqual(self.export().skipped, 6)
+        self.assertEqual(self.export(["txt"], options={"width": 40}).skipped, 0)
+        self.assertEqual(self.export(force=True).skipped, 0)
+
+    def test_removed_songs(self):
+        self.export()
+        os.rename(os.path.join(self.songs, "AceOfSpades.tex"), os.path.join(self.songs, "Ace.tex"))
+        self.export(["txt"])
+        self.assertEqual(self.outputs("txt"), ["4ChordSong.txt", "Ace.txt"])
+        # other formats are pruned, when they are exported again
+        self.assertEqual(self.outputs("md"), ["4ChordSong.md", "AceOfSpades.md"])
+        self.export(["md"])
+        self.assertEqual(self.outputs("md"), ["4ChordSong.md", "Ace.md"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from pyralala.bilder import ImageCache, derive_images, graphics_path
+
+# convert <picture> <options> <out>: the variant is recognized by its options, "kaputt" pictures fail
+CONVERT = """#!{python}
+import sys
+data = open(sys.argv[1]).read()
+if "kaputt" in data:
+    sys.exit("convert: kaputt")
+with open(sys.argv[-1], "w") as out:
+    out.write(data + ("grau" if "Gray" in sys.argv else "klein"))
+"""
+
+
+class DeriveImagesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.path = os.environ["PATH"]
+        self.directory = tempfile.mkdtemp()
+        bin_dir = os.path.join(self.directory, "bin")
+        os.makedirs(bin_dir)
+        with open(os.path.join(bin_dir, "convert"), "w") as script:
+            script.write(CONVERT.format(python=sys.executable))
+        os.chmod(os.path.join(bin_dir, "convert"), 0o755)
+        os.environ["PATH"] = bin_dir + os.pathsep + self.path
+        # the derived pictures keep the path relative to the repository root
+        os.chdir(self.directory)
+        os.makedirs("Bilder")
+        self.write("Bilder/Baum.jpg", "baum")
+        self.write("Bilder/Haus.png", "haus")
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        os.environ["PATH"] = self.path
+        shutil.rmtree(self.directory)
+
+    def write(self, path, content):
+        with open(path, "w") as out:
+            out.write(content)
+
+    def read(self, path):
+        with open(path, "r") as in_file:
+            return in_file.read()
+
+    def cache(self):
+        return ImageCache(os.path.join(self.directory, "cache"))
+
+    def objects(self, variant):
+        return sorted(os.listdir(os.path.join(self.directory, "cache", "objects", variant)))
+
+    def test_derive(self):
+        cache = self.cache()
+        errors = derive_images(["Bilder/Baum.jpg", "Bilder/Haus.png"], "out", cache=cache, jobs=2)
+        self.assertEqual((errors, cache.conversions), ({}, 4))
+        self.assertEqual(self.read("out/print/Bilder/Baum.jpg"), "baumgrau")
+        self.assertEqual(self.read("out/ebook/Bilder/Haus.png"), "hausklein")
+
+        # a copy of a picture is not converted again
+        shutil.copy("Bilder/Baum.jpg", "Bilder/Kopie.jpg")
+        cache = self.cache()
+        derive_images(["Bilder/Baum.jpg", "Bilder/Haus.png", "Bilder/Kopie.jpg"], "out", cache=cache)
+        self.assertEqual(cache.conversions, 0)
+        self.assertEqual(self.read("out/print/Bilder/Kopie.jpg"), "baumgrau")
+
+    def test_prune(self):
+        derive_images(["Bilder/Baum.jpg", "Bilder/Haus.png"], "out", cache=self.cache())
+        self.assertEqual(len(self.objects("print")), 2)
+
+        # the pictures of a removed original are deleted and evicted, a running conversion is kept
+        self.write(os.path.join(self.directory, "cache", "objects", "print", "x.jpg.tmp.1.jpg"), "")
+        derive_images(["Bilder/Baum.jpg"], "out", cache=self.cache(), prune=True)
+        self.assertFalse(os.path.exists("out/print/Bilder/Haus.png"))
+        self.assertEqual(len(self.objects("print")), 2)
+        self.assertIn("x.jpg.tmp.1.jpg", self.objects("print"))
+        self.assertEqual(len(self.objects("ebook")), 1)
+
+    def test_error(self):
+        derive_images(["Bilder/Baum.jpg"], "out", variants=["print"], cache=self.cache())
+        self.write("Bilder/Baum.jpg", "kaputt")
+        errors = derive_images(["Bilder/Baum.jpg"], "out", variants=["print"], cache=self.cache())
+        self.assertEqual(list(errors), [("Bilder/Baum.jpg", "print")])
+        self.assertIn("convert: kaputt", str(errors[("Bilder/Baum.jpg", "print")]))
+        # pdflatex uses the original instead of the outdated picture
+        self.assertFalse(os.path.exists("out/print/Bilder/Baum.jpg"))
+
+    def test_outside(self):
+        errors = derive_images([os.path.join(os.pardir, "Baum.jpg")], "out", variants=["print"], cache=self.cache())
+        self.assertIn("outside of the current directory", str(errors[(os.path.join(os.pardir, "Baum.jpg"), "print")]))
+
+    def test_graphics_path(self):
+        environ = os.environ.get("TEXINPUTS")
+        try:
+            os.environ["TEXINPUTS"] = "/extra:"
+            self.assertEqual(graphics_path("out", "print"), os.path.join("out", "print") + os.pathsep + "/extra:")
+            del os.environ["TEXINPUTS"]
+            self.assertEqual(graphics_path("out", "print"), os.path.join("out", "print") + os.pathsep)
+        finally:
+            if environ is not None:
+                os.environ["TEXINPUTS"] = environ
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import io
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from pyralala.build import BuildDB, Builder, Task
+
+
+class BuilderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_path = self.path("build.json")
+        self.write("a.txt", "eins\nzwei\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def write(self, name, content):
+        with open(self.path(name), "w") as out:
+            out.write(content)
+
+    def read(self, name):
+        with open(self.path(name), "r") as in_file:
+            return in_file.read()
+
+    def tasks(self):
+        def first_line(task):
+            with open(task.inputs[0], "r") as in_file, open(task.outputs[0], "w") as out:
+                out.write(in_file.readline().upper())
+
+        def fail(task):
+            raise Exception("kaputt")
+
+        return [
+            Task("b", [self.path("a.txt")], [self.path("b.txt")], [first_line]),
+            Task("c", [self.path("b.txt")], [self.path("c.txt")],
+                 ["cat {} > {} && echo $SUFFIX >> {}".format(self.path("b.txt"), self.path("c.txt"),
+                                                             self.path("c.txt"))], env={"SUFFIX": "ende"}),
+            Task("fails", [self.path("a.txt")], [self.path("d.txt")], [fail]),
+            Task("after", [self.path("d.txt")], [self.path("e.txt")], [fail]),
+            Task("all", after=["c"]),
+        ]
+
+    def build(self, targets, **kwargs):
+        builder = Builder(self.tasks(), BuildDB(self.db_path), jobs=2, out=io.StringIO(), **kwargs)
+        ok = builder.build(targets)
+        return ok, [task.name for task in builder.ran], builder
+
+    def test_rebuild_by_content(self):
+        self.assertEqual(self.build(["all"])[:2], (True, ["b", "c", "all"]))
+        self.assertEqual(self.read("c.txt"), "EINS\nende\n")
+        self.assertEqual(self.build(["all"])[:2], (True, []))
+
+        # same content, only the modification time changed
+        self.write("a.txt", "eins\nzwei\n")
+        self.assertEqual(self.build(["all"])[:2], (True, []))
+        # b is rebuilt with the same output, so c is not
+        self.write("a.txt", "eins\ndrei\n")
+        self.assertEqual(self.build([self.path("c.txt")])[:2], (True, ["b"]))
+        self.write("a.txt", "vier\n")
+        self.assertEqual(self.build(["c"])[:2], (True, ["b", "c"]))
+        self.assertEqual(self.read("c.txt"), "VIER\nende\n")
+
+        # a deleted output is built again
+        os.remove(self.path("c.txt"))
+        self.assertEqual(self.build(["all"])[:2], (True, ["c"]))
+
+    def test_dry_run(self):
+        ok, ran, builder = self.build(["all"], dry_run=True)
+        self.assertEqual((ok, ran), (True, []))
+        self.assertIn("SUFFIX=ende cat", builder.out.getvalue())
+        self.assertFalse(os.path.exists(self.path("b.txt")))
+
+    def test_failures(self):
+        ok, ran, builder = self.build(["after", "c"], keep_going=True)
+        self.assertFalse(ok)
+        self.assertEqual(sorted(ran), ["b", "c", "fails"])
+        self.assertEqual(builder.failed, {"fails": "Exception: kaputt", "after": "Not built, as a dependency failed."})
+        # failed tasks run again
+        self.assertEqual(sorted(self.build(["after"], keep_going=True)[1]), ["fails"])
+
+
+if __name__ == "__main__":
+    unittest.main()
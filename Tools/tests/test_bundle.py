@@ -0,0 +1,58 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from pyralala import Library
+from pyralala.export import Bundle, song_record, write_bundle
+
+LIEDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, "Lieder")
+SONGS = ["1-2Lovesong.tex", "DieGedankensindfrei.tex", "Gregor.tex", "AceOfSpades.tex"]
+
+
+class BundleTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        library = Library.load([os.path.join(LIEDER, name) for name in SONGS], jobs=1)
+        cls.songs = [library.songs[os.path.join(LIEDER, name)] for name in SONGS]
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, compress):
+        path = os.path.join(self.directory, "songs.bundle")
+        self.assertEqual(write_bundle(self.songs, path, compress), len(self.songs))
+        return Bundle(path)
+
+    def test_round_trip(self):
+        for compress in (False, True):
+            with self.subTest(compress=compress), self.write(compress) as bundle:
+                self.assertEqual(len(bundle), len(self.songs))
+                # records are read in any order
+                for song_id in reversed(range(len(self.songs))):
+                    expected = json.loads(json.dumps(song_record(self.songs[song_id])))
+                    self.assertEqual(bundle[song_id], expected)
+                with self.assertRaises(IndexError):
+                    bundle[len(self.songs)]
+
+    def test_find_by_title(self):
+        with self.write(False) as bundle:
+            self.assertEqual(bundle.find("Gregor"), [2])
+            self.assertEqual(bundle.find("  die GEDANKEN sind frei "), [1])
+            # alternative titles of the index
+            self.assertEqual(bundle.find("Gehe nicht, oh Gregor"), [2])
+            self.assertEqual(bundle.find("Ich weiß, du wirst mich vermissen"), [0])
+            self.assertEqual(bundle.find("Unbekannt"), [])
+            self.assertEqual([record["title"] for record in bundle.by_title("ace of spades")], ["Ace Of Spades"])
+
+
+if __name__ == "__main__":
+    unittest.main()
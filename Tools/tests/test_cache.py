@@ -0,0 +1,46 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from pyralala import SongCache, DEFAULT_CHORD_TABLE
+
+LIEDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, "Lieder")
+SONGS = ["Gregor.tex", "WattIhrVolt.tex"]
+
+
+class SongCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_cached_songs_share_chord_table(self):
+        parsed = [SongCache(self.directory).read(os.path.join(LIEDER, name)) for name in SONGS]
+        cache = SongCache(self.directory)
+        cached = [cache.read(os.path.join(LIEDER, name)) for name in SONGS]
+        self.assertEqual(cache.hits, len(SONGS))
+
+        for song, original in zip(cached, parsed):
+            self.assertIs(song.chord_table, DEFAULT_CHORD_TABLE)
+            self.assertEqual(song._memory, {})
+            parts = [c for c in song._contents if hasattr(c, "lyrics")]
+            original_parts = [c for c in original._contents if hasattr(c, "lyrics")]
+            for part in parts:
+                self.assertIs(part._chord_table, DEFAULT_CHORD_TABLE)
+            self.assertEqual([p.chords for p in parts], [p.chords for p in original_parts])
+
+    def test_pickle_leaves_out_chord_table(self):
+        import pickle
+
+        song = SongCache(self.directory).read(os.path.join(LIEDER, "Gregor.tex"))
+        self.assertNotIn(b"ChordTable", pickle.dumps(song, pickle.HIGHEST_PROTOCOL))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,34 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from pyralala.chords import Transposer
+
+
+def transpose(names, steps):
+    transposer = Transposer(steps)
+    return [transposer(name) for name in names]
+
+
+class TransposerTest(unittest.TestCase):
+
+    def test_minor_keys(self):
+        # sharp keys
+        self.assertEqual(transpose(["Em", "D", "C"], 4), ["G#m", "F#", "E"])
+        self.assertEqual(transpose(["Am", "G"], 2), ["Hm", "A"])
+        self.assertEqual(transpose(["Am", "G"], 7), ["Em", "D"])
+        # flat keys
+        self.assertEqual(transpose(["Am", "G"], 1), ["Bm", "A&"])
+        self.assertEqual(transpose(["Em", "D"], 3), ["Gm", "F"])
+        self.assertEqual(transpose(["Am", "E7"], 3), ["Cm", "G7"])
+        self.assertEqual(transpose(["Em", "H7"], 1), ["Fm", "C7"])
+
+    def test_major_keys(self):
+        self.assertEqual(transpose(["C", "G"], 8), ["A&", "E&"])
+        self.assertEqual(transpose(["C", "G"], 4), ["E", "H"])
+
+
+if __name__ == "__main__":
+    unittest.main()
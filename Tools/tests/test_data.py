@@ -0,0 +1,51 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from pyralala import SongReader
+
+
+def read_song(source):
+    with tempfile.NamedTemporaryFile("w", suffix=".tex", delete=False) as tex_file:
+        tex_file.write(source)
+    try:
+        reader = SongReader(tex_file.name)
+        reader.read()
+        return reader.song
+    finally:
+        os.remove(tex_file.name)
+
+
+class MemorizeTest(unittest.TestCase):
+
+    def test_replay_after_empty_first_verse(self):
+        song = read_song(r"""\beginsong{Test}
+\beginverse
+\endverse
+\beginverse\memorize[v]
+\[D]eins \[A]zwei
+\endverse
+\beginchorus\replay[v]
+^drei ^vier
+\endchorus
+\beginverse
+\[G]fünf
+\endverse
+\endsong
+""")
+        parts = [c for c in song._contents if hasattr(c, "lyrics")]
+        self.assertEqual([p.chords for p in parts], [
+            [],
+            [[(0, "D"), (5, "A")]],
+            [[(0, "D"), (5, "A")]],
+            [[(0, "G")]],
+        ])
+        # the first part with chords is memorized implicitly
+        self.assertEqual(list(song._memory), ["v", ""])
+
+
+if __name__ == "__main__":
+    unittest.main()
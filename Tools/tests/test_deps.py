@@ -0,0 +1,83 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from pyralala.deps import DependencyScanner, make_rules, references
+
+FILES = {
+    "Ausgaben/Test.tex": "\\usepackage[utf8]{inputenc, songs}\n"
+                         "\\input{Lieder/Eins}\n"
+                         "% \\input{Lieder/Auskommentiert}\n"
+                         "\\input{Lieder/Zwei.tex} \\input{\\SONG}\n",
+    "songs.sty": "",
+    "Lieder/Eins.tex": "\\includegraphics[width=1\\textwidth]{Noten/Eins.pdf}\n"
+                       "\\ThisLRCornerWallPaper{0.5}{Bilder/Baum}\n",
+    "Lieder/Zwei.tex": "\\input{Lieder/Eins} 100\\% \\includegraphics{Bilder/Fehlt}\n",
+    "Bilder/Baum.jpg": "",
+}
+
+
+class DependencyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.directory = tempfile.mkdtemp()
+        for path, content in FILES.items():
+            os.makedirs(os.path.join(self.directory, os.path.dirname(path)), exist_ok=True)
+            with open(os.path.join(self.directory, path), "w") as tex_file:
+                tex_file.write(content)
+        # paths are relative to the build root
+        os.chdir(self.directory)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.directory)
+
+    def test_references(self):
+        self.assertEqual(references(FILES["Ausgaben/Test.tex"]), [
+            ("input", "Lieder/Eins"),
+            ("input", "Lieder/Zwei.tex"),
+            ("package", "inputenc"),
+            ("package", "songs"),
+        ])
+
+    def test_dependencies(self):
+        scanner = DependencyScanner(None, search_path=[])
+        self.assertEqual(scanner.dependencies("Ausgaben/Test.tex"), [
+            "Ausgaben/Test.tex",
+            "Lieder/Eins.tex",
+            "Lieder/Zwei.tex",
+            "songs.sty",
+            # generated graphics are dependencies before they exist
+            "Noten/Eins.pdf",
+            "Bilder/Baum.jpg",
+        ])
+        self.assertEqual(scanner.missing, {"Lieder/Zwei.tex": ["Bilder/Fehlt"]})
+
+    def test_cache(self):
+        scanner = DependencyScanner("deps.json", search_path=[])
+        scanner.dependencies("Ausgaben/Test.tex")
+        scanner.save()
+
+        cached = DependencyScanner("deps.json", search_path=[])
+        self.assertEqual(sorted(cached._files), ["Ausgaben/Test.tex", "Lieder/Eins.tex", "Lieder/Zwei.tex",
+                                                 "songs.sty"])
+        with open("Lieder/Zwei.tex", "w") as tex_file:
+            tex_file.write("\\includegraphics{Bilder/Baum}\n")
+        self.assertEqual(cached.dependencies("Lieder/Zwei.tex"), ["Lieder/Zwei.tex", "Bilder/Baum.jpg"])
+        self.assertTrue(cached._changed)
+
+    def test_make_rules(self):
+        self.assertEqual(make_rules([(["a.pdf", "a.sxd"], ["a.tex", "b.tex"]), (["c.pdf"], ["c.tex", "b.tex"])]),
+                         "a.pdf a.sxd: a.tex \\\n  b.tex\n"
+                         "c.pdf: c.tex \\\n  b.tex\n"
+                         "\n"
+                         "a.tex:\nb.tex:\nc.tex:\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
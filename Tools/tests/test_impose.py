@@ -0,0 +1,95 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from pyralala.impose import booklet, cut_stack, impose, n_up
+
+
+def legacy_cut_stack(n):
+    """ The page order of pfadi2print.py before pyralala.impose. """
+    m = int(n / 4) + 1
+    order = []
+    for i in range(m):
+        order += [i * 2, m * 2 + i * 2, m * 2 + i * 2 + 1, i * 2 + 1]
+    return [page if page < n else None for page in order]
+
+
+def flatten(sides):
+    return [page for side in sides for page in side]
+
+
+class LayoutTest(unittest.TestCase):
+
+    def test_cut_stack(self):
+        self.assertEqual(list(cut_stack(8)), [[0, 4], [5, 1], [2, 6], [7, 3]])
+        self.assertEqual(list(cut_stack(5)), [[0, 4], [None, 1], [2, None], [None, 3]])
+        # 4 pages per side, the columns of the back side are mirrored
+        self.assertEqual(list(cut_stack(16, 4)), [[0, 4, 8, 12], [5, 1, 13, 9], [2, 6, 10, 14], [7, 3, 15, 11]])
+
+    def test_cut_stack_as_before(self):
+        # without a multiple of 4 pages, the order is the same as before, otherwise no blank sheet is added
+        for n in range(1, 50):
+            with self.subTest(n=n):
+                if n % 4 != 0:
+                    self.assertEqual(flatten(cut_stack(n)), legacy_cut_stack(n))
+                else:
+                    self.assertEqual(len(flatten(cut_stack(n))), n)
+
+    def test_booklet(self):
+        self.assertEqual(list(booklet(8)), [[7, 0], [1, 6], [5, 2], [3, 4]])
+        self.assertEqual(list(booklet(6)), [[None, 0], [1, None], [5, 2], [3, 4]])
+        self.assertEqual(list(booklet(10, 8)), [[7, 0], [1, 6], [5, 2], [3, 4], [None, 8], [9, None]])
+        with self.assertRaises(Exception):
+            list(booklet(8, 6))
+
+    def test_n_up(self):
+        self.assertEqual(list(n_up(5, 2)), [[0, 1], [2, 3], [4, None]])
+
+    def test_every_page_once(self):
+        for n in range(1, 40):
+            for sides in (cut_stack(n), cut_stack(n, 4), booklet(n), booklet(n, 8), n_up(n, 4)):
+                pages = [page for page in flatten(sides) if page is not None]
+                self.assertEqual(sorted(pages), list(range(n)))
+
+
+class ImposeTest(unittest.TestCase):
+
+    def setUp(self):
+        try:
+            import pypdf
+        except ImportError:
+            self.skipTest("pypdf is not installed.")
+        self.directory = tempfile.mkdtemp()
+        # the pages are identified by their width
+        self.pdf_path = os.path.join(self.directory, "book.pdf")
+        writer = pypdf.PdfWriter()
+        for i in range(6):
+            writer.add_blank_page(400 + i, 595)
+        writer.write(self.pdf_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def widths(self, path):
+        import pypdf
+
+        return [round(float(page.mediabox.width)) for page in pypdf.PdfReader(path).pages]
+
+    def test_reorder(self):
+        out_path = os.path.join(self.directory, "print.pdf")
+        self.assertEqual(impose(self.pdf_path, out_path), (6, 2))
+        # blank pages have the size of the first page
+        self.assertEqual(self.widths(out_path), [400 + (page or 0) for page in flatten(cut_stack(6))])
+
+    def test_n_up(self):
+        out_path = os.path.join(self.directory, "print.pdf")
+        self.assertEqual(impose(self.pdf_path, out_path, "booklet", nup=2, paper="a4"), (6, 2))
+        self.assertEqual(self.widths(out_path), [842] * 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from pyralala.index import IndexEntry, merge_sxd, read_sxd, LEGACY_IDX
+
+LEGACY_SXD = """\\songtitleindex
+Die Gedanken sind frei
+12
+song1-12.1
+*Gehe nicht, oh Gregor
+30
+song1-30.2
+Rock & Roll
+31
+song1-31.1
+
+58
+song1-58.3
+"""
+EDITION_SXD = """\\songtitleindex
+Ace Of Spades
+1
+song1-1.1
+*Ich weiß, du wirst mich vermissen
+2
+song1-2.2
+"""
+
+
+def sed_merge(legacy_path, edition_path):
+    """ The merge of the Makefile before pyralala.index, with LEGACY_IDX as in the Makefile. """
+    script = "4~3s/.*//g; 2~3s/[^*].*$/{}/g".format(LEGACY_IDX.replace("\\", "\\\\"))
+    return subprocess.run("{{ sed '{}' {} ; tail -n+2 {}; }}".format(script, legacy_path, edition_path), shell=True,
+                          stdout=subprocess.PIPE, check=True).stdout.decode()
+
+
+class MergeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.legacy = self.write("PfadiralalaIV.sxd", LEGACY_SXD)
+        self.edition = self.write("PfadiralalaIVplus.sxd", EDITION_SXD)
+        self.merged = os.path.join(self.directory, "merged.sxd")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, "w", encoding="utf-8") as sxd_file:
+            sxd_file.write(content)
+        return path
+
+    def read(self, path):
+        with open(path, "r", encoding="utf-8") as sxd_file:
+            return sxd_file.read()
+
+    def test_same_as_sed(self):
+        if subprocess.run("sed --version", shell=True, stdout=subprocess.DEVNULL,
+                          stderr=subprocess.DEVNULL).returncode != 0:
+            self.skipTest("GNU sed is not installed.")
+        self.assertEqual(merge_sxd([(self.legacy, LEGACY_IDX), (self.edition, None)], self.merged), 6)
+        self.assertEqual(self.read(self.merged), sed_merge(self.legacy, self.edition))
+
+    def test_legacy_entries(self):
+        merge_sxd([(self.legacy, LEGACY_IDX), (self.edition, None)], self.merged)
+        index = read_sxd(self.merged)
+        self.assertEqual(index.header, "\\songtitleindex")
+        self.assertEqual([(e.title, e.ref, e.link) for e in index.entries], [
+            ("~~~{\\textit{Die Gedanken sind frei}}", "12", ""),
+            ("*~~~{\\textit{Gehe nicht, oh Gregor}}", "30", ""),
+            ("~~~{\\textit{Rock & Roll}}", "31", ""),
+            ("", "58", ""),
+            ("Ace Of Spades", "1", "song1-1.1"),
+            ("*Ich weiß, du wirst mich vermissen", "2", "song1-2.2"),
+        ])
+
+    def test_directives(self):
+        legacy = self.write("directives.sxd", "\\songtitleindex\n%prefix The\nThe Road\n7\nsong1-7.1\n")
+        merge_sxd([(legacy, LEGACY_IDX), (self.edition, None)], self.merged)
+        index = read_sxd(self.merged)
+        self.assertEqual(index.items[0], "%prefix The")
+        self.assertEqual(index.entries[0].title, "~~~{\\textit{The Road}}")
+        self.assertEqual(index.entries[0].song_number, None)
+        self.assertEqual(IndexEntry("A", "1", "song1-12.1").song_number, 12)
+
+
+if __name__ == "__main__":
+    unittest.main()
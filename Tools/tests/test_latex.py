@@ -0,0 +1,84 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from pyralala.latex import EditionRunner
+
+# writes the song to the index on page 1, on page 2 once the index exists, and the index into the .aux
+PDFLATEX = """#!{python}
+import os, sys
+job = [a for a in sys.argv if a.startswith("-jobname=")][0].split("=", 1)[1]
+sbx = open(job + ".sbx").read() if os.path.exists(job + ".sbx") else ""
+with open(job + ".sxd", "w") as sxd:
+    sxd.write("\\\\songtitleindex\\nEins\\n{{}}\\nsong1-1.1\\n".format(2 if sbx else 1))
+with open(job + ".aux", "w") as aux:
+    aux.write(sbx)
+with open(job + ".pdf", "w") as pdf:
+    pdf.write(os.environ.get("TEXINPUTS", ""))
+"""
+# songidx: texlua ./Tools/songidx.lua <sxd> <sbx>
+TEXLUA = """#!{python}
+import shutil, sys
+shutil.copyfile(sys.argv[2], sys.argv[3])
+"""
+
+
+class EditionRunnerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.environ = dict(os.environ)
+        self.directory = tempfile.mkdtemp()
+        bin_dir = os.path.join(self.directory, "bin")
+        os.makedirs(bin_dir)
+        for name, script in (("pdflatex", PDFLATEX), ("texlua", TEXLUA)):
+            path = os.path.join(bin_dir, name)
+            with open(path, "w") as script_file:
+                script_file.write(script.format(python=sys.executable))
+            os.chmod(path, 0o755)
+        os.environ["PATH"] = bin_dir + os.pathsep + os.environ["PATH"]
+        os.environ["TEXINPUTS"] = "/extra:"
+        # paths are relative to the repository root
+        os.chdir(self.directory)
+        os.makedirs("Ausgaben")
+        open("Ausgaben/Test.tex", "w").close()
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        os.environ.clear()
+        os.environ.update(self.environ)
+        shutil.rmtree(self.directory)
+
+    def runner(self, **kwargs):
+        return EditionRunner("Test", os.path.join(self.directory, "state"), **kwargs)
+
+    def test_fixed_point(self):
+        runner = self.runner()
+        runner.run()
+        self.assertEqual((runner.passes, runner.index_runs), (4, 2))
+        with open("Ausgaben/Test.sbx", "r") as sbx:
+            self.assertIn("\n2\n", sbx.read())
+
+        # nothing changed, a single pass and no songidx run
+        runner = self.runner()
+        runner.run()
+        self.assertEqual((runner.passes, runner.index_runs), (1, 0))
+
+    def test_variants(self):
+        self.runner().run(["", "-print", "-pics"])
+        with open("Ausgaben/Test-print.pdf", "r") as pdf:
+            self.assertEqual(pdf.read(), ".cache/pyralala/bilder/print:/extra:")
+        with open("Ausgaben/Test-pics.pdf", "r") as pdf:
+            self.assertEqual(pdf.read(), "/extra:")
+
+    def test_no_fixed_point(self):
+        with self.assertRaises(Exception):
+            self.runner(max_passes=2).run()
+
+
+if __name__ == "__main__":
+    unittest.main()
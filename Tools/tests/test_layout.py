@@ -0,0 +1,73 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from pyralala.layout import layout, resolve_collisions
+
+LIEDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, "Lieder")
+WIDTH = 30
+
+
+def chord_words(chords):
+    # chord names may contain spaces, e.g. "Hm ~ Em G D Em"
+    return " ".join(chords).split()
+
+
+class LayoutTest(unittest.TestCase):
+
+    def test_collisions(self):
+        # within a word the lyrics are padded with hyphens, between words with spaces
+        self.assertEqual(resolve_collisions("Ich denke", [(4, "Gmaj7"), (6, "D7")]),
+                         ("Ich de----nke", [(4, "Gmaj7"), (10, "D7")]))
+        self.assertEqual(resolve_collisions("Ich denke, was ich will", [(0, "Gmaj7"), (2, "D7"), (4, "G")]),
+                         ("Ic----h  denke, was ich will", [(0, "Gmaj7"), (6, "D7"), (9, "G")]))
+        self.assertEqual(resolve_collisions("Ich denke", [(0, "G"), (4, "D")]), ("Ich denke", [(0, "G"), (4, "D")]))
+        # chords after the end of the lyrics do not pad them
+        self.assertEqual(resolve_collisions("Ich", [(3, "Gmaj7"), (4, "D7")]), ("Ich", [(3, "Gmaj7"), (9, "D7")]))
+
+    def test_without_width(self):
+        self.assertEqual(layout("Ich denke", [(0, "G"), (4, "D7")]), [("G   D7", "Ich denke")])
+
+    def test_wrapping(self):
+        self.assertEqual(layout("Die Gedanken sind frei, wer kann sie erraten", [(0, "G"), (4, "D7"), (23, "C"),
+                                                                                 (41, "G")], 20), [
+            ("G   D7", "Die Gedanken sind"),
+            ("     C", "frei, wer kann sie"),
+            ("    G", "erraten"),
+        ])
+        # a word longer than the width is broken, chords are never split
+        self.assertEqual(layout("Ich denke", [(4, "Gmaj7"), (6, "D7")], 6), [
+            ("", "Ich"),
+            ("Gmaj7", "de----"),
+            ("D7", "nke"),
+        ])
+
+    def test_wrapping_songs(self):
+        """ Wrapped lines keep the lyrics and chords and fit the width, if no word or chord is wider. """
+        from pyralala import Library
+
+        library = Library.load([LIEDER])
+        count = 0
+        for path, song in sorted(library.songs.items()):
+            for part in song._contents:
+                if not hasattr(part, "lyrics"):
+                    continue
+                for lyric, chords in zip(part.lyrics, part.chords):
+                    padded, placed = resolve_collisions(lyric, chords)
+                    lines = layout(lyric, chords, WIDTH)
+                    count += 1
+                    with self.subTest(path=os.path.basename(path), lyric=lyric):
+                        self.assertEqual("".join(l for _, l in lines).replace(" ", ""), padded.replace(" ", ""))
+                        self.assertEqual(chord_words(c for c, _ in lines), chord_words(n for _, n in placed))
+                        longest = max([len(w) for w in padded.split()] + [len(n) for _, n in placed] + [0])
+                        if longest <= WIDTH:
+                            for chord_line, lyric_line in lines:
+                                self.assertLessEqual(len(chord_line), WIDTH)
+                                self.assertLessEqual(len(lyric_line), WIDTH)
+        self.assertGreater(count, 10000)
+
+
+if __name__ == "__main__":
+    unittest.main()
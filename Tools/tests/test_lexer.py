@@ -0,0 +1,65 @@
+import os
+import sys
+import glob
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from pyralala import SongReader, tokenize, texsoup_tokenize
+
+LIEDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, "Lieder")
+
+# songs, which TexSoup reads differently than LaTeX
+TEXSOUP_DIFFERENCES = {
+    # chords in nolyrics environments and groups are dropped
+    "Africa.tex", "DontStopBelievin.tex", "DuHastDenFarbfilm.tex", "LP_MirKoennteSowasNichtEntgehn.tex",
+    "RoseTattoo.tex",
+    # ~\\ is kept as text
+    "Lonely.tex", "SoundtrackZumUntergang.tex",
+    # \rep[2] takes [2] as optional argument, LaTeX and the lexer take "[" as argument
+    "Moskau.tex",
+}
+
+try:
+    import TexSoup
+except ImportError:
+    TexSoup = None
+
+
+def parts(path, tokenizer):
+    """ Lyrics and chord names of each part, without whitespace, which TexSoup drops after commands. """
+    reader = SongReader(path, tokenizer=tokenizer)
+    reader.read()
+    return [("".join("".join(part.lyrics).split()),
+             ["".join(name.split()) for line in part.chords for _, name in line])
+            for part in reader.song._contents if hasattr(part, "lyrics")]
+
+
+class LexerTest(unittest.TestCase):
+
+    def test_commands_in_chords(self):
+        reader = SongReader(os.path.join(LIEDER, "AceOfSpades.tex"))
+        reader.read()
+        chords = [name for part in reader.song._contents if hasattr(part, "lyrics")
+                  for line in part.chords for _, name in line]
+        self.assertIn("E h-b&-a  (x4)", chords)
+
+    @unittest.skipIf(TexSoup is None, "TexSoup is not installed")
+    def test_same_as_texsoup(self):
+        compared = 0
+        for path in sorted(glob.glob(os.path.join(LIEDER, "*.tex"))):
+            if os.path.basename(path) in TEXSOUP_DIFFERENCES:
+                continue
+            try:
+                expected = parts(path, texsoup_tokenize)
+            except Exception:
+                # songs, which TexSoup can not parse
+                continue
+            with self.subTest(song=os.path.basename(path)):
+                self.assertEqual(parts(path, tokenize), expected)
+            compared += 1
+        self.assertGreater(compared, 300)
+
+
+if __name__ == "__main__":
+    unittest.main()
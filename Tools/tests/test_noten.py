@@ -0,0 +1,103 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from pyralala.noten import NotenCache, TuneError, convert_tunes
+
+# abcm2ps -c -F <format> -O <ps> <tune>: fails for tunes containing "kaputt", warns for "schief"
+ABCM2PS = """#!/bin/sh
+while [ "$1" != "-O" ]; do shift; done
+grep -q kaputt "$3" && { echo "error: kaputt"; exit 1; }
+grep -q schief "$3" && echo "warning: schief"
+cat "$3" > "$2"
+"""
+# ps2pdf and pdfcrop <in> <out>
+COPY = """#!/bin/sh
+cat "$1" > "$2"
+"""
+
+
+class NotenTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.environ["PATH"]
+        bin_dir = os.path.join(self.directory, "bin")
+        os.makedirs(bin_dir)
+        for name, script in (("abcm2ps", ABCM2PS), ("ps2pdf", COPY), ("pdfcrop", COPY)):
+            with open(os.path.join(bin_dir, name), "w") as script_file:
+                script_file.write(script)
+            os.chmod(os.path.join(bin_dir, name), 0o755)
+        os.environ["PATH"] = bin_dir + os.pathsep + self.path
+
+        self.format_path = self.write("abcm2ps.fmt", "scale 0.7\n")
+        self.out = os.path.join(self.directory, "Noten")
+
+    def tearDown(self):
+        os.environ["PATH"] = self.path
+        shutil.rmtree(self.directory)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, "w") as out:
+            out.write(content)
+        return path
+
+    def cache(self):
+        return NotenCache(os.path.join(self.directory, "cache"), self.format_path)
+
+    def test_stages(self):
+        tune = self.write("Lied.mcm", "X:1\nT:Lied schief\n")
+        out_path = os.path.join(self.out, "Lied.pdf")
+        cache = self.cache()
+        self.assertEqual(cache.convert(tune, out_path), ["warning: schief"])
+        self.assertEqual(cache.runs, {"abcm2ps": 1, "ps2pdf": 1, "pdfcrop": 1})
+        with open(out_path, "r") as pdf:
+            self.assertEqual(pdf.read(), "X:1\nT:Lied schief\n")
+
+        # cached, the warnings are kept
+        cache = self.cache()
+        self.assertEqual(cache.convert(tune, out_path), ["warning: schief"])
+        self.assertEqual(cache.runs, {"abcm2ps": 0, "ps2pdf": 0, "pdfcrop": 0})
+
+        # without its warnings, the tune is converted again, the later stages are still cached
+        for name in os.listdir(os.path.join(self.directory, "cache")):
+            if name.endswith(".log"):
+                os.remove(os.path.join(self.directory, "cache", name))
+        cache = self.cache()
+        self.assertEqual(cache.convert(tune, out_path), ["warning: schief"])
+        self.assertEqual(cache.runs, {"abcm2ps": 1, "ps2pdf": 0, "pdfcrop": 0})
+
+    def test_error(self):
+        tune = self.write("Lied.mcm", "X:1\n")
+        out_path = os.path.join(self.out, "Lied.pdf")
+        self.cache().convert(tune, out_path)
+
+        self.write("Lied.mcm", "X:1\nkaputt\n")
+        with self.assertRaises(TuneError) as error:
+            self.cache().convert(tune, out_path)
+        self.assertEqual((error.exception.stage, error.exception.diagnostics), ("abcm2ps", ["error: kaputt"]))
+        # the outdated pdf is removed
+        self.assertFalse(os.path.exists(out_path))
+
+    def test_convert_tunes(self):
+        tunes = [self.write("{}.mcm".format(name), "X:1\nT:{}\n".format(name)) for name in ("Eins", "Zwei", "Drei")]
+        tunes.append(self.write("Vier.mcm", "kaputt\n"))
+        for jobs in (1, 2):
+            with self.subTest(jobs=jobs):
+                warnings, errors, runs = convert_tunes(tunes, self.out, self.cache(), jobs)
+                self.assertEqual((warnings, list(errors)), ({}, [tunes[3]]))
+                self.assertEqual(sorted(os.listdir(self.out)), ["Drei.pdf", "Eins.pdf", "Zwei.pdf"])
+        # the second conversion only ran abcm2ps for the failing tune
+        self.assertEqual(runs, {"abcm2ps": 1, "ps2pdf": 0, "pdfcrop": 0})
+
+        warnings, errors, runs = convert_tunes(tunes[:1], self.out, self.cache())
+        self.assertEqual((warnings, errors, runs), ({}, {}, {"abcm2ps": 0, "ps2pdf": 0, "pdfcrop": 0}))
+
+
+if __name__ == "__main__":
+    unittest.main()
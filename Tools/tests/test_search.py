@@ -0,0 +1,85 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from pyralala.search import SearchIndex
+
+SONGS = {
+    "Gedanken.tex": r"""\beginsong{Die Gedanken sind frei}
+\beginverse
+Die Gedanken sind frei, wer kann sie erraten,
+sie fliehen vorbei wie nächtliche Schatten.
+\endverse
+\beginchorus
+Die Gedanken sind frei!
+\endchorus
+\endsong
+""",
+    "Strasse.tex": r"""\beginsong{Auf der Straße}
+\beginverse
+Frei sind die Gedanken auf der Straße,
+\endverse
+\endsong
+""",
+}
+
+
+class SearchIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for name, source in SONGS.items():
+            with open(os.path.join(self.directory, name), "w") as song_file:
+                song_file.write(source)
+        self.index_path = os.path.join(self.directory, "lyrics.idx")
+        self.index = SearchIndex(self.index_path)
+        self.assertEqual(self.index.update([self.directory], jobs=1), len(SONGS))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def search(self, query, index=None):
+        return [(os.path.basename(hit.path), hit.part, hit.line_number) for hit in (index or self.index).search(query)]
+
+    def test_phrase(self):
+        self.assertEqual(self.search('"die gedanken sind frei"'), [
+            ("Gedanken.tex", "Verse 1", 0),
+            ("Gedanken.tex", "Refrain", 0),
+        ])
+        # words in another order are no phrase
+        self.assertEqual(self.search('"frei sind die gedanken"'), [("Strasse.tex", "Verse 1", 0)])
+        self.assertEqual(self.search('"gedanken frei"'), [])
+
+    def test_phrase_spans_lines(self):
+        self.assertEqual(self.search('"erraten sie fliehen"'), [("Gedanken.tex", "Verse 1", 0)])
+
+    def test_words_in_same_part(self):
+        self.assertEqual(self.search("frei gedanken"), [
+            ("Gedanken.tex", "Verse 1", 0),
+            ("Gedanken.tex", "Refrain", 0),
+            ("Strasse.tex", "Verse 1", 0),
+        ])
+        self.assertEqual(self.search("schatten refrain"), [])
+
+    def test_folding(self):
+        self.assertEqual(self.search("strasse"), [("Strasse.tex", "Verse 1", 0)])
+        self.assertEqual(self.search("nachtliche"), [("Gedanken.tex", "Verse 1", 1)])
+
+    def test_update_and_reload(self):
+        os.remove(os.path.join(self.directory, "Strasse.tex"))
+        self.assertEqual(self.index.update([self.directory], jobs=1), 1)
+        self.assertEqual(self.search("strasse"), [])
+        self.index.save()
+
+        loaded = SearchIndex(self.index_path)
+        self.assertEqual(len(loaded), 1)
+        self.assertEqual(self.search("schatten", loaded), [("Gedanken.tex", "Verse 1", 1)])
+        self.assertEqual(loaded.update([self.directory], jobs=1), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from pyralala.site import Edition, SiteBuilder
+
+LIEDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, "Lieder")
+# songs without graphics, the pages do not need pdf2svg
+SONGS = ["AceOfSpades.tex", "4ChordSong.tex", "1-2Lovesong.tex"]
+EDITION = """\\providecommand{\\bookname}{Testbuch}
+\\input{Misc/basic}
+\\songchapter{Rock}
+\\setthumb{A}{1}
+\\input{Lieder/AceOfSpades}
+\\setthumb{Zahlen}{1}
+\\input{Lieder/4ChordSong}
+\\songchapter{Pop}
+\\input{Lieder/1-2Lovesong.tex}
+"""
+
+
+class SiteTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.directory, "Lieder"))
+        os.makedirs(os.path.join(self.directory, "Ausgaben"))
+        for name in SONGS:
+            shutil.copy(os.path.join(LIEDER, name), os.path.join(self.directory, "Lieder"))
+        self.edition_path = os.path.join(self.directory, "Ausgaben", "Test.tex")
+        self.write_edition(EDITION)
+        self.out = os.path.join(self.directory, "site")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_edition(self, source):
+        with open(self.edition_path, "w") as tex_file:
+            tex_file.write(source)
+
+    def build(self):
+        builder = SiteBuilder(Edition(self.edition_path), self.out, jobs=1)
+        builder.build()
+        return builder
+
+    def test_edition(self):
+        edition = Edition(self.edition_path)
+        self.assertEqual(edition.title, "Testbuch")
+        self.assertEqual(edition.root, self.directory)
+        self.assertEqual([(chapter, thumb, os.path.relpath(path, self.directory)) for chapter, thumb, path
+                          in edition.songs], [
+            ("Rock", "A", "Lieder/AceOfSpades.tex"),
+            ("Rock", "Zahlen", "Lieder/4ChordSong.tex"),
+            ("Pop", "Zahlen", "Lieder/1-2Lovesong.tex"),
+        ])
+
+    def test_incremental(self):
+        pages = ["AceOfSpades.html", "4ChordSong.html", "1-2Lovesong.html", "index.html", "kapitel-1.html",
+                 "kapitel-2.html", "alphabetisch.html"]
+        builder = self.build()
+        self.assertEqual(builder.errors, {})
+        self.assertEqual(builder.built, pages)
+        with open(os.path.join(self.out, "kapitel-1.html"), "r") as page:
+            chapter = page.read()
+        self.assertIn("<a href=\"AceOfSpades.html\">Ace Of Spades</a>", chapter)
+        self.assertNotIn("1-2Lovesong.html", chapter)
+        with open(os.path.join(self.out, "alphabetisch.html"), "r") as page:
+            # alternative titles are listed as well
+            self.assertIn("Ich weiß, du wirst mich vermissen", page.read())
+
+        builder = self.build()
+        self.assertEqual((builder.built, len(builder.skipped)), ([], len(pages)))
+
+        # removed songs are removed from the site, the index pages are rendered again
+        self.write_edition(EDITION.replace("\\input{Lieder/4ChordSong}\n", ""))
+        builder = self.build()
+        self.assertEqual(builder.built, ["index.html", "kapitel-1.html", "kapitel-2.html", "alphabetisch.html"])
+        self.assertFalse(os.path.exists(os.path.join(self.out, "4ChordSong.html")))
+
+    def test_missing_song(self):
+        self.write_edition(EDITION + "\\input{Lieder/Fehlt}\n")
+        builder = self.build()
+        self.assertEqual(list(builder.errors), [os.path.join(self.directory, "Lieder/Fehlt.tex")])
+        self.assertIn("AceOfSpades.html", builder.built)
+
+    def test_unwritable_page(self):
+        # open fails, the error of the page is kept
+        os.makedirs(os.path.join(self.out, "AceOfSpades.html"))
+        builder = self.build()
+        self.assertEqual(list(builder.errors), [os.path.join(self.directory, "Lieder/AceOfSpades.tex")])
+        self.assertIn("IsADirectoryError", builder.errors[os.path.join(self.directory, "Lieder/AceOfSpades.tex")])
+        self.assertIn("4ChordSong.html", builder.built)
+
+    def test_graphics(self):
+        # graphics are found relative to the repository root, not the working directory
+        bin_dir = os.path.join(self.directory, "bin")
+        os.makedirs(bin_dir)
+        with open(os.path.join(bin_dir, "pdf2svg"), "w") as script:
+            script.write("#!/bin/sh\nprintf '<?xml?>\\n<svg width=\"1\" id=\"x\">\\n</svg>\\n' > \"$2\"\n")
+        os.chmod(os.path.join(bin_dir, "pdf2svg"), 0o755)
+        os.makedirs(os.path.join(self.directory, "Noten"))
+        with open(os.path.join(self.directory, "Noten", "Test.pdf"), "w") as pdf:
+            pdf.write("%PDF")
+        with open(os.path.join(self.directory, "Lieder", "Noten.tex"), "w") as song:
+            song.write("\\beginsong{Noten}\n\\includegraphics[width=1\\textwidth]{Noten/Test.pdf}\n\\endsong\n")
+        self.write_edition(EDITION + "\\input{Lieder/Noten}\n")
+
+        path = os.environ["PATH"]
+        os.environ["PATH"] = bin_dir + os.pathsep + path
+        try:
+            builder = self.build()
+        finally:
+            os.environ["PATH"] = path
+        self.assertEqual(builder.errors, {})
+        with open(os.path.join(self.out, "Noten.html"), "r") as page:
+            self.assertIn("<svg id=\"x\">", page.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from pyralala.index import IndexEntry, SongIndex
+from pyralala.split import edition_songs, song_pages, split_edition
+
+EDITION = """\\begin{songs}{titleidx}
+\\input{Lieder/Eins}
+% \\input{Lieder/Auskommentiert}
+\\input{Misc/Grifftabelle}
+\\input{Lieder/Zwei.tex}
+\\input{./Lieder/Drei}
+\\end{songs}
+"""
+SXD = """\\songtitleindex
+Eins
+1
+song1-1.1
+Zwei
+3
+song1-2.3
+Alternativer Titel von Eins
+1
+song1-1.1
+Drei
+4
+song1-3.4
+"""
+SONGS = ["Lieder/Eins.tex", "Lieder/Zwei.tex", "Lieder/Drei.tex"]
+
+
+def index(*entries):
+    return SongIndex("\\songtitleindex", [IndexEntry(*entry) for entry in entries])
+
+
+class SongPagesTest(unittest.TestCase):
+
+    def test_edition_songs(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".tex", delete=False) as tex_file:
+            tex_file.write(EDITION)
+        try:
+            self.assertEqual(edition_songs(tex_file.name), SONGS)
+        finally:
+            os.remove(tex_file.name)
+
+    def test_song_pages(self):
+        labels = ["i", "ii", "1", "2", "3", "4", "5"]
+        entries = [("Eins", "1", "song1-1.1"), ("Zwei", "3", "song1-2.3"), ("Auch Eins", "1", "song1-1.1"),
+                   ("Drei", "4", "song1-3.4")]
+        # the pages following a song belong to it, up to the next song
+        self.assertEqual(song_pages(index(*entries), SONGS, labels), {
+            "Lieder/Eins.tex": [2, 3],
+            "Lieder/Zwei.tex": [4],
+            "Lieder/Drei.tex": [5, 6],
+        })
+
+    def test_mismatch(self):
+        with self.assertRaises(Exception):
+            song_pages(index(("Eins", "1", "song1-1.1")), SONGS, ["1"])
+        with self.assertRaises(Exception):
+            song_pages(index(("Eins", "9", "song1-1.1")), SONGS[:1], ["1"])
+
+
+class SplitEditionTest(unittest.TestCase):
+
+    def setUp(self):
+        try:
+            import pypdf
+        except ImportError:
+            self.skipTest("pypdf is not installed.")
+        self.directory = tempfile.mkdtemp()
+        self.base = os.path.join(self.directory, "SplitEdition")
+        with open(self.base + ".tex", "w") as tex_file:
+            tex_file.write(EDITION)
+        with open(self.base + ".sxd", "w") as sxd_file:
+            sxd_file.write(SXD)
+        # the pages are identified by their width
+        writer = pypdf.PdfWriter()
+        for i in range(5):
+            writer.add_blank_page(400 + i, 595)
+        writer.write(self.base + ".pdf")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_split(self):
+        import pypdf
+
+        out_dir = os.path.join(self.directory, "PDFs")
+        self.assertEqual(split_edition(self.base + ".tex", out_dir), dict(zip(SONGS, [2, 1, 2])))
+        for name, pages in (("Eins", [0, 1]), ("Zwei", [2]), ("Drei", [3, 4])):
+            reader = pypdf.PdfReader(os.path.join(out_dir, name + ".pdf"))
+            self.assertEqual([round(float(page.mediabox.width)) for page in reader.pages], [400 + p for p in pages])
+
+
+if __name__ == "__main__":
+    unittest.main()
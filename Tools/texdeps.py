@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+import argparse, glob, json, os, sys
+from pyralala.deps import DependencyScanner, make_rules
+from pyralala.targets import VARIANTS
+
+
+def make_targets(path):
+    """ The Makefile targets built from a LaTeX file. """
+    base = os.path.splitext(path)[0]
+    if path.startswith("Ausgaben/"):
+        return [base + suffix + ".pdf" for suffix in VARIANTS] + [base + ".sxd", base + ".sbx"]
+    if path.startswith("Lieder/"):
+        return ["PDFs/{}.pdf".format(os.path.basename(base))]
+    return [base + ".pdf"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Print the files editions and songs depend on: the included songs, '
+                                                 'sheet music, pictures and LaTeX files, transitively.')
+    parser.add_argument("files", nargs="+", metavar="file",
+                        help="Editions or songs (.tex), or directories containing them, relative to the repository root.")
+    parser.add_argument("-M", "--make", metavar="FILE",
+                        help="Write Makefile rules to FILE, which is remade when a LaTeX source changes.")
+    parser.add_argument("--json", metavar="FILE", help="Write the dependencies by file as JSON to FILE, - for stdout.")
+    parser.add_argument("--song-template", default="Misc/Song.tex",
+                        help="Added to the dependencies of songs, it inputs the song of a song pdf "
+                             "(default: Misc/Song.tex).")
+    parser.add_argument("--cache", metavar="FILE", help="Cache the references of each file in FILE.")
+    args = parser.parse_args()
+
+    files = []
+    for path in args.files:
+        files += sorted(glob.glob(os.path.join(path, "*.tex"))) if os.path.isdir(path) else [path]
+
+    scanner = DependencyScanner(args.cache)
+    template = scanner.dependencies(args.song_template) if os.path.exists(args.song_template) else []
+    dependencies = {}
+    for path in files:
+        path = os.path.normpath(path)
+        deps = scanner.dependencies(path)
+        dependencies[path] = deps + [d for d in template if d not in deps] if path.startswith("Lieder/") else deps
+    scanner.save()
+
+    for path, names in sorted(scanner.missing.items()):
+        print("{}: not found: {}".format(path, ", ".join(names)), file=sys.stderr)
+
+    if args.make:
+        os.makedirs(os.path.dirname(args.make) or ".", exist_ok=True)
+        with open(args.make, "w") as make_file:
+            rules = [(make_targets(p), d) for p, d in dependencies.items()]
+            # the rules change with the LaTeX sources only, not with graphics, which may be generated
+            sources = set(d for deps in dependencies.values() for d in deps if d.endswith((".tex", ".sty")))
+            rules.append(([args.make], sorted(sources)))
+            make_file.write(make_rules(rules))
+    if args.json == "-":
+        json.dump(dependencies, sys.stdout, indent=1)
+        print()
+    elif args.json:
+        with open(args.json, "w") as json_file:
+            json.dump(dependencies, json_file, indent=1)
+    if not args.make and not args.json:
+        for path, deps in dependencies.items():
+            print("{}: {}".format(path, " ".join(deps[1:])))